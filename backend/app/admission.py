@@ -0,0 +1,264 @@
+"""
+Контроль нагрузки: лимиты пользователя и допуск запросов по классам маршрутов
+
+AdmissionMiddleware работает до роутинга и до пула соединений БД:
+- token bucket на пользователя (по JWT, без токена - по IP) для свайпов и
+  записей: при исчерпании - 429 с Retry-After через сколько появится токен;
+- ограничение одновременных запросов на класс маршрутов (read, stream,
+  swipe, write) в воркере: лишний запрос сразу получает 503 с Retry-After,
+  а не ждёт соединения пула до таймаута;
+- при перегрузке (p95 ожидания соединения пула или p95 латентности класса
+  выше порогов) лимит класса уменьшается вдвое, пока сигнал не пропадёт.
+
+Потоковые списки (?stream=json|ndjson или Accept: application/x-ndjson, см.
+app/streaming.py) - отдельный класс stream: они держат соединение всё время
+отправки и не должны занимать слоты read. Латентность stream - время до
+начала ответа (первой порции), а не длительность всей отправки, иначе
+длинные выгрузки поднимали бы p95 и уменьшали лимит класса.
+
+Так под перегрузкой часть запросов быстро отклоняется, а остальные
+выполняются с ограниченной задержкой. SSE, /health, /api/debug и /uploads
+не ограничиваются.
+"""
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth import decode_jwt_token
+from app.cache import TTLCache
+from app.streaming import NDJSON_MEDIA_TYPE, STREAM_JSON, STREAM_NDJSON
+
+CLASS_READ = "read"
+CLASS_STREAM = "stream"
+CLASS_SWIPE = "swipe"
+CLASS_WRITE = "write"
+
+EXEMPT_PREFIXES = ("/health", "/api/debug", "/api/events", "/uploads", "/docs", "/openapi.json")
+SWIPE_SUFFIXES = ("/like", "/pass", "/respond-to-like")
+LATENCY_SAMPLES = 200
+SIGNAL_REFRESH_SECONDS = 0.5
+# Окно, за которое считается p95 ожидания соединения пула
+POOL_WAIT_WINDOW_SECONDS = 10.0
+MAX_BUCKETS = 100_000
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Класс маршрута или None, если запрос не ограничивается"""
+    if method == "OPTIONS" or not path.startswith("/api") or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method in ("GET", "HEAD"):
+        return CLASS_READ
+    if path.startswith("/api/auth"):
+        return None
+    if path.endswith(SWIPE_SUFFIXES):
+        return CLASS_SWIPE
+    return CLASS_WRITE
+
+def is_stream(scope: Scope) -> bool:
+    """Запрос потокового списка: ?stream=json|ndjson или Accept: application/x-ndjson"""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if any(value in (STREAM_JSON, STREAM_NDJSON) for value in query.get("stream", ())):
+        return True
+    return NDJSON_MEDIA_TYPE in Headers(scope=scope).get("accept", "")
+
+class TokenBuckets:
+    """
+    Token bucket на ключ (user_id или IP): rate токенов в секунду, не больше burst
+
+    Хранит только (токены, время) на ключ; при переполнении таблицы
+    удаляются полные (давно не использованные) вёдра.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_entries: int = MAX_BUCKETS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_entries = max_entries
+        self._buckets: Dict[object, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """0 - токен взят; иначе - через сколько секунд появится токен"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1.0:
+                self._buckets[key] = (tokens - 1.0, now)
+                if len(self._buckets) > self.max_entries:
+                    self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1.0 - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def _prune(self, now: float) -> None:
+        full_after = self.burst / self.rate if self.rate > 0 else 0.0
+        stale = [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]
+        for key in stale:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class ClassLimiter:
+    """Счётчик одновременных запросов класса и недавние латентности"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self.shed = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def p95_ms(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+class AdmissionMiddleware:
+    """ASGI-middleware контроля нагрузки (см. описание модуля)"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Dict[str, int],
+        buckets: Dict[str, TokenBuckets],
+        pool=None,
+        pool_wait_threshold_ms: float = 100.0,
+        latency_threshold_ms: float = 1000.0,
+    ):
+        self.app = app
+        self.limiters = {name: ClassLimiter(limit) for name, limit in limits.items()}
+        self.buckets = buckets
+        self.pool = pool
+        self.pool_wait_threshold_ms = pool_wait_threshold_ms
+        self.latency_threshold_ms = latency_threshold_ms
+        self.throttled = 0
+        self._overloaded: Dict[str, bool] = {name: False for name in limits}
+        self._signal_at = 0.0
+        self._users = TTLCache(ttl=300, maxsize=10_000)
+        global _instance
+        _instance = self
+
+    def _user_key(self, scope: Scope):
+        authorization = Headers(scope=scope).get("authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[7:]
+            user_id = self._users.get(token)
+            if user_id is None:
+                user_id = decode_jwt_token(token)
+                if user_id is not None:
+                    self._users.set(token, user_id)
+            if user_id is not None:
+                return user_id
+        client = scope.get("client")
+        return ("ip", client[0]) if client else ("ip", "")
+
+    def _pool_wait_p95_ms(self) -> float:
+        stats = getattr(self.pool, "stats", None) if self.pool is not None else None
+        if stats is None:
+            return 0.0
+        return stats.recent_wait_p95_ms(POOL_WAIT_WINDOW_SECONDS)
+
+    def _refresh_signal(self) -> None:
+        now = time.monotonic()
+        if now - self._signal_at < SIGNAL_REFRESH_SECONDS:
+            return
+        self._signal_at = now
+        pool_overloaded = self._pool_wait_p95_ms() > self.pool_wait_threshold_ms
+        for name, limiter in self.limiters.items():
+            self._overloaded[name] = pool_overloaded or limiter.p95_ms() > self.latency_threshold_ms
+
+    def effective_limit(self, name: str) -> int:
+        limiter = self.limiters[name]
+        return max(1, limiter.limit // 2) if self._overloaded[name] else limiter.limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name == CLASS_READ and is_stream(scope):
+            name = CLASS_STREAM
+        if name is None or name not in self.limiters:
+            await self.app(scope, receive, send)
+            return
+
+        bucket = self.buckets.get(name)
+        if bucket is not None:
+            wait = bucket.take(self._user_key(scope))
+            if wait > 0:
+                self.throttled += 1
+                await _reject(send, 429, "Too many requests", wait)
+                return
+
+        self._refresh_signal()
+        limiter = self.limiters[name]
+        if limiter.in_flight >= self.effective_limit(name):
+            limiter.shed += 1
+            await _reject(send, 503, "Server is busy, retry later", 1.0)
+            return
+
+        limiter.in_flight += 1
+        started = time.perf_counter()
+        if name != CLASS_STREAM:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.in_flight -= 1
+                limiter.latencies.append((time.perf_counter() - started) * 1000)
+            return
+
+        async def send_stream(message) -> None:
+            if message["type"] == "http.response.start":
+                limiter.latencies.append((time.perf_counter() - started) * 1000)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_stream)
+        finally:
+            limiter.in_flight -= 1
+
+    def status(self) -> Dict[str, object]:
+        """Снимок для /api/debug/admission"""
+        self._refresh_signal()
+        return {
+            "throttled": self.throttled,
+            "pool_wait_p95_ms": self._pool_wait_p95_ms(),
+            "classes": {
+                name: {
+                    "limit": limiter.limit,
+                    "effective_limit": self.effective_limit(name),
+                    "in_flight": limiter.in_flight,
+                    "shed": limiter.shed,
+                    "p95_ms": round(limiter.p95_ms(), 1),
+                    "overloaded": self._overloaded[name],
+                }
+                for name, limiter in self.limiters.items()
+            },
+            "buckets": {name: len(bucket) for name, bucket in self.buckets.items()},
+        }
+
+_instance: Optional[AdmissionMiddleware] = None
+
+def admission_status() -> Optional[Dict[str, object]]:
+    """Состояние контроля нагрузки текущего воркера (None, если выключен)"""
+    return _instance.status() if _instance is not None else None
+
+async def _reject(send: Send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
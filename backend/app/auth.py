@@ -14,12 +14,7 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 # Поддерживаем оба варианта имени переменной для совместимости
 JWT_SECRET = os.getenv("JWT_SECRET") or os.getenv("JWT_SECRET_KEY") or "your-secret-key-change-in-production"
-
-# Проверяем при загрузке модуля
-if not JWT_SECRET or JWT_SECRET == "your-secret-key-change-in-production":
-    print("⚠️  WARNING: JWT_SECRET использует значение по умолчанию! Установите JWT_SECRET или JWT_SECRET_KEY в переменных окружения.")
-else:
-    print(f"✅ JWT_SECRET загружен (длина: {len(JWT_SECRET)})")
+# Проверка секрета печатается при старте приложения (config.check_config в lifespan)
 
 class TelegramAuthError(Exception):
     pass
@@ -107,6 +102,35 @@ def verify_jwt_token(token: str) -> str:
     except jwt.InvalidTokenError:
         raise TelegramAuthError("Invalid token")
 
+EVENTS_TICKET_AUDIENCE = "events"
+
+def generate_events_ticket(user_id: int, ttl_seconds: int) -> str:
+    """
+    Короткоживущий билет на подключение к потоку /api/events
+
+    EventSource не умеет ставить заголовки, и билет уходит в query string,
+    а значит, и в access-логи. Поэтому JWT сессии туда не передаётся:
+    у билета aud="events" (decode_jwt_token такой токен отклоняет) и срок
+    жизни - секунды.
+    """
+    payload = {
+        'user_id': str(user_id),
+        'aud': EVENTS_TICKET_AUDIENCE,
+        'exp': datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
+
+def decode_events_ticket(ticket: str) -> Optional[int]:
+    """user_id из билета на /api/events; None, если билет истёк или это не билет"""
+    try:
+        payload = jwt.decode(
+            ticket, JWT_SECRET, algorithms=['HS256'],
+            audience=EVENTS_TICKET_AUDIENCE, options={"require": ["exp", "aud"]}
+        )
+        return int(payload['user_id'])
+    except (jwt.InvalidTokenError, KeyError, ValueError, TypeError):
+        return None
+
 def decode_jwt_token(token: str) -> Optional[int]:
     """Декодирование JWT токена и получение user_id (для dependencies)"""
     import logging
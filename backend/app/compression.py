@@ -0,0 +1,286 @@
+"""
+Сжатие ответов: brotli / zstd / gzip по Accept-Encoding
+
+CompressionMiddleware заменяет GZipMiddleware:
+- кодировка выбирается по Accept-Encoding клиента (q-значения), при равенстве -
+  br, затем zstd, затем gzip; brotli и zstandard - необязательные
+  зависимости, без них остаётся gzip;
+- уровень сжатия зависит от типа и размера тела: JSON и текст до сотен KB -
+  средний уровень, большие тела и потоки - быстрый;
+- публичные тела с ETag (фасеты, профили) сжимаются один раз на
+  максимальном уровне и берутся из кэша по (путь, ETag, кодировка);
+  приватные (колода, мэтчи) сжимаются на лету;
+- большие тела сжимаются в threadpool, а не в event loop;
+- не трогает /uploads (картинки уже сжаты), SSE (text/event-stream),
+  ответы с Content-Encoding и несжимаемые типы.
+
+У сжатого варианта сильный ETag становится слабым (W/"..."), как у nginx:
+байты представления другие. If-None-Match сравнивается слабо (app.etags),
+поэтому 304 продолжают работать.
+"""
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+SKIP_PATH_PREFIXES = ("/uploads",)
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml", "text/",
+)
+# Тела больше этого размера сжимаются в threadpool
+THREAD_MIN_BYTES = 16 * 1024
+# Тела больше этого размера в кэш не кладутся
+CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+LARGE_BODY_BYTES = 256 * 1024
+# Максимальный уровень - только для кэшируемых тел до этого размера
+BEST_LEVEL_MAX_BYTES = 64 * 1024
+# Выгрузки (большие однородные тела) - всегда быстрый уровень
+BULK_TYPES = ("text/csv", "application/x-ndjson")
+
+# Уровни: (обычный, большое тело/поток, кэшируемое тело)
+LEVELS = {
+    "br": (5, 3, 11),
+    "zstd": (6, 3, 19),
+    "gzip": (6, 4, 9),
+}
+
+_brotli = None
+_zstd = None
+_availability_checked = False
+
+def available_encodings() -> List[str]:
+    """Поддерживаемые сервером кодировки в порядке предпочтения"""
+    global _brotli, _zstd, _availability_checked
+    if not _availability_checked:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            pass
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            pass
+        _availability_checked = True
+    encodings = []
+    if _brotli is not None:
+        encodings.append("br")
+    if _zstd is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Лучшая кодировка для Accept-Encoding или None (без сжатия)"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def choose_level(encoding: str, content_type: str, size: int, cached: bool, streaming: bool = False) -> int:
+    """Уровень сжатия по кодировке, типу и размеру тела"""
+    normal, fast, best = LEVELS[encoding]
+    if streaming or size >= LARGE_BODY_BYTES or content_type.startswith(BULK_TYPES):
+        return fast
+    return best if cached and size <= BEST_LEVEL_MAX_BYTES else normal
+
+def compress(encoding: str, body: bytes, level: int) -> bytes:
+    if encoding == "br":
+        return _brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return _zstd.ZstdCompressor(level=level).compress(body)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+class _StreamCompressor:
+    """Инкрементальное сжатие потока (каждый кусок сразу уходит клиенту)"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = _brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._c = _zstd.ZstdCompressor(level=level).compressobj()
+        else:
+            self._c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        if self.encoding == "zstd":
+            return self._c.compress(data) + self._c.flush(_zstd.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+class CompressedBodyCache:
+    """LRU сжатых тел с ограничением по суммарному размеру"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key: Tuple[str, str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._data[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def _shared(headers: MutableHeaders) -> bool:
+    """Ответ одинаков для всех клиентов (его сжатое тело можно кэшировать)"""
+    cache_control = headers.get("cache-control", "").lower()
+    return "etag" in headers and "private" not in cache_control and "no-store" not in cache_control
+
+def _weaken(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+class CompressionMiddleware:
+    """ASGI-middleware сжатия ответов (см. описание модуля)"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 512, cache_max_bytes: int = 16 * 1024 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache(cache_max_bytes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, scope["path"], send)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, path: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.path = path
+        self._send = send
+        self._start: Optional[Message] = None
+        self._passthrough = False
+        self._stream: Optional[_StreamCompressor] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self._start = message
+            headers = Headers(raw=message["headers"])
+            status = message["status"]
+            self._passthrough = status < 200 or status in (204, 304) or not _compressible(headers)
+            if self._passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._stream is not None:
+            chunk = self._stream.chunk(body) if body else b""
+            if not more_body:
+                chunk += self._stream.finish()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self._start["headers"])
+        if not more_body:
+            if len(body) < self.middleware.minimum_size:
+                await self._send(self._start)
+                await self._send(message)
+                return
+            body = await self._compress_body(
+                body, headers.get("content-type", "").lower(), headers.get("etag") if _shared(headers) else None
+            )
+            self._set_encoding_headers(headers)
+            headers["Content-Length"] = str(len(body))
+            await self._send(self._start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        # Потоковый ответ: сжимаем кусками
+        level = choose_level(self.encoding, headers.get("content-type", "").lower(), 0, False, streaming=True)
+        self._stream = _StreamCompressor(self.encoding, level)
+        self._set_encoding_headers(headers)
+        if "content-length" in headers:
+            del headers["content-length"]
+        await self._send(self._start)
+        await self._send({"type": "http.response.body", "body": self._stream.chunk(body), "more_body": True})
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = _weaken(headers["etag"])
+
+    async def _compress_body(self, body: bytes, content_type: str, etag: Optional[str]) -> bytes:
+        cacheable = etag is not None and len(body) <= CACHE_MAX_ENTRY_BYTES
+        key = (self.path, etag, self.encoding)
+        if cacheable:
+            cached = self.middleware.cache.get(key)
+            if cached is not None:
+                return cached
+        level = choose_level(self.encoding, content_type, len(body), cacheable)
+        if len(body) >= THREAD_MIN_BYTES or cacheable:
+            compressed = await anyio.to_thread.run_sync(compress, self.encoding, body, level)
+        else:
+            compressed = compress(self.encoding, body, level)
+        if cacheable:
+            self.middleware.cache.set(key, compressed)
+        return compressed
@@ -1,26 +1,64 @@
 """
 Модели базы данных и подключение
 """
-from sqlalchemy import create_engine, Column, BigInteger, String, Integer, Boolean, Text, DateTime, JSON as SQLJSON
+from sqlalchemy import create_engine, Column, BigInteger, SmallInteger, String, Integer, Boolean, Text, DateTime, Index, Sequence, UniqueConstraint, text, JSON as SQLJSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import sessionmaker, deferred
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from datetime import datetime
-from config import settings
+from config import settings, db_pool_limits
 
 # Подключение к базе данных с оптимизацией пула соединений (по рекомендациям)
-from sqlalchemy.pool import QueuePool
-
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=QueuePool,  # Явно указываем QueuePool для лучшей производительности
-    pool_pre_ping=True,  # Проверка соединений перед использованием
-    pool_size=10,  # Увеличен размер пула (рекомендация: 10)
-    max_overflow=20,  # Увеличено максимальное количество дополнительных соединений (рекомендация: 20)
-    pool_recycle=3600,  # Переиспользование соединений каждый час
-    echo=False  # Логирование SQL запросов (отключено для продакшена)
-)
+from sqlalchemy.engine import make_url
+from app.pool_metrics import InstrumentedQueuePool
+
+# Размер пула воркера: по умолчанию 10 + 20, при DB_MAX_CONNECTIONS - доля общего бюджета
+POOL_SIZE, MAX_OVERFLOW = db_pool_limits()
+
+def _create_engine(url: str):
+    """
+    Engine с инструментированным пулом
+
+    В режиме DB_PGBOUNCER (PgBouncer в transaction pooling) соединение пула -
+    это соединение с PgBouncer, а серверный бэкенд меняется от транзакции к
+    транзакции: pre-ping на каждый checkout заменён фоновой проверкой
+    (check_pool_liveness), TCP keepalive и коротким pool_recycle, а
+    подготовленные на сервере запросы отключены.
+    """
+    options = dict(
+        poolclass=InstrumentedQueuePool,  # QueuePool + метрики ожидания (см. pool_metrics)
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        echo=False  # Логирование SQL запросов (отключено для продакшена)
+    )
+    if settings.DB_PGBOUNCER:
+        connect_args = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+        if make_url(url).get_driver_name() == "psycopg":
+            # psycopg 3 готовит запросы на сервере после нескольких выполнений
+            connect_args["prepare_threshold"] = None
+        options.update(
+            pool_pre_ping=False,
+            pool_recycle=settings.DB_PGBOUNCER_RECYCLE_SECONDS,
+            connect_args=connect_args,
+        )
+    else:
+        options.update(
+            pool_pre_ping=True,  # Проверка соединений перед использованием
+            pool_recycle=3600,  # Переиспользование соединений каждый час
+        )
+    return create_engine(url, **options)
+
+engine = _create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Реплика для чтения: свой engine и пул; без DATABASE_READ_URL чтение идёт в primary
+if settings.DATABASE_READ_URL:
+    read_engine = _create_engine(settings.DATABASE_READ_URL)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
 Base = declarative_base()
 
 # Модели базы данных
@@ -38,8 +76,12 @@ class Profile(Base):
     age = Column(Integer, nullable=False)
     city = Column(String(255), nullable=False)
     university = Column(String(255), nullable=False)
-    interests = Column(JSONB, default=[])
-    goals = Column(JSONB, default=[])
+    # Исходные списки строк; на чтении не загружаются (см. interest_ids/goal_ids)
+    interests = deferred(Column(JSONB, default=[]))
+    goals = deferred(Column(JSONB, default=[]))
+    # Те же списки, закодированные id из словаря tags (см. tag_service)
+    interest_ids = Column(ARRAY(Integer), nullable=False, default=list, server_default="{}")
+    goal_ids = Column(ARRAY(Integer), nullable=False, default=list, server_default="{}")
     bio = Column(Text, nullable=True)
     photo_url = Column(String(500), nullable=True)
     is_active = Column(Boolean, default=True)
@@ -47,16 +89,48 @@ class Profile(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class Tag(Base):
+    """Словарь интересов и целей: значение -> небольшой целочисленный id"""
+    __tablename__ = "tags"
+    __table_args__ = (
+        UniqueConstraint("kind", "value", name="uq_tags_kind_value"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(10), nullable=False)  # 'interest' или 'goal'
+    value = Column(String(255), nullable=False)
+
 class Swipe(Base):
-    """Модель свайпа (лайк или пропуск)"""
+    """
+    Модель свайпа (лайк или пропуск)
+
+    В БД таблица секционирована по hash(user_id) (schema.sql, миграция 011);
+    create_all создаёт обычную таблицу с тем же ключом и индексом.
+    Старые пропуски переносятся в SwipeExclusion (compact_swipes.py).
+    """
     __tablename__ = "swipes"
+    __table_args__ = (
+        # Лайки по профилю (пересчёт profile_stats) и каскад удаления профиля
+        Index("idx_swipes_target_action", "target_profile_id", "action"),
+    )
     
-    id = Column(BigInteger, primary_key=True, index=True)
-    user_id = Column(BigInteger, nullable=False, index=True)
-    target_profile_id = Column(BigInteger, nullable=False, index=True)
+    id = Column(BigInteger, Sequence("swipes_id_seq"), nullable=False)
+    user_id = Column(BigInteger, primary_key=True)
+    target_profile_id = Column(BigInteger, primary_key=True)
     action = Column(String(10), nullable=False)  # 'like' или 'pass'
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class SwipeExclusion(Base):
+    """
+    Архив старых пропусков: строка на пользователя с отсортированным
+    массивом id пропущенных профилей (вместо строки swipes на каждый пропуск)
+    """
+    __tablename__ = "swipe_exclusions"
+    
+    user_id = Column(BigInteger, primary_key=True)
+    profile_ids = Column(ARRAY(BigInteger), nullable=False, default=list)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 class Match(Base):
     """Модель мэтча (взаимный лайк)"""
     __tablename__ = "matches"
@@ -66,10 +140,130 @@ class Match(Base):
     user2_id = Column(BigInteger, nullable=False, index=True)
     matched_at = Column(DateTime, default=datetime.utcnow)
 
-# Создание таблиц (если их ещё нет)
-Base.metadata.create_all(bind=engine)
+class MatchEdge(Base):
+    """
+    Ребро мэтча в направлении от пользователя (по строке на каждую сторону мэтча)
+
+    Позволяет читать мэтчи пользователя одним index range scan по
+    (user_id, matched_at) вместо OR по user1_id/user2_id в таблице matches.
+    """
+    __tablename__ = "match_edges"
+    __table_args__ = (
+        # ORDER BY matched_at DESC, peer_user_id DESC обслуживается обратным сканированием индекса
+        Index("idx_match_edges_user_matched", "user_id", "matched_at", "peer_user_id"),
+        # Каскад удаления мэтча
+        Index("idx_match_edges_match_id", "match_id"),
+    )
+    
+    user_id = Column(BigInteger, primary_key=True)
+    peer_user_id = Column(BigInteger, primary_key=True)
+    match_id = Column(BigInteger, nullable=False)
+    matched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class IncomingLike(Base):
+    """
+    Входящий лайк без ответа («лайкнул меня, я ещё не ответил»)
+
+    Поддерживается сервисом свайпов: строка появляется при лайке и удаляется,
+    когда владелец отвечает (лайк/пропуск) или лайкнувший меняет лайк на пропуск.
+    """
+    __tablename__ = "incoming_likes"
+    __table_args__ = (
+        # ORDER BY liked_at DESC, liker_user_id DESC обслуживается обратным сканированием индекса
+        Index("idx_incoming_likes_owner_liked", "owner_user_id", "liked_at", "liker_user_id"),
+        # Каскад удаления профиля лайкнувшего
+        Index("idx_incoming_likes_liker_profile", "liker_profile_id"),
+    )
+    
+    owner_user_id = Column(BigInteger, primary_key=True)  # Кого лайкнули
+    liker_user_id = Column(BigInteger, primary_key=True)  # Кто лайкнул
+    liker_profile_id = Column(BigInteger, nullable=False)
+    liked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ConnectionFeedback(Base):
+    """Отметка полезности коннекта: from_user_id отмечает собеседника по мэтчу"""
+    __tablename__ = "connection_feedbacks"
+    __table_args__ = (
+        UniqueConstraint("match_id", "from_user_id", "feedback_type"),
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    match_id = Column(BigInteger, nullable=False, index=True)
+    from_user_id = Column(BigInteger, nullable=False, index=True)
+    to_user_id = Column(BigInteger, nullable=False, index=True)
+    feedback_type = Column(String(50), nullable=False)  # HELPED_ME, I_HELPED, PROJECT_TOGETHER, EVENT_TOGETHER
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ConnectionFeedbackCount(Base):
+    """Сколько отметок каждого типа получил пользователь (см. feedback_service)"""
+    __tablename__ = "connection_feedback_counts"
+    
+    user_id = Column(BigInteger, primary_key=True)
+    feedback_type = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ProfileStats(Base):
+    """
+    Статистика пользователя: лайки полученные/отправленные и мэтчи
+
+    Обновляется в транзакции свайпа и мэтча (см. profile_stats_service),
+    расхождения выравнивает пересчёт (recompute_profile_stats.py).
+    """
+    __tablename__ = "profile_stats"
+    
+    user_id = Column(BigInteger, primary_key=True)
+    likes_received = Column(Integer, nullable=False, default=0)
+    likes_sent = Column(Integer, nullable=False, default=0)
+    matches_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class TableCounter(Base):
+    """
+    Шард счётчика строк (активные профили, свайпы, мэтчи)
+
+    Значение счётчика - сумма value по name. Строки обновляются триггерами
+    (миграция 007), бэкенд только читает (см. stats_service).
+    """
+    __tablename__ = "table_counters"
+    
+    name = Column(String(50), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class Job(Base):
+    """
+    Фоновая задача в очереди (см. app/jobs.py)
+
+    queued - ждёт run_at, running - забрана воркером (locked_by/locked_at),
+    failed - исчерпала max_attempts. Выполненные задачи удаляются.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("idx_jobs_queued_run_at", "run_at", "id", postgresql_where=text("status = 'queued'")),
+        Index("idx_jobs_running_locked_at", "locked_at", postgresql_where=text("status = 'running'")),
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    status = Column(String(10), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime)
+    locked_by = Column(String(100))
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+def create_tables():
+    """
+    Создание таблиц по моделям (если их ещё нет)
+
+    Источник правды для схемы - schema.sql и migrations/, поэтому по умолчанию
+    не выполняется (DB_CREATE_ALL=true - для локальной разработки).
+    """
+    Base.metadata.create_all(bind=engine)
 
-# Проверка подключения к БД при старте
 def check_database_connection():
     """Проверяет подключение к базе данных при старте"""
     from sqlalchemy import text
@@ -88,5 +282,57 @@ def check_database_connection():
         print(f"❌ Ошибка подключения к базе данных: {e}")
         print("⚠️  Проверьте DATABASE_URL в переменных окружения Koyeb")
 
-# Выполняем проверку при импорте модуля
-check_database_connection()
+def prewarm_pool(size: int) -> int:
+    """
+    Открывает size соединений пула параллельно и возвращает их в пул
+
+    Первые запросы после холодного старта не платят за TCP/TLS-рукопожатие
+    с БД. Возвращает число успешно открытых соединений.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import text
+
+    size = min(size, engine.pool.size())
+    if size <= 0:
+        return 0
+    connections = []
+
+    def _connect():
+        conn = engine.connect()
+        conn.execute(text("SELECT 1"))
+        return conn
+
+    with ThreadPoolExecutor(max_workers=size, thread_name_prefix="pool-prewarm") as executor:
+        futures = [executor.submit(_connect) for _ in range(size)]
+        for future in futures:
+            try:
+                connections.append(future.result())
+            except Exception as e:
+                print(f"⚠️  Прогрев пула: не удалось открыть соединение: {e}")
+    for conn in connections:
+        conn.close()
+    return len(connections)
+
+def check_pool_liveness() -> bool:
+    """
+    Фоновая проверка живости соединений (вместо pre-ping в режиме DB_PGBOUNCER)
+
+    Выполняет SELECT 1 на соединении из пула каждого engine. Если соединение
+    оказалось мёртвым (перезапуск PgBouncer, обрыв по таймауту простоя),
+    пул пересоздаётся, чтобы запросы не натыкались на остальные мёртвые
+    соединения. Возвращает True, если все engine ответили.
+    """
+    from sqlalchemy import text
+
+    healthy = True
+    engines = [engine] if read_engine is engine else [engine, read_engine]
+    for db_engine in engines:
+        try:
+            with db_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            healthy = False
+            db_engine.pool.stats.record_liveness_failure()
+            print(f"⚠️  Проверка соединений БД не прошла, пул пересоздаётся: {e}")
+            db_engine.dispose()
+    return healthy
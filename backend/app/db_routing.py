@@ -0,0 +1,67 @@
+"""
+Маршрутизация сессий: запись - в primary, чтение - в реплику
+
+Сессии записи (get_db) помечаются user_id текущего пользователя. После
+commit такой сессии пользователь READ_YOUR_WRITES_SECONDS секунд читает
+с primary (get_read_db), пока реплика догоняет его собственную запись;
+остальные читают с реплики. При REALTIME_PG_NOTIFY отметка рассылается
+через канал realtime-событий (NOTIFY уходит вместе с commit), поэтому
+следующий запрос пользователя в любом воркере тоже читает с primary.
+
+Без DATABASE_READ_URL обе сессии идут в primary и отметки не ведутся.
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.database import SessionLocal, ReadSessionLocal, engine, read_engine
+from app.services import realtime
+from config import settings
+
+WRITER_KEY = "db_writer_user_id"
+WRITE_MARK_EVENT = "db_write"
+MAX_TRACKED_WRITERS = 100_000
+
+_recent_writes = TTLCache(ttl=settings.READ_YOUR_WRITES_SECONDS, maxsize=MAX_TRACKED_WRITERS)
+
+def replica_enabled() -> bool:
+    return read_engine is not engine
+
+def mark_write(user_id: int) -> None:
+    """Пользователь только что записал: ближайшие чтения - с primary"""
+    _recent_writes.set(user_id, True)
+
+def recently_wrote(user_id: int) -> bool:
+    return _recent_writes.get(user_id) is not None
+
+def session_for_write(user_id: Optional[int]) -> Session:
+    """Сессия primary; commit отметит user_id как недавно писавшего"""
+    db = SessionLocal()
+    if user_id is not None and replica_enabled():
+        db.info[WRITER_KEY] = user_id
+    return db
+
+def session_for_read(user_id: Optional[int]) -> Session:
+    """Сессия реплики, либо primary в окне read-your-writes пользователя"""
+    if user_id is not None and recently_wrote(user_id):
+        return SessionLocal()
+    return ReadSessionLocal()
+
+@event.listens_for(SessionLocal, "before_commit")
+def _broadcast_write_mark(session: Session) -> None:
+    user_id = session.info.get(WRITER_KEY)
+    if user_id is not None and settings.REALTIME_PG_NOTIFY and session.in_transaction():
+        realtime.publish(session, user_id, WRITE_MARK_EVENT, {})
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_writer(session: Session) -> None:
+    user_id = session.info.get(WRITER_KEY)
+    if user_id is not None:
+        mark_write(user_id)
+
+def _on_write_mark(user_id: int, data: Dict[str, Any]) -> None:
+    mark_write(user_id)
+
+realtime.register_internal(WRITE_MARK_EVENT, _on_write_mark)
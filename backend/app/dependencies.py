@@ -4,17 +4,9 @@
 from fastapi import Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from typing import Optional
-from app.database import SessionLocal
+from app.db_routing import session_for_read, session_for_write
 from app.auth import decode_jwt_token
 
-def get_db():
-    """Получение сессии базы данных"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def get_current_user_id(authorization: Optional[str] = Header(None, alias="Authorization")) -> Optional[int]:
     """Получение user_id из JWT токена (опционально)"""
     if not authorization or not authorization.startswith("Bearer "):
@@ -22,6 +14,25 @@ def get_current_user_id(authorization: Optional[str] = Header(None, alias="Autho
     token = authorization.replace("Bearer ", "")
     return decode_jwt_token(token)
 
+def get_db(user_id: Optional[int] = Depends(get_current_user_id)):
+    """Сессия primary для эндпоинтов, которые пишут в базу"""
+    db = session_for_write(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(user_id: Optional[int] = Depends(get_current_user_id)):
+    """
+    Сессия для чтения: реплика (DATABASE_READ_URL), а сразу после
+    собственной записи пользователя - primary (read-your-writes)
+    """
+    db = session_for_read(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_current_user_id_required(authorization: Optional[str] = Header(None, alias="Authorization")) -> int:
     """Получение user_id из JWT токена (обязательно, выбрасывает 401 если токен невалидный)"""
     import logging
@@ -0,0 +1,59 @@
+"""
+ETag и условные GET (If-None-Match -> 304)
+
+Версия профиля - (id, updated_at): ETag профиля строится из неё, ETag
+списка - хэш версий всех профилей страницы и параметров, влияющих на тело,
+ETag агрегатов в памяти (фасеты) - хэш самого тела.
+Ответы помечаются Cache-Control: no-cache - клиент (WebView Mini App)
+хранит тело и перепроверяет его условным запросом. Публичные профили -
+public (сжатое тело кэшируется, см. app.compression), списки - private.
+"""
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi.responses import Response
+
+CACHE_CONTROL = "private, no-cache"
+PUBLIC_CACHE_CONTROL = "public, no-cache"
+
+def _version(updated_at: Optional[datetime]) -> str:
+    return str(int(updated_at.timestamp() * 1_000_000)) if updated_at else "0"
+
+def profile_etag(profile_id: int, updated_at: Optional[datetime]) -> str:
+    """Сильный ETag одного профиля"""
+    return f'"p{profile_id}-{_version(updated_at)}"'
+
+def list_etag(profiles: Iterable, *parts) -> str:
+    """Сильный ETag списка профилей (порядок важен) и доп. частей тела/заголовков"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(f"{part}|".encode())
+    for profile in profiles:
+        digest.update(f"{profile.id}:{_version(profile.updated_at or profile.created_at)};".encode())
+    return f'"l{digest.hexdigest()}"'
+
+def body_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела: одинаков во всех воркерах и после перестроек"""
+    return f'"b{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (список значений, «*», слабое сравнение по RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def etag_headers(etag: str, public: bool = False) -> dict:
+    return {"ETag": etag, "Cache-Control": PUBLIC_CACHE_CONTROL if public else CACHE_CONTROL}
+
+def not_modified(etag: str, public: bool = False) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag, public))
@@ -0,0 +1,226 @@
+"""
+Фоновые задачи: очередь в Postgres (таблица jobs, миграция 012)
+
+Сервис ставит задачу через enqueue() в своей транзакции - задача появится
+только вместе с commit и переживёт рестарт. Обработчик регистрируется
+register(kind, handler) при импорте модуля сервиса и получает payload
+(dict); повторный запуск задачи не должен ломать данные.
+
+Воркер (run_worker) - несколько корутин, каждая забирает готовую задачу
+коротким UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) и
+выполняет обработчик в threadpool. Одновременные воркеры (процессы
+приложения и отдельный worker.py) не ждут друг друга и не берут одну
+задачу дважды. Успешная задача удаляется; ошибка возвращает её в очередь
+с экспоненциальной паузой (JOBS_RETRY_BASE_SECONDS * 2^n, с разбросом),
+после max_attempts - статус failed. Задачи, застрявшие в running дольше
+JOBS_LOCK_TIMEOUT_SECONDS (воркер упал), возвращаются в очередь, а если
+попытки кончились - тоже переводятся в failed.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Job, SessionLocal
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_handlers: Dict[str, Callable[[dict], None]] = {}
+
+_CLAIM_SQL = text("""
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_at = :now, locked_by = :worker
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued' AND run_at <= :now
+        ORDER BY run_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, payload, attempts, max_attempts
+""")
+
+# Задача, исчерпавшая попытки (например, роняет или вешает воркер), - сразу failed
+_RELEASE_STALE_SQL = text("""
+    UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+        locked_at = NULL, locked_by = NULL,
+        last_error = 'lock timeout (worker lost)'
+    WHERE status = 'running' AND locked_at < :cutoff
+    RETURNING id, kind, status, attempts
+""")
+
+_STATUS_SQL = text("""
+    SELECT kind, status, COUNT(*) AS n,
+        COUNT(*) FILTER (WHERE status = 'queued' AND run_at <= :now) AS due,
+        MIN(run_at) FILTER (WHERE status = 'queued' AND run_at <= :now) AS oldest_due
+    FROM jobs
+    GROUP BY kind, status
+""")
+
+def register(kind: str, handler: Callable[[dict], None]) -> None:
+    """Регистрирует обработчик задач вида kind (один на вид)"""
+    _handlers[kind] = handler
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None
+) -> None:
+    """Ставит задачу в транзакции db (без commit): она появится вместе с commit"""
+    db.add(Job(
+        kind=kind,
+        payload=payload or {},
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS
+    ))
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(settings.JOBS_RETRY_MAX_SECONDS, settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def _finish(job_id: int, error: Optional[str], attempts: int, max_attempts: int) -> None:
+    db = SessionLocal()
+    try:
+        if error is None:
+            db.query(Job).filter(Job.id == job_id).delete(synchronize_session=False)
+        elif attempts >= max_attempts:
+            db.query(Job).filter(Job.id == job_id).update({
+                "status": "failed", "locked_at": None, "locked_by": None, "last_error": error
+            }, synchronize_session=False)
+        else:
+            db.query(Job).filter(Job.id == job_id).update({
+                "status": "queued", "locked_at": None, "locked_by": None, "last_error": error,
+                "run_at": datetime.utcnow() + timedelta(seconds=_retry_delay(attempts))
+            }, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def run_next(worker_id: str) -> bool:
+    """
+    Забирает и выполняет одну готовую задачу (синхронно, для threadpool)
+
+    Возвращает False, если готовых задач нет.
+    """
+    db = SessionLocal()
+    try:
+        row = db.execute(_CLAIM_SQL, {"now": datetime.utcnow(), "worker": worker_id}).first()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if row is None:
+        return False
+
+    handler = _handlers.get(row.kind)
+    error = None
+    if handler is None:
+        error = f"no handler for job kind {row.kind!r}"
+    else:
+        try:
+            handler(row.payload or {})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(f"⚠️ Задача {row.kind} #{row.id} (попытка {row.attempts}/{row.max_attempts}): {error}")
+    _finish(row.id, error, row.attempts, row.max_attempts)
+    if error is not None and row.attempts >= row.max_attempts:
+        logger.error(f"❌ Задача {row.kind} #{row.id} не выполнена за {row.max_attempts} попыток: {error}")
+    return True
+
+def release_stale() -> int:
+    """
+    Возвращает в очередь задачи воркеров, не отчитавшихся дольше JOBS_LOCK_TIMEOUT_SECONDS
+
+    Задачи, у которых попытки кончились, переводятся в failed.
+    Возвращает число возвращённых в очередь.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT_SECONDS)
+    db = SessionLocal()
+    try:
+        rows = db.execute(_RELEASE_STALE_SQL, {"cutoff": cutoff}).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    released = sum(1 for row in rows if row.status == "queued")
+    if released:
+        logger.warning(f"⚠️ Возвращено в очередь {released} задач упавших воркеров")
+    for row in rows:
+        if row.status == "failed":
+            logger.error(f"❌ Задача {row.kind} #{row.id} не выполнена за {row.attempts} попыток: воркер не отчитался")
+    return released
+
+def queue_status(db: Session) -> dict:
+    """Глубина очереди: задачи по видам и статусам, готовые к запуску и возраст самой старой"""
+    now = datetime.utcnow()
+    by_kind: Dict[str, Dict[str, int]] = {}
+    totals = {"queued": 0, "due": 0, "running": 0, "failed": 0}
+    oldest_due = None
+    for row in db.execute(_STATUS_SQL, {"now": now}):
+        by_kind.setdefault(row.kind, {})[row.status] = row.n
+        totals[row.status] = totals.get(row.status, 0) + row.n
+        if row.due:
+            by_kind[row.kind]["due"] = row.due
+            totals["due"] += row.due
+            if oldest_due is None or row.oldest_due < oldest_due:
+                oldest_due = row.oldest_due
+    return {
+        **totals,
+        "oldest_due_seconds": round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        "by_kind": by_kind,
+    }
+
+async def _worker_loop(worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            ran = await asyncio.to_thread(run_next, worker_id)
+        except Exception as e:
+            logger.error(f"❌ Ошибка воркера задач: {e}", exc_info=True)
+            ran = False
+        if not ran:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOBS_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+async def _stale_loop(stop: asyncio.Event) -> None:
+    interval = max(1.0, settings.JOBS_LOCK_TIMEOUT_SECONDS / 2)
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(release_stale)
+        except Exception as e:
+            logger.error(f"❌ Ошибка возврата зависших задач: {e}", exc_info=True)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_worker(stop: asyncio.Event, concurrency: Optional[int] = None) -> None:
+    """
+    Выполняет задачи, пока не установлен stop
+
+    concurrency корутин забирают задачи параллельно (обработчики - в
+    threadpool); задача, начатая до stop, доделывается.
+    """
+    concurrency = concurrency or settings.JOBS_CONCURRENCY
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"🧵 Воркер задач {worker_id}: {concurrency} потоков, виды: {', '.join(sorted(_handlers)) or '-'}")
+    await asyncio.gather(
+        _stale_loop(stop),
+        *[_worker_loop(worker_id, stop) for _ in range(concurrency)]
+    )
@@ -42,7 +42,9 @@ class ProfileResponse(BaseModel):
     
     @classmethod
     def from_profile(cls, profile):
-        """Создаёт ProfileResponse из SQLAlchemy модели Profile"""
+        """Создаёт ProfileResponse из SQLAlchemy модели Profile (id словаря должны быть в кэше, см. tag_service.prime)"""
+        from app.services import tag_service
+        
         return cls(
             id=profile.id,
             user_id=profile.user_id,
@@ -54,8 +56,8 @@ class ProfileResponse(BaseModel):
             age=profile.age,
             city=profile.city,
             university=profile.university,
-            interests=_normalize_list_field(profile.interests),
-            goals=_normalize_list_field(profile.goals),
+            interests=tag_service.decode(profile.interest_ids) if profile.interest_ids is not None else _normalize_list_field(profile.interests),
+            goals=tag_service.decode(profile.goal_ids) if profile.goal_ids is not None else _normalize_list_field(profile.goals),
             bio=profile.bio,
             photo_url=profile.photo_url,
             created_at=profile.created_at,
@@ -0,0 +1,29 @@
+"""
+Keyset-пагинация: кодирование курсоров
+
+Курсор - это непрозрачная для клиента строка, в которой лежит ключ последнего
+элемента страницы (время + id). Следующая страница запрашивается условием
+(time, id) < (cursor_time, cursor_id), что даёт один index range scan
+независимо от номера страницы.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+# Заголовок, в котором отдаётся курсор следующей страницы (тело ответа остаётся массивом)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(ts: datetime, item_id: int) -> str:
+    """Кодирует ключ (время, id) в курсор"""
+    raw = json.dumps([ts.isoformat(), int(item_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Декодирует курсор; выбрасывает ValueError, если курсор повреждён"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts_str, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(ts_str), int(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,122 @@
+"""
+Наблюдаемость пула соединений к БД
+
+InstrumentedQueuePool - обычный QueuePool, который замеряет ожидание
+соединения при checkout (очередь пула + открытие нового соединения) и
+считает таймауты пула и новые соединения. pool_status() отдаёт снимок:
+размер, занятые, overflow, свободные, перцентили ожидания
+(GET /api/debug/pool и периодический лог рядом с латентностью).
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+WAIT_SAMPLES = 500
+
+class PoolStats:
+    """Счётчики одного пула (переживают пересоздание пула при dispose)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.liveness_failures = 0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append((time.monotonic(), seconds))
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def record_liveness_failure(self) -> None:
+        with self._lock:
+            self.liveness_failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(wait for _, wait in self._waits)
+            checkouts = self.checkouts
+            result = {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "liveness_failures": self.liveness_failures,
+                "wait_avg_ms": round(self.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+        for name, q in (("wait_p50_ms", 0.5), ("wait_p95_ms", 0.95), ("wait_p99_ms", 0.99)):
+            result[name] = round(waits[int(q * (len(waits) - 1))] * 1000, 3) if waits else 0.0
+        return result
+
+    def recent_wait_p95_ms(self, window_seconds: float) -> float:
+        """p95 ожидания checkout за последние window_seconds (0, если checkout не было)"""
+        since = time.monotonic() - window_seconds
+        with self._lock:
+            waits = sorted(wait for at, wait in self._waits if at >= since)
+        return waits[int(0.95 * (len(waits) - 1))] * 1000 if waits else 0.0
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool с замером ожидания checkout, таймаутов и новых соединений"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        # QueuePool._do_get вызывает себя рекурсивно - замеряем только внешний вызов
+        self._in_checkout = threading.local()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        if getattr(self._in_checkout, "active", False):
+            return super()._do_get()
+        self._in_checkout.active = True
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            self._in_checkout.active = False
+        self.stats.record_wait(time.perf_counter() - started)
+        return entry
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        self.stats.record_connect()
+        return connection
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Снимок состояния пула: занятые/свободные/overflow и статистика ожидания"""
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": pool._max_overflow,
+        "timeout_s": pool.timeout(),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
@@ -1,8 +1,16 @@
 """
 Роутер для отладки
 """
+import asyncio
+
 from fastapi import APIRouter
-from app.database import SessionLocal, Profile, Swipe, Match
+from app.database import SessionLocal, ReadSessionLocal, engine, read_engine
+from app.pool_metrics import pool_status
+from app.admission import admission_status
+from app.singleflight import SingleFlight
+from app.services import stats_service
+from app import jobs
+from config import settings
 
 router = APIRouter(prefix="/api/debug", tags=["debug"])
 
@@ -11,19 +19,43 @@ async def health_check():
     """Проверка здоровья API"""
     return {"status": "ok"}
 
+# Дашборды опрашивают /stats одновременно: один подсчёт на всех и кэш на STATS_REFRESH_SECONDS
+_stats_flight = SingleFlight(ttl=settings.STATS_REFRESH_SECONDS, maxsize=1)
+
+def _count_stats() -> dict:
+    db = ReadSessionLocal()
+    try:
+        return stats_service.get_stats(db)
+    finally:
+        db.close()
+
 @router.get("/stats")
 async def get_stats():
-    """Получение статистики (для отладки)"""
+    """Статистика: активные профили, свайпы, мэтчи (без COUNT(*), см. STATS_MODE)"""
+    return await _stats_flight.do("stats", _count_stats)
+
+def _jobs_status() -> dict:
+    # С primary: задачи живут секунды, отставание реплики исказило бы картину
     db = SessionLocal()
     try:
-        profiles_count = db.query(Profile).filter(Profile.is_active == True).count()
-        swipes_count = db.query(Swipe).count()
-        matches_count = db.query(Match).count()
-        
-        return {
-            "profiles": profiles_count,
-            "swipes": swipes_count,
-            "matches": matches_count
-        }
+        return jobs.queue_status(db)
     finally:
         db.close()
+
+@router.get("/jobs")
+async def get_jobs_status():
+    """Очередь фоновых задач: по видам и статусам, готовые к запуску, возраст самой старой готовой"""
+    return await asyncio.to_thread(_jobs_status)
+
+@router.get("/pool")
+async def get_pool_status():
+    """Состояние пулов соединений: занятые/свободные/overflow, ожидание checkout, таймауты"""
+    result = {"pgbouncer": settings.DB_PGBOUNCER, "primary": pool_status(engine.pool)}
+    if read_engine is not engine:
+        result["replica"] = pool_status(read_engine.pool)
+    return result
+
+@router.get("/admission")
+async def get_admission_status():
+    """Контроль нагрузки: лимиты и занятость по классам маршрутов, отклонённые запросы"""
+    return admission_status() or {"enabled": False}
@@ -0,0 +1,82 @@
+"""
+Роутер realtime-событий (Server-Sent Events)
+
+Клиент открывает одно долгоживущее соединение GET /api/events и получает
+события о новых мэтчах и входящих лайках вместо опроса REST-эндпоинтов.
+EventSource в браузере не умеет ставить заголовки, а query string попадает
+в access-логи, поэтому JWT в URL не передаётся: клиент получает
+короткоживущий билет POST /api/events/ticket (с обычной авторизацией) и
+подключается с ?ticket=.... Клиенты, умеющие ставить заголовки, могут
+передать JWT в Authorization.
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from config import settings
+from app.auth import decode_jwt_token, decode_events_ticket, generate_events_ticket
+from app.dependencies import get_current_user_id_required
+from app.services.realtime import broker
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# Комментарий-пинг, чтобы прокси не закрывали простаивающее соединение
+HEARTBEAT_SECONDS = 25
+
+@router.post("/ticket")
+async def create_events_ticket(current_user_id: int = Depends(get_current_user_id_required)):
+    """
+    Билет на подключение к потоку событий
+
+    Действует EVENTS_TICKET_SECONDS секунд и принимается только GET /api/events.
+    EventSource переподключается с тем же URL, поэтому после обрыва клиент
+    берёт новый билет.
+    """
+    ticket = generate_events_ticket(current_user_id, settings.EVENTS_TICKET_SECONDS)
+    return {"ticket": ticket, "expires_in": settings.EVENTS_TICKET_SECONDS}
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    ticket: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None, alias="Authorization")
+):
+    """
+    Поток событий пользователя (text/event-stream)
+
+    События:
+    - like: {"from_user_id", "profile_id"} - новый входящий лайк
+    - match: {"user_id", "profile_id"} - новый мэтч
+    """
+    if authorization and authorization.startswith("Bearer "):
+        user_id = decode_jwt_token(authorization.replace("Bearer ", ""))
+    else:
+        user_id = decode_events_ticket(ticket) if ticket else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    queue = broker.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                data = json.dumps(message["data"], ensure_ascii=False, separators=(",", ":"))
+                yield f"event: {message['type']}\ndata: {data}\n\n"
+        finally:
+            broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,19 +1,25 @@
 """
 Роутер для работы с мэтчами и свайпами
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 import logging
-from app.dependencies import get_db, get_current_user_id_required
+from app.dependencies import get_db, get_read_db, get_current_user_id_required
+from app.db_routing import session_for_read
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor
+from app.streaming import STREAM_PATTERN, stream_format, stream_list
+from app.etags import list_etag, etag_matches, not_modified, etag_headers
 from app.services.match_service import (
     like_profile,
     pass_profile,
     respond_to_like,
-    get_matches
+    get_matches,
+    matches_query
 )
+from app.services.feedback_service import submit_feedback
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +35,15 @@ class RespondToLikeRequest(BaseModel):
     targetUserId: int = Field(..., gt=0, description="ID пользователя, которому отвечаем")
     action: str = Field(..., pattern="^(accept|decline)$", description="Действие: 'accept' или 'decline'")
 
+class FeedbackItem(BaseModel):
+    """Одна отметка полезности коннекта"""
+    peerUserId: int = Field(..., gt=0, description="user_id собеседника по мэтчу")
+    feedbackType: str = Field(..., pattern="^(HELPED_ME|I_HELPED|PROJECT_TOGETHER|EVENT_TOGETHER)$", description="Тип отметки")
+
+class FeedbackRequest(BaseModel):
+    """Пачка отметок полезности (повторная отправка ничего не меняет)"""
+    items: List[FeedbackItem] = Field(..., min_length=1, max_length=50)
+
 @router.post("/profiles/{profile_id}/like", response_model=LikeResponse)
 async def like_profile_endpoint(
     profile_id: int,
@@ -91,29 +106,81 @@ async def respond_to_like_endpoint(
         logger.error(f"Error responding to like: {e}", exc_info=True, extra={"user_id": current_user_id, "target_user_id": request.targetUserId})
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/matches/feedback")
+async def submit_feedback_endpoint(
+    request: FeedbackRequest,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """
+    Отметки полезности коннекта собеседникам по мэтчам (пачкой)
+    
+    Собеседник задаётся user_id - как в профилях списка /api/matches.
+    Идемпотентно: уже сохранённые отметки пропускаются и считаются в duplicates.
+    """
+    try:
+        created, duplicates = submit_feedback(
+            db, current_user_id, [(item.peerUserId, item.feedbackType) for item in request.items]
+        )
+        return {"created": created, "duplicates": duplicates}
+    except ValueError as e:
+        logger.warning(f"Feedback validation error: {e}", extra={"user_id": current_user_id})
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error submitting feedback: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/matches")
 async def get_matches_endpoint(
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    stream: Optional[str] = Query(None, pattern=STREAM_PATTERN),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id_required)
 ):
     """
     Получение списка мэтчей (взаимных лайков) для пользователя
     
-    Возвращает профили пользователей, с которыми есть взаимный лайк (мэтч)
+    Возвращает профили пользователей, с которыми есть взаимный лайк (мэтч).
+    Тело - массив профилей (новые сверху); курсор следующей страницы
+    приходит в заголовке X-Next-Cursor. ETag - по составу страницы и
+    версиям профилей; при совпадении If-None-Match - 304.
+    ?stream=json|ndjson (или Accept: application/x-ndjson) - весь список
+    после cursor потоком, без limit, ETag и X-Next-Cursor (см. app/streaming.py).
     """
     try:
-        from app.routers.profiles import _profile_to_dict
+        from app.routers.profiles import _profiles_to_dicts, _profile_rows_to_dicts
+        
+        fmt = stream_format(request, stream)
+        if fmt:
+            cursor_key = decode_cursor(cursor) if cursor else None
+            return stream_list(
+                fmt,
+                lambda: session_for_read(current_user_id),
+                lambda stream_db: matches_query(stream_db, current_user_id, cursor_key),
+                _profile_rows_to_dicts,
+                label="matches"
+            )
         
         logger.info(f"Getting matches for user_id: {current_user_id}")
-        profiles = get_matches(db, current_user_id)
+        profiles, next_cursor = get_matches(db, current_user_id, limit, cursor)
+        etag = list_etag(profiles, "matches", cursor, limit, next_cursor)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        headers = etag_headers(etag)
         
         if not profiles:
             logger.info(f"No matches found for user_id: {current_user_id}")
-            return JSONResponse(content=[])
+            return JSONResponse(content=[], headers=headers)
         
-        result = [_profile_to_dict(p) for p in profiles]
+        result = _profiles_to_dicts(db, profiles)
         logger.info(f"Returning {len(result)} matches for user_id: {current_user_id}")
-        return JSONResponse(content=result)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return JSONResponse(content=result, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting matches: {e}", exc_info=True, extra={"user_id": current_user_id})
         # Возвращаем пустой массив вместо ошибки, чтобы фронтенд не сломался
@@ -2,26 +2,44 @@
 Роутер для работы с профилями
 """
 from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import json
 import logging
-from app.dependencies import get_db, get_current_user_id_required
+from app.dependencies import get_db, get_read_db, get_current_user_id, get_current_user_id_required
+from app.db_routing import session_for_read
 
 logger = logging.getLogger(__name__)
 from app.services.profile_service import (
-    get_profile_by_user_id,
-    get_profile_by_id,
+    get_profile_version,
+    get_profile_shared,
     get_profiles_for_swipe,
     create_or_update_profile,
-    get_incoming_likes
+    get_incoming_likes,
+    count_incoming_likes,
+    deactivate_profile
 )
+from app.services.inbox_service import inbox_query
+from app.services.search_service import search_profiles
+from app.services import tag_service
+from app.services.facet_service import get_facets
+from app.services.lookup_service import lookup_profiles, autocomplete
+from app.services import profile_stats_service, feedback_service
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor
+from app.streaming import STREAM_PATTERN, stream_format, stream_list
+from app.etags import profile_etag, list_etag, etag_matches, not_modified, etag_headers
 
 router = APIRouter(prefix="/api/profiles", tags=["profiles"])
 
-def _profile_to_dict(profile):
-    """Преобразует профиль в словарь"""
+def _profile_to_dict(profile, feedback: Optional[dict] = None):
+    """
+    Преобразует профиль в словарь
+
+    Интересы и цели раскодируются из interest_ids/goal_ids через кэш словаря
+    tags - перед вызовом нужен tag_service.prime() (см. _profiles_to_dicts).
+    feedback - полученные отметки полезности по типам (feedback_service).
+    """
     def normalize_field(value):
         if value is None:
             return []
@@ -46,87 +64,332 @@ def _profile_to_dict(profile):
         "age": profile.age,
         "city": profile.city,
         "university": profile.university,
-        "interests": normalize_field(profile.interests),
-        "goals": normalize_field(profile.goals),
+        "interests": tag_service.decode(profile.interest_ids) if profile.interest_ids is not None else normalize_field(profile.interests),
+        "goals": tag_service.decode(profile.goal_ids) if profile.goal_ids is not None else normalize_field(profile.goals),
         "bio": profile.bio,
         "photo_url": profile.photo_url,
         "created_at": profile.created_at.isoformat() if profile.created_at else None,
         "updated_at": profile.updated_at.isoformat() if profile.updated_at else None,
+        "feedback": feedback or {},
     }
 
+def _profiles_to_dicts(db: Session, profiles) -> list:
+    """Преобразует пачку профилей: id словаря и счётчики отметок - одним запросом на пачку"""
+    tag_service.prime(db, profiles)
+    feedback = feedback_service.get_counts_many(db, profiles)
+    return [_profile_to_dict(p, feedback.get(p.user_id)) for p in profiles]
+
+def _profile_rows_to_dicts(db: Session, rows) -> list:
+    """Порция строк (Profile, ключ сортировки...) потокового списка"""
+    return _profiles_to_dicts(db, [row[0] for row in rows])
+
 @router.get("")
 async def get_profiles(
+    request: Request,
     page: int = Query(0, ge=0),
     size: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id_required)
 ):
     """
     Получение списка профилей для свайпа
     
-    Возвращает профили, которые пользователь ещё не свайпнул
+    Возвращает профили, которые пользователь ещё не свайпнул.
+    ETag - по составу страницы и версиям профилей; при совпадении
+    If-None-Match - 304 без сериализации.
     """
     try:
         profiles = get_profiles_for_swipe(db, current_user_id, page, size)
-        result = [_profile_to_dict(p) for p in profiles]
+        etag = list_etag(profiles, "deck", page, size)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        result = _profiles_to_dicts(db, profiles)
         return JSONResponse(content={
             "items": result,
             "page": page,
             "size": size,
             "total": len(result),
             "has_more": len(result) == size
-        })
+        }, headers=etag_headers(etag))
     except Exception as e:
         logger.error(f"Error getting profiles for swipe: {e}", exc_info=True, extra={"user_id": current_user_id, "page": page, "size": size})
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/incoming-likes")
 async def get_incoming_likes_endpoint(
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    stream: Optional[str] = Query(None, pattern=STREAM_PATTERN),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id_required)
 ):
     """
     Получение списка пользователей, которые лайкнули текущего пользователя
     
-    Возвращает профили тех, кто лайкнул пользователя, но пользователь ещё не ответил
+    Возвращает профили тех, кто лайкнул пользователя, но пользователь ещё не ответил.
+    Тело - массив профилей (новые сверху); если есть следующая страница,
+    её курсор приходит в заголовке X-Next-Cursor.
+    ?stream=json|ndjson (или Accept: application/x-ndjson) - весь список
+    после cursor потоком, без limit и X-Next-Cursor (см. app/streaming.py).
     """
-    print(f"🎯 [INCOMING-LIKES] Функция вызвана, user_id={current_user_id}")
     logger.info(f"📥 Запрос входящих лайков для user_id={current_user_id}")
     try:
-        profiles = get_incoming_likes(db, current_user_id)
-        result = [_profile_to_dict(p) for p in profiles]
+        fmt = stream_format(request, stream)
+        if fmt:
+            cursor_key = decode_cursor(cursor) if cursor else None
+            return stream_list(
+                fmt,
+                lambda: session_for_read(current_user_id),
+                lambda stream_db: inbox_query(stream_db, current_user_id, cursor_key),
+                _profile_rows_to_dicts,
+                label="incoming-likes"
+            )
+        profiles, next_cursor = get_incoming_likes(db, current_user_id, limit, cursor)
+        result = _profiles_to_dicts(db, profiles)
         logger.info(f"✅ Найдено входящих лайков: {len(result)}")
-        print(f"✅ [INCOMING-LIKES] Успешно, найдено: {len(result)}")
-        return JSONResponse(content=result)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return JSONResponse(content=result, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"❌ Error getting incoming likes: {e}", exc_info=True, extra={"user_id": current_user_id})
-        print(f"❌ [INCOMING-LIKES] Ошибка: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/incoming-likes/count")
+async def get_incoming_likes_count_endpoint(
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """Количество неотвеченных входящих лайков (для бейджа)"""
+    try:
+        return {"count": count_incoming_likes(db, current_user_id)}
+    except Exception as e:
+        logger.error(f"Error counting incoming likes: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/search")
+async def search_profiles_endpoint(
+    city: Optional[str] = Query(None, max_length=255),
+    university: Optional[str] = Query(None, max_length=255),
+    gender: Optional[str] = Query(None, pattern="^(male|female|other)$"),
+    min_age: Optional[int] = Query(None, ge=15, le=50),
+    max_age: Optional[int] = Query(None, ge=15, le=50),
+    interests: Optional[List[str]] = Query(None),
+    goals: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """
+    Поиск профилей по фильтрам (через SQL-функцию search_profiles)
+    
+    interests и goals передаются повторяющимися параметрами
+    (?interests=IT&interests=Спорт) и совпадают хотя бы по одному значению.
+    Уже свайпнутые профили и мэтчи исключаются. Тело - массив профилей,
+    курсор следующей страницы - в заголовке X-Next-Cursor.
+    """
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise HTTPException(status_code=400, detail="min_age must be less than or equal to max_age")
+    try:
+        profiles, next_cursor = search_profiles(
+            db,
+            current_user_id,
+            city=city,
+            university=university,
+            gender=gender,
+            min_age=min_age,
+            max_age=max_age,
+            interests=interests,
+            goals=goals,
+            limit=limit,
+            cursor=cursor
+        )
+        result = _profiles_to_dicts(db, profiles)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return JSONResponse(content=result, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Error searching profiles: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/lookup")
+async def lookup_profiles_endpoint(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """
+    Нечёткий поиск профилей по имени, username, университету и городу
+    
+    Использует триграммы pg_trgm (опечатки, части слов); самые похожие сверху.
+    """
+    try:
+        profiles = lookup_profiles(db, current_user_id, q, limit)
+        return JSONResponse(content=_profiles_to_dicts(db, profiles))
+    except Exception as e:
+        logger.error(f"❌ Error looking up profiles: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/autocomplete")
+async def autocomplete_endpoint(
+    field: str = Query(..., pattern="^(university|city)$"),
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Подсказки университетов и городов для формы профиля
+    
+    Отдаётся из индекса в памяти: самые частые написания, начинающиеся
+    с prefix (или у которых с него начинается любое слово).
+    """
+    try:
+        return {"field": field, "suggestions": autocomplete(db, field, prefix, limit)}
+    except Exception as e:
+        logger.error(f"❌ Error building autocomplete: {e}", exc_info=True, extra={"field": field})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/facets")
+async def get_facets_endpoint(request: Request, db: Session = Depends(get_read_db)):
+    """
+    Фасеты для фильтров и формы профиля: города, университеты, интересы
+    и цели с количеством активных профилей (по убыванию)
+    
+    Отдаётся из счётчиков в памяти с ETag; при совпадении If-None-Match - 304.
+    """
+    try:
+        etag, body = get_facets(db)
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except Exception as e:
+        logger.error(f"❌ Error getting facets: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/me/stats")
+async def get_my_stats_endpoint(
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """Статистика текущего пользователя: лайки полученные и отправленные, мэтчи"""
+    try:
+        return profile_stats_service.get_stats(db, current_user_id)
+    except Exception as e:
+        logger.error(f"❌ Error getting profile stats: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/me/deactivate")
+async def deactivate_my_profile_endpoint(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """
+    Скрытие профиля текущего пользователя
+
+    Профиль сразу пропадает из колоды, поиска и входящих лайков; данные
+    сохраняются, повторное сохранение профиля (POST /api/profiles) его возвращает.
+    """
+    try:
+        profile = deactivate_profile(db, current_user_id)
+    except Exception as e:
+        logger.error(f"❌ Error deactivating profile: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"status": "deactivated", "profile_id": profile.id}
+
+@router.delete("/me", status_code=202)
+async def delete_my_profile_endpoint(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id_required)
+):
+    """
+    Удаление профиля текущего пользователя
+
+    Профиль скрывается сразу (deleted_at), а свайпы, мэтчи, отметки и фото
+    удаляются фоновой очисткой пачками через PROFILE_PURGE_DELAY_SECONDS.
+    До очистки повторное сохранение профиля отменяет удаление.
+    """
+    try:
+        profile = deactivate_profile(db, current_user_id, delete=True)
+    except Exception as e:
+        logger.error(f"❌ Error deleting profile: {e}", exc_info=True, extra={"user_id": current_user_id})
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"status": "deleted", "profile_id": profile.id}
+
 @router.get("/user/{user_id}")
-async def get_profile_by_user_id_endpoint(user_id: int, db: Session = Depends(get_db)):
-    """Получение профиля по user_id"""
-    profile = get_profile_by_user_id(db, user_id)
+async def get_profile_by_user_id_endpoint(
+    user_id: int,
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user_id: Optional[int] = Depends(get_current_user_id)
+):
+    """
+    Получение профиля по user_id
+    
+    Сильный ETag из (id, updated_at): на If-None-Match с известной версией
+    отвечает 304 без чтения строки профиля. Одновременные запросы одного
+    профиля объединяются в одну загрузку (single-flight).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = get_profile_version(db, user_id=user_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        etag = profile_etag(*version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, public=True)
+    
+    profile = await get_profile_shared(user_id=user_id, reader_user_id=current_user_id)
     
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    result = _profile_to_dict(profile)
-    return JSONResponse(content=result)
+    result = _profiles_to_dicts(db, [profile])[0]
+    etag = profile_etag(profile.id, profile.updated_at or profile.created_at)
+    return JSONResponse(content=result, headers=etag_headers(etag, public=True))
 
 @router.get("/{profile_id}")
-async def get_profile_by_id_endpoint(profile_id: int, db: Session = Depends(get_db)):
-    """Получение профиля по ID"""
+async def get_profile_by_id_endpoint(
+    profile_id: int,
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user_id: Optional[int] = Depends(get_current_user_id)
+):
+    """
+    Получение профиля по ID
+    
+    Сильный ETag из (id, updated_at): на If-None-Match с известной версией
+    отвечает 304 без чтения строки профиля. Одновременные запросы одного
+    профиля объединяются в одну загрузку (single-flight).
+    """
     try:
-        profile = get_profile_by_id(db, profile_id)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = get_profile_version(db, profile_id=profile_id)
+            if version is None:
+                raise HTTPException(status_code=404, detail="Profile not found")
+            etag = profile_etag(*version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, public=True)
+        
+        profile = await get_profile_shared(profile_id=profile_id, reader_user_id=current_user_id)
         
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        result = _profile_to_dict(profile)
-        return JSONResponse(content=result)
+        result = _profiles_to_dicts(db, [profile])[0]
+        etag = profile_etag(profile.id, profile.updated_at or profile.created_at)
+        return JSONResponse(content=result, headers=etag_headers(etag, public=True))
     except HTTPException:
         raise
     except Exception as e:
@@ -175,7 +438,7 @@ async def create_or_update_profile_endpoint(
             photo=photo
         )
         
-        result = _profile_to_dict(profile)
+        result = _profiles_to_dicts(db, [profile])[0]
         return JSONResponse(content=result)
     except HTTPException:
         raise
@@ -0,0 +1,519 @@
+"""
+Массовая загрузка и выгрузка профилей, свайпов и мэтчей (bulk_io.py)
+
+Загрузка идёт пачками, каждая - своя транзакция:
+1. Проверка пачки векторно (NumPy): диапазоны, допустимые значения, длины
+   строк и повторы ключей - маски по столбцам вместо проверки каждой
+   записи; отклонённые записи возвращаются с номером строки и причиной.
+2. COPY FROM STDIN во временную таблицу (ON COMMIT DROP, без индексов).
+3. INSERT ... SELECT ... ON CONFLICT DO NOTHING в рабочую таблицу: уже
+   существующие записи и записи со ссылкой на отсутствующий профиль
+   пропускаются, поэтому повторный запуск безопасен.
+4. Производные данные - как в транзакции свайпа/мэтча: инбокс входящих
+   лайков, рёбра мэтчей, profile_stats - операторами по всей временной
+   таблице. Счётчики table_counters обновляют триггеры уровня оператора.
+
+Ссылки на пользователей в файлах - user_id, а не id профилей, поэтому
+выгрузку можно загрузить в другую базу. Мэтчи из свайпов не выводятся -
+они загружаются своим файлом. Индекс колоды, фасеты и автодополнение
+работающих воркеров подтягивают загруженные профили при плановом
+перестроении (RANKING_REFRESH_SECONDS и т.п.).
+
+Выгрузка читает серверным курсором (yield_per) и пишет NDJSON или CSV
+порциями - память не зависит от размера таблицы.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services import tag_service
+
+KINDS = ("profiles", "swipes", "matches")
+FORMATS = ("ndjson", "csv")
+
+GENDERS = ("male", "female", "other")
+MIN_AGE, MAX_AGE = 15, 50
+MAX_TEXT_LENGTH = 255
+MAX_BIO_LENGTH = 300
+SWIPE_ACTIONS = ("like", "pass")
+
+# Поля файлов (порядок столбцов CSV)
+PROFILE_FIELDS = (
+    "user_id", "username", "first_name", "last_name", "name", "gender", "age", "city", "university",
+    "interests", "goals", "bio", "photo_url", "is_active", "created_at"
+)
+SWIPE_FIELDS = ("user_id", "target_user_id", "action", "created_at")
+MATCH_FIELDS = ("user1_id", "user2_id", "matched_at")
+
+_PROFILE_STAGE_COLUMNS = (
+    "user_id", "username", "first_name", "last_name", "name", "gender", "age", "city", "university",
+    "interests", "goals", "interest_ids", "goal_ids", "bio", "photo_url", "is_active", "created_at"
+)
+
+@dataclass
+class ImportResult:
+    """Итог загрузки: прочитано, вставлено, пропущено базой (уже есть / нет профиля), отклонено проверкой"""
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+# ============================================================================
+# ЧТЕНИЕ ФАЙЛОВ
+# ============================================================================
+
+def read_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, dict]]:
+    """(номер строки, запись) из NDJSON или CSV; пустые строки NDJSON пропускаются"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items()}
+        return
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, {"__error__": f"некорректный JSON: {e.msg}"}
+            continue
+        yield line_no, record if isinstance(record, dict) else {"__error__": "ожидался JSON-объект"}
+
+def _batches(records: Iterable[Tuple[int, dict]], size: int) -> Iterator[List[Tuple[int, dict]]]:
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _to_int(value) -> int:
+    """Целое из JSON/CSV; -1 для пустого или некорректного значения (отсекается проверкой)"""
+    if isinstance(value, bool):
+        return -1
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+def _to_list(value) -> List[str]:
+    """Список интересов/целей: JSON-массив (NDJSON) или строка с JSON-массивом (CSV)"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return tag_service.clean_values(value) if isinstance(value, list) else []
+
+def _to_bool(value) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes")
+
+# ============================================================================
+# ВЕКТОРНАЯ ПРОВЕРКА
+# ============================================================================
+
+def _int_column(records: Sequence[dict], key: str) -> np.ndarray:
+    return np.fromiter((_to_int(record.get(key)) for record in records), dtype=np.int64, count=len(records))
+
+def _str_column(records: Sequence[dict], key: str) -> np.ndarray:
+    return np.array([str(record.get(key) or "").strip() for record in records], dtype=object)
+
+def _length_between(values: np.ndarray, low: int, high: int) -> np.ndarray:
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    return (lengths >= low) & (lengths <= high)
+
+def _first_occurrence(keys: np.ndarray) -> np.ndarray:
+    """Маска первых вхождений ключа (строки или пары) в пачке"""
+    mask = np.zeros(len(keys), dtype=bool)
+    if len(keys):
+        _, first = np.unique(keys, axis=0, return_index=True)
+        mask[first] = True
+    return mask
+
+def _apply_checks(
+    batch: Sequence[Tuple[int, dict]],
+    checks: Callable[[List[dict]], List[Tuple[np.ndarray, str]]],
+    errors: List[Tuple[int, str]]
+) -> np.ndarray:
+    """
+    Индексы записей пачки, прошедших все проверки
+
+    checks строит маски (True - запись годна) по столбцам пачки; запись
+    отклоняется с причиной первой непройденной проверки.
+    """
+    records = [record for _, record in batch]
+    ok = np.fromiter(("__error__" not in record for record in records), dtype=bool, count=len(records))
+    rejected = [(batch[i][0], records[i]["__error__"]) for i in np.flatnonzero(~ok)]
+    for mask, reason in checks(records):
+        rejected.extend((batch[i][0], reason) for i in np.flatnonzero(ok & ~mask))
+        ok &= mask
+    errors.extend(sorted(rejected))
+    return np.flatnonzero(ok)
+
+def _profile_checks(records: List[dict]) -> List[Tuple[np.ndarray, str]]:
+    user_ids = _int_column(records, "user_id")
+    ages = _int_column(records, "age")
+    genders = _str_column(records, "gender")
+    bios = np.array([str(record.get("bio") or "") for record in records], dtype=object)
+    return [
+        (user_ids > 0, "user_id: положительное целое"),
+        (np.isin(genders, GENDERS), "gender: male, female или other"),
+        ((ages >= MIN_AGE) & (ages <= MAX_AGE), f"age: от {MIN_AGE} до {MAX_AGE}"),
+        (_length_between(_str_column(records, "name"), 1, MAX_TEXT_LENGTH), "name: от 1 до 255 символов"),
+        (_length_between(_str_column(records, "city"), 1, MAX_TEXT_LENGTH), "city: от 1 до 255 символов"),
+        (_length_between(_str_column(records, "university"), 1, MAX_TEXT_LENGTH), "university: от 1 до 255 символов"),
+        (_length_between(bios, 0, MAX_BIO_LENGTH), "bio: не больше 300 символов"),
+        (_first_occurrence(user_ids), "повтор user_id в пачке"),
+    ]
+
+def _swipe_checks(records: List[dict]) -> List[Tuple[np.ndarray, str]]:
+    user_ids = _int_column(records, "user_id")
+    target_ids = _int_column(records, "target_user_id")
+    return [
+        ((user_ids > 0) & (target_ids > 0), "user_id, target_user_id: положительные целые"),
+        (user_ids != target_ids, "свайп собственного профиля"),
+        (np.isin(_str_column(records, "action"), SWIPE_ACTIONS), "action: like или pass"),
+        (_first_occurrence(np.column_stack((user_ids, target_ids))), "повтор свайпа в пачке"),
+    ]
+
+def _match_checks(records: List[dict]) -> List[Tuple[np.ndarray, str]]:
+    user1_ids = _int_column(records, "user1_id")
+    user2_ids = _int_column(records, "user2_id")
+    pairs = np.column_stack((np.minimum(user1_ids, user2_ids), np.maximum(user1_ids, user2_ids)))
+    return [
+        ((user1_ids > 0) & (user2_ids > 0), "user1_id, user2_id: положительные целые"),
+        (user1_ids != user2_ids, "мэтч пользователя с самим собой"),
+        (_first_occurrence(pairs), "повтор мэтча в пачке"),
+    ]
+
+# ============================================================================
+# COPY
+# ============================================================================
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _pg_array(values: Sequence[int]) -> str:
+    return "{" + ",".join(str(value) for value in values) + "}"
+
+def _copy(db: Session, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> None:
+    """COPY строк во временную таблицу в транзакции db (пустая строка CSV - NULL)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = db.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+# ============================================================================
+# ЗАГРУЗКА
+# ============================================================================
+
+_PROFILES_STAGE_SQL = text("""
+    CREATE TEMP TABLE _import_profiles ON COMMIT DROP AS
+    SELECT user_id, username, first_name, last_name, name, gender, age, city, university,
+        interests, goals, interest_ids, goal_ids, bio, photo_url, is_active, created_at
+    FROM profiles WITH NO DATA
+""")
+
+_PROFILES_INSERT_SQL = text("""
+    INSERT INTO profiles (
+        user_id, username, first_name, last_name, name, gender, age, city, university,
+        interests, goals, interest_ids, goal_ids, bio, photo_url, is_active, created_at, updated_at
+    )
+    SELECT user_id, username, first_name, last_name, name, gender, age, city, university,
+        interests, goals, interest_ids, goal_ids, bio, photo_url,
+        COALESCE(is_active, TRUE), COALESCE(created_at, :now), :now
+    FROM _import_profiles
+    ON CONFLICT (user_id) DO NOTHING
+""")
+
+_SWIPES_STAGE_SQL = text("""
+    CREATE TEMP TABLE _import_swipes (
+        user_id BIGINT NOT NULL,
+        target_user_id BIGINT NOT NULL,
+        action VARCHAR(10) NOT NULL,
+        created_at TIMESTAMP,
+        inserted BOOLEAN NOT NULL DEFAULT FALSE
+    ) ON COMMIT DROP
+""")
+
+# Свайп по профилю target_user_id; пропуск профиля из архива пропусков не повторяется
+_SWIPES_INSERT_SQL = text("""
+    WITH ins AS (
+        INSERT INTO swipes (user_id, target_profile_id, action, created_at)
+        SELECT s.user_id, p.id, s.action, COALESCE(s.created_at, :now)
+        FROM _import_swipes s
+        JOIN profiles p ON p.user_id = s.target_user_id
+        WHERE s.action = 'like' OR NOT EXISTS (
+            SELECT 1 FROM swipe_exclusions x
+            WHERE x.user_id = s.user_id AND x.profile_ids @> ARRAY[p.id]
+        )
+        ON CONFLICT (user_id, target_profile_id) DO NOTHING
+        RETURNING user_id, target_profile_id
+    )
+    UPDATE _import_swipes s SET inserted = TRUE
+    FROM ins JOIN profiles p ON p.id = ins.target_profile_id
+    WHERE s.user_id = ins.user_id AND s.target_user_id = p.user_id
+""")
+
+# Инбокс - как inbox_service.apply_swipe: свайп отвечает на входящий лайк от цели,
+# а лайк попадает в инбокс цели, если она ещё не свайпала профиль лайкнувшего
+_SWIPES_INBOX_ANSWERED_SQL = text("""
+    DELETE FROM incoming_likes i USING _import_swipes s
+    WHERE s.inserted AND i.owner_user_id = s.user_id AND i.liker_user_id = s.target_user_id
+""")
+
+_SWIPES_INBOX_INSERT_SQL = text("""
+    INSERT INTO incoming_likes (owner_user_id, liker_user_id, liker_profile_id, liked_at)
+    SELECT s.target_user_id, s.user_id, lp.id, COALESCE(s.created_at, :now)
+    FROM _import_swipes s
+    JOIN profiles lp ON lp.user_id = s.user_id
+    WHERE s.inserted AND s.action = 'like'
+        AND NOT EXISTS (
+            SELECT 1 FROM swipes r WHERE r.user_id = s.target_user_id AND r.target_profile_id = lp.id
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM swipe_exclusions x
+            WHERE x.user_id = s.target_user_id AND x.profile_ids @> ARRAY[lp.id]
+        )
+    ON CONFLICT (owner_user_id, liker_user_id) DO NOTHING
+""")
+
+# profile_stats одним оператором по пачке (в порядке user_id, как profile_stats_service)
+_SWIPES_STATS_SQL = text("""
+    INSERT INTO profile_stats (user_id, likes_received, likes_sent, matches_count, updated_at)
+    SELECT user_id, SUM(received), SUM(sent), 0, :now
+    FROM (
+        SELECT user_id, 0 AS received, 1 AS sent FROM _import_swipes WHERE inserted AND action = 'like'
+        UNION ALL
+        SELECT target_user_id, 1, 0 FROM _import_swipes WHERE inserted AND action = 'like'
+    ) likes
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        likes_received = profile_stats.likes_received + EXCLUDED.likes_received,
+        likes_sent = profile_stats.likes_sent + EXCLUDED.likes_sent,
+        updated_at = EXCLUDED.updated_at
+""")
+
+_SWIPES_INSERTED_SQL = text("SELECT COUNT(*) FROM _import_swipes WHERE inserted")
+
+_MATCHES_STAGE_SQL = text("""
+    CREATE TEMP TABLE _import_matches (
+        user1_id BIGINT NOT NULL,
+        user2_id BIGINT NOT NULL,
+        matched_at TIMESTAMP
+    ) ON COMMIT DROP
+""")
+
+# Мэтч, оба ребра и matches_count одним оператором (как match_service._create_match)
+_MATCHES_INSERT_SQL = text("""
+    WITH ins AS (
+        INSERT INTO matches (user1_id, user2_id, matched_at)
+        SELECT m.user1_id, m.user2_id, COALESCE(m.matched_at, :now)
+        FROM _import_matches m
+        WHERE EXISTS (SELECT 1 FROM profiles p WHERE p.user_id = m.user1_id)
+            AND EXISTS (SELECT 1 FROM profiles p WHERE p.user_id = m.user2_id)
+        ON CONFLICT (user1_id, user2_id) DO NOTHING
+        RETURNING id, user1_id, user2_id, matched_at
+    ), edges AS (
+        INSERT INTO match_edges (user_id, peer_user_id, match_id, matched_at)
+        SELECT user1_id, user2_id, id, matched_at FROM ins
+        UNION ALL
+        SELECT user2_id, user1_id, id, matched_at FROM ins
+        ON CONFLICT (user_id, peer_user_id) DO NOTHING
+    ), stats AS (
+        INSERT INTO profile_stats (user_id, likes_received, likes_sent, matches_count, updated_at)
+        SELECT user_id, 0, 0, COUNT(*), :now
+        FROM (SELECT user1_id AS user_id FROM ins UNION ALL SELECT user2_id FROM ins) matched
+        GROUP BY user_id
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            matches_count = profile_stats.matches_count + EXCLUDED.matches_count,
+            updated_at = EXCLUDED.updated_at
+    )
+    SELECT COUNT(*) FROM ins
+""")
+
+def _load_profiles(db: Session, records: List[dict], now: datetime) -> int:
+    interests = [_to_list(record.get("interests")) for record in records]
+    goals = [_to_list(record.get("goals")) for record in records]
+    interest_ids = tag_service.encode_many(db, tag_service.KIND_INTEREST, interests)
+    goal_ids = tag_service.encode_many(db, tag_service.KIND_GOAL, goals)
+    rows = (
+        (
+            _to_int(record["user_id"]), record.get("username"), record.get("first_name"), record.get("last_name"),
+            str(record["name"]).strip(), str(record["gender"]).strip(), _to_int(record["age"]),
+            str(record["city"]).strip(), str(record["university"]).strip(),
+            json.dumps(interests[i], ensure_ascii=False), json.dumps(goals[i], ensure_ascii=False),
+            _pg_array(interest_ids[i]), _pg_array(goal_ids[i]),
+            record.get("bio") or None, record.get("photo_url") or None,
+            _to_bool(record.get("is_active")), _csv_value(record.get("created_at"))
+        )
+        for i, record in enumerate(records)
+    )
+    db.execute(_PROFILES_STAGE_SQL)
+    _copy(db, "_import_profiles", _PROFILE_STAGE_COLUMNS, rows)
+    return db.execute(_PROFILES_INSERT_SQL, {"now": now}).rowcount
+
+def _load_swipes(db: Session, records: List[dict], now: datetime) -> int:
+    rows = (
+        (
+            _to_int(record["user_id"]), _to_int(record["target_user_id"]),
+            str(record["action"]).strip(), _csv_value(record.get("created_at"))
+        )
+        for record in records
+    )
+    db.execute(_SWIPES_STAGE_SQL)
+    _copy(db, "_import_swipes", SWIPE_FIELDS, rows)
+    db.execute(_SWIPES_INSERT_SQL, {"now": now})
+    inserted = db.execute(_SWIPES_INSERTED_SQL).scalar()
+    if inserted:
+        db.execute(_SWIPES_INBOX_ANSWERED_SQL)
+        db.execute(_SWIPES_INBOX_INSERT_SQL, {"now": now})
+        db.execute(_SWIPES_STATS_SQL, {"now": now})
+    return inserted
+
+def _load_matches(db: Session, records: List[dict], now: datetime) -> int:
+    rows = []
+    for record in records:
+        user_a, user_b = _to_int(record["user1_id"]), _to_int(record["user2_id"])
+        rows.append((min(user_a, user_b), max(user_a, user_b), _csv_value(record.get("matched_at"))))
+    db.execute(_MATCHES_STAGE_SQL)
+    _copy(db, "_import_matches", MATCH_FIELDS, rows)
+    return db.execute(_MATCHES_INSERT_SQL, {"now": now}).scalar()
+
+_LOADERS = {
+    "profiles": (_profile_checks, _load_profiles),
+    "swipes": (_swipe_checks, _load_swipes),
+    "matches": (_match_checks, _load_matches),
+}
+
+def import_records(
+    db: Session,
+    kind: str,
+    records: Iterable[Tuple[int, dict]],
+    batch_size: int = 10000,
+    on_batch: Optional[Callable[[ImportResult], None]] = None
+) -> ImportResult:
+    """
+    Загружает записи вида kind пачками по batch_size (commit после каждой пачки)
+
+    Отклонённые проверкой записи попадают в result.errors и не прерывают
+    загрузку; ошибка базы откатывает только текущую пачку и пробрасывается.
+    """
+    checks, load = _LOADERS[kind]
+    result = ImportResult()
+    for batch in _batches(records, batch_size):
+        result.read += len(batch)
+        valid = _apply_checks(batch, checks, result.errors)
+        if len(valid):
+            try:
+                inserted = load(db, [batch[i][1] for i in valid], datetime.utcnow())
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            result.inserted += inserted
+            result.skipped += len(valid) - inserted
+        if on_batch is not None:
+            on_batch(result)
+    return result
+
+# ============================================================================
+# ВЫГРУЗКА
+# ============================================================================
+
+_EXPORT_PROFILES_SQL = text("""
+    SELECT user_id, username, first_name, last_name, name, gender, age, city, university,
+        interest_ids, goal_ids, bio, photo_url, is_active, created_at
+    FROM profiles
+    WHERE deleted_at IS NULL
+    ORDER BY user_id
+""")
+
+# Архивные пропуски выгружаются обычными пропусками без даты
+_EXPORT_SWIPES_SQL = text("""
+    SELECT s.user_id, p.user_id AS target_user_id, s.action, s.created_at
+    FROM swipes s
+    JOIN profiles p ON p.id = s.target_profile_id
+    WHERE p.deleted_at IS NULL
+    UNION ALL
+    SELECT x.user_id, p.user_id, 'pass', NULL
+    FROM swipe_exclusions x
+    CROSS JOIN LATERAL unnest(x.profile_ids) AS t(profile_id)
+    JOIN profiles p ON p.id = t.profile_id
+    WHERE p.deleted_at IS NULL
+""")
+
+_EXPORT_MATCHES_SQL = text("""
+    SELECT user1_id, user2_id, matched_at FROM matches ORDER BY id
+""")
+
+def _profile_records(db: Session, rows: Sequence) -> List[dict]:
+    # Столбцы запроса идут в порядке PROFILE_FIELDS, на месте interests/goals - id словаря
+    records = [dict(zip(PROFILE_FIELDS, row)) for row in rows]
+    tag_service.prime_ids(db, (tag_id for record in records for tag_id in (*record["interests"], *record["goals"])))
+    for record in records:
+        record["interests"] = tag_service.decode(record["interests"])
+        record["goals"] = tag_service.decode(record["goals"])
+    return records
+
+_EXPORTS = {
+    "profiles": (_EXPORT_PROFILES_SQL, PROFILE_FIELDS, _profile_records),
+    "swipes": (_EXPORT_SWIPES_SQL, SWIPE_FIELDS, None),
+    "matches": (_EXPORT_MATCHES_SQL, MATCH_FIELDS, None),
+}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+def export_records(db: Session, kind: str, fmt: str, out: IO[str], chunk_size: int = 5000) -> int:
+    """
+    Пишет все записи вида kind в out (NDJSON или CSV), возвращает их число
+
+    Строки читаются серверным курсором порциями по chunk_size, каждая
+    порция сериализуется и пишется одним вызовом write.
+    """
+    statement, fields, convert = _EXPORTS[kind]
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(fields)
+    total = 0
+    result = db.execute(statement, execution_options={"yield_per": chunk_size})
+    for rows in result.partitions(chunk_size):
+        records = convert(db, rows) if convert else [dict(zip(fields, row)) for row in rows]
+        if writer is not None:
+            writer.writerows([_csv_value(record[name]) for name in fields] for record in records)
+        else:
+            out.write("".join(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records))
+        total += len(records)
+    return total
@@ -0,0 +1,152 @@
+"""
+Фасеты профилей: города, университеты, интересы и цели с количеством
+
+Счётчики строятся одним проходом по активным профилям, хранятся в памяти
+процесса и точечно обновляются при сохранении профиля (старые значения -1,
+новые +1). Сериализованный ответ кэшируется до следующего изменения, ETag -
+хэш тела: у одинаковых фасетов он один во всех воркерах и после перестроек,
+а повторное чтение стоит сравнения строки.
+Раз в FACETS_REFRESH_SECONDS счётчики перестраиваются заново, чтобы
+подтянуть изменения, сделанные другими воркерами.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import Profile
+from app.etags import body_etag
+from app.services import tag_service
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("cities", "universities", "interests", "goals")
+
+@dataclass(frozen=True)
+class ProfileFacets:
+    """Значения профиля, влияющие на фасеты (снимок до/после изменения)"""
+    active: bool
+    city: Optional[str]
+    university: Optional[str]
+    interest_ids: Tuple[int, ...]
+    goal_ids: Tuple[int, ...]
+
+def snapshot(profile: Optional[Profile]) -> Optional[ProfileFacets]:
+    """Снимок фасетных значений профиля (None, если профиля нет)"""
+    if profile is None:
+        return None
+    return ProfileFacets(
+        active=bool(profile.is_active) and profile.deleted_at is None,
+        city=(profile.city or "").strip() or None,
+        university=(profile.university or "").strip() or None,
+        interest_ids=tuple(profile.interest_ids or ()),
+        goal_ids=tuple(profile.goal_ids or ()),
+    )
+
+class FacetCounts:
+    """Счётчики фасетов одного процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Counter] = {facet: Counter() for facet in FACETS}
+        # Растёт при каждом изменении счётчиков: тело, сериализованное до
+        # изменения, не кэшируется
+        self._version = 0
+        self._payload: Optional[Tuple[str, bytes]] = None
+        self.built_at: Optional[float] = None
+
+    def load(self, counts: Dict[str, Iterable[Tuple[object, int]]]) -> None:
+        with self._lock:
+            for facet in FACETS:
+                self._counts[facet] = Counter({key: n for key, n in counts.get(facet, ()) if key is not None and n > 0})
+            self._version += 1
+            self._payload = None
+        self.built_at = time.monotonic()
+
+    def _apply(self, values: ProfileFacets, delta: int) -> None:
+        if not values.active:
+            return
+        if values.city:
+            self._counts["cities"][values.city] += delta
+        if values.university:
+            self._counts["universities"][values.university] += delta
+        for tag_id in values.interest_ids:
+            self._counts["interests"][tag_id] += delta
+        for tag_id in values.goal_ids:
+            self._counts["goals"][tag_id] += delta
+
+    def update(self, old: Optional[ProfileFacets], new: Optional[ProfileFacets]) -> None:
+        if old == new:
+            return
+        with self._lock:
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, +1)
+            for counter in self._counts.values():
+                # Удаляем обнулившиеся значения
+                counter += Counter()
+            self._version += 1
+            self._payload = None
+
+    def payload(self, db: Session) -> Tuple[str, bytes]:
+        """(etag, JSON-тело) - сериализуется только после изменения счётчиков"""
+        cached = self._payload
+        if cached is not None:
+            return cached
+        with self._lock:
+            counts = {facet: dict(counter) for facet, counter in self._counts.items()}
+            version = self._version
+        # id словаря tags -> значения (одним запросом для неизвестных id)
+        tag_service.prime_ids(db, list(counts["interests"]) + list(counts["goals"]))
+        body = {}
+        for facet, counter in counts.items():
+            items = sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+            if facet in ("interests", "goals"):
+                items = [(value, n) for tag_id, n in items for value in tag_service.decode([tag_id])]
+            body[facet] = [{"value": value, "count": n} for value, n in items]
+        content = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload = (body_etag(content), content)
+        with self._lock:
+            if self._version == version:
+                self._payload = payload
+        return payload
+
+_facets = FacetCounts()
+_build_lock = threading.Lock()
+
+def _build(db: Session) -> None:
+    started = time.perf_counter()
+    active = (Profile.is_active == True, Profile.deleted_at == None)
+    interest_id = func.unnest(Profile.interest_ids).label("tag_id")
+    goal_id = func.unnest(Profile.goal_ids).label("tag_id")
+    counts = {
+        "cities": db.query(Profile.city, func.count()).filter(*active).group_by(Profile.city).all(),
+        "universities": db.query(Profile.university, func.count()).filter(*active).group_by(Profile.university).all(),
+        "interests": db.query(interest_id, func.count()).filter(*active).group_by("tag_id").all(),
+        "goals": db.query(goal_id, func.count()).filter(*active).group_by("tag_id").all(),
+    }
+    _facets.load(counts)
+    logger.info(f"📊 Facets: счётчики построены за {(time.perf_counter() - started) * 1000:.0f}ms")
+
+def get_facets(db: Session) -> Tuple[str, bytes]:
+    """(etag, JSON-тело) фасетов; строит счётчики при первом обращении и по истечении FACETS_REFRESH_SECONDS"""
+    built_at = _facets.built_at
+    if built_at is None or time.monotonic() - built_at >= settings.FACETS_REFRESH_SECONDS:
+        with _build_lock:
+            built_at = _facets.built_at
+            if built_at is None or time.monotonic() - built_at >= settings.FACETS_REFRESH_SECONDS:
+                _build(db)
+    return _facets.payload(db)
+
+def on_profile_changed(old: Optional[ProfileFacets], profile: Optional[Profile]) -> None:
+    """Точечное обновление счётчиков после сохранения профиля (если они уже построены)"""
+    if _facets.built_at is not None:
+        _facets.update(old, snapshot(profile))
@@ -0,0 +1,176 @@
+"""
+Отметки полезности коннекта (connection_feedbacks) и их счётчики
+
+Пользователь отмечает собеседника по мэтчу (помог мне, я помог, общий
+проект, общее мероприятие). Пачка отметок пишется одним
+INSERT ... ON CONFLICT DO NOTHING RETURNING: повтор запроса ничего не
+меняет, а счётчики получателей (connection_feedback_counts) увеличиваются
+только на действительно вставленные строки - в той же транзакции.
+
+Счётчики встраиваются в ответы с профилями: get_counts_many() берёт их из
+кэша процесса, а недостающих пользователей страницы догружает одним
+запросом по первичному ключу. Новая отметка меняет updated_at профиля
+получателя (его ETag и кэш версий) и сбрасывает кэш счётчиков во всех
+воркерах. Счётчики в кэше помечены updated_at профиля, прочитанным тем же
+запросом, и отдаются только профилю той же версии: отставшая реплика не
+может закэшировать старые счётчики под новой версией (и новым ETag).
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.database import ConnectionFeedback, ConnectionFeedbackCount, MatchEdge, Profile, SessionLocal
+from app.services import realtime
+from app.services.profile_service import PROFILE_CHANGED_EVENT
+from config import settings
+
+FEEDBACK_TYPES = ("HELPED_ME", "I_HELPED", "PROJECT_TOGETHER", "EVENT_TOGETHER")
+FEEDBACK_CHANGED_EVENT = "feedback_changed"
+
+# user_id -> (updated_at профиля, {тип: количество} - все типы, включая нули)
+_counts = TTLCache(ttl=settings.FEEDBACK_CACHE_SECONDS, maxsize=settings.FEEDBACK_CACHE_MAX_KEYS)
+
+def _zeros() -> Dict[str, int]:
+    return {feedback_type: 0 for feedback_type in FEEDBACK_TYPES}
+
+def submit_feedback(db: Session, user_id: int, items: Iterable[Tuple[int, str]]) -> Tuple[int, int]:
+    """
+    Сохраняет пачку отметок (peer_user_id, feedback_type) от user_id (с транзакцией)
+
+    Собеседник задаётся user_id (он есть в каждом профиле списка мэтчей),
+    мэтч находится по ребру match_edges (user_id, peer_user_id). Собеседник
+    без мэтча или неизвестный тип - ValueError, ничего не сохраняется.
+    Возвращает (вставлено, уже было).
+    """
+    # Порядок вставки фиксирован: одновременные пачки одного пользователя не взаимоблокируются
+    items = sorted(set(items))
+    unknown = {feedback_type for _, feedback_type in items} - set(FEEDBACK_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown feedback type: {', '.join(sorted(unknown))}")
+    if not items:
+        return 0, 0
+
+    try:
+        peer_ids = {peer_user_id for peer_user_id, _ in items}
+        match_ids = {
+            row.peer_user_id: row.match_id
+            for row in db.query(MatchEdge.peer_user_id, MatchEdge.match_id).filter(
+                MatchEdge.user_id == user_id,
+                MatchEdge.peer_user_id.in_(peer_ids)
+            )
+        }
+        if len(match_ids) != len(peer_ids):
+            raise ValueError("Match not found")
+
+        rows = [
+            {"match_id": match_ids[peer_user_id], "from_user_id": user_id, "to_user_id": peer_user_id, "feedback_type": feedback_type}
+            for peer_user_id, feedback_type in items
+        ]
+        stmt = pg_insert(ConnectionFeedback.__table__).values(rows).on_conflict_do_nothing(
+            index_elements=["match_id", "from_user_id", "feedback_type"]
+        ).returning(ConnectionFeedback.to_user_id, ConnectionFeedback.feedback_type)
+        inserted = Counter((row.to_user_id, row.feedback_type) for row in db.execute(stmt))
+
+        if inserted:
+            _apply_counts(db, inserted)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    created = sum(inserted.values())
+    return created, len(items) - created
+
+def _apply_counts(db: Session, deltas: Dict[Tuple[int, str], int]) -> None:
+    """
+    Прибавляет дельты {(получатель, тип): n} к счётчикам (без commit)
+
+    Счётчики входят в тело профиля, поэтому у получателей меняется
+    updated_at (ETag и кэш версий), а кэш счётчиков сбрасывается после commit.
+    """
+    table = ConnectionFeedbackCount.__table__
+    counts_stmt = pg_insert(table).values([
+        {"user_id": to_user_id, "feedback_type": feedback_type, "count": n}
+        for (to_user_id, feedback_type), n in sorted(deltas.items())
+    ])
+    db.execute(counts_stmt.on_conflict_do_update(
+        index_elements=["user_id", "feedback_type"],
+        set_={"count": func.greatest(0, table.c.count + counts_stmt.excluded.count)}
+    ))
+    recipients = sorted({to_user_id for to_user_id, _ in deltas})
+    touched = db.execute(
+        update(Profile).where(Profile.user_id.in_(recipients))
+        .values(updated_at=datetime.utcnow())
+        .returning(Profile.user_id, Profile.id)
+    ).all()
+    for to_user_id in recipients:
+        realtime.publish(db, to_user_id, FEEDBACK_CHANGED_EVENT, {})
+    for to_user_id, profile_id in touched:
+        realtime.publish(db, to_user_id, PROFILE_CHANGED_EVENT, {"profile_id": profile_id})
+
+def remove_counts(db: Session, removed: Dict[Tuple[int, str], int]) -> None:
+    """Вычитает удалённые отметки {(получатель, тип): n} из счётчиков (без commit)"""
+    if removed:
+        _apply_counts(db, {key: -n for key, n in removed.items()})
+
+def _load_counts(db: Session, user_ids: List[int]) -> Dict[int, Tuple[Optional[datetime], Dict[str, int]]]:
+    """Счётчики и версия профиля (updated_at) пачки пользователей - одним запросом"""
+    loaded = {user_id: (None, _zeros()) for user_id in user_ids}
+    rows = db.query(
+        Profile.user_id,
+        Profile.updated_at,
+        ConnectionFeedbackCount.feedback_type,
+        ConnectionFeedbackCount.count
+    ).outerjoin(
+        ConnectionFeedbackCount, ConnectionFeedbackCount.user_id == Profile.user_id
+    ).filter(Profile.user_id.in_(user_ids))
+    for row in rows:
+        counts = loaded[row.user_id][1]
+        loaded[row.user_id] = (row.updated_at, counts)
+        if row.feedback_type in counts:
+            counts[row.feedback_type] = row.count
+    return loaded
+
+def get_counts_many(db: Session, profiles: Iterable[Profile]) -> Dict[int, Dict[str, int]]:
+    """
+    Счётчики пачки профилей (по user_id): из кэша процесса, недостающие -
+    одним запросом (и кладутся в кэш)
+
+    Если db - отставшая реплика (версия профиля в ней старше переданной),
+    счётчики этих пользователей перечитываются с primary.
+    """
+    versions = {profile.user_id: profile.updated_at for profile in profiles}
+    result = {}
+    missing = []
+    for user_id, version in versions.items():
+        cached = _counts.get(user_id)
+        if cached is not None and cached[0] == version:
+            result[user_id] = cached[1]
+        else:
+            missing.append(user_id)
+    if missing:
+        loaded = _load_counts(db, missing)
+        behind = [user_id for user_id in missing if loaded[user_id][0] != versions[user_id]]
+        if behind:
+            primary = SessionLocal()
+            try:
+                loaded.update(_load_counts(primary, behind))
+            finally:
+                primary.close()
+        for user_id in missing:
+            version, counts = loaded[user_id]
+            if version == versions[user_id]:
+                _counts.set(user_id, (version, counts))
+            result[user_id] = counts
+    return result
+
+def _forget_counts(user_id: int, data: dict) -> None:
+    _counts.delete(user_id)
+
+realtime.register_internal(FEEDBACK_CHANGED_EVENT, _forget_counts)
@@ -1,19 +1,27 @@
 """
 Сервис для работы с файлами
+
+В запросе фото только проверяется (размер, тип, заголовок изображения) и
+сохраняется как есть; масштабирование и перекодирование в JPEG
+(PHOTO_OPTIMIZE_JOB) и удаление заменённого фото (PHOTO_DELETE_JOB) - фоновые
+задачи (app/jobs.py). Отдельный worker.py должен видеть тот же UPLOAD_DIR.
 """
 from fastapi import UploadFile, HTTPException
 from pathlib import Path
 from datetime import datetime
+import os
 import shutil
-from PIL import Image
+from app import jobs
 from config import settings
 
-# Создание директории для загрузок
+# Директория для загрузок (создаётся при первой загрузке файла, а не при импорте)
 UPLOAD_DIR = Path(settings.UPLOAD_DIR)
-UPLOAD_DIR.mkdir(exist_ok=True)
+
+PHOTO_OPTIMIZE_JOB = "photo.optimize"
+PHOTO_DELETE_JOB = "photo.delete"
 
 def save_uploaded_file(file: UploadFile, user_id: int) -> str:
-    """Сохранение загруженного файла с валидацией и оптимизацией"""
+    """Сохранение загруженного файла с валидацией (оптимизация - задачей PHOTO_OPTIMIZE_JOB)"""
     # Проверка размера файла
     file.file.seek(0, 2)  # Переходим в конец файла
     file_size = file.file.tell()
@@ -48,6 +56,7 @@ def save_uploaded_file(file: UploadFile, user_id: int) -> str:
     # Создаём уникальное имя файла
     timestamp = int(datetime.utcnow().timestamp() * 1000)  # Миллисекунды для уникальности
     filename = f"{user_id}_{timestamp}{file_ext}"
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     file_path = UPLOAD_DIR / filename
     
     try:
@@ -55,34 +64,13 @@ def save_uploaded_file(file: UploadFile, user_id: int) -> str:
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Валидация и оптимизация изображения
+        # Валидация изображения (без декодирования пикселей - быстро)
         try:
-            img = Image.open(file_path)
-            img.verify()  # Проверяем, что файл действительно изображение
-            
-            # Открываем заново после verify (verify закрывает файл)
-            img = Image.open(file_path)
+            # Pillow импортируется только при загрузке фото - не замедляет старт воркера
+            from PIL import Image
             
-            # Проверка размеров (защита от слишком больших изображений)
-            max_dimension = 4000
-            if img.width > max_dimension or img.height > max_dimension:
-                # Масштабируем если слишком большое
-                ratio = min(max_dimension / img.width, max_dimension / img.height)
-                new_size = (int(img.width * ratio), int(img.height * ratio))
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
-            
-            # Конвертируем в RGB если нужно
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Сохраняем с оптимизацией
-            img.save(file_path, 'JPEG', quality=85, optimize=True)
+            with Image.open(file_path) as img:
+                img.verify()  # Проверяем, что файл действительно изображение
         except Exception as e:
             # Если оптимизация не удалась, удаляем файл
             if file_path.exists():
@@ -108,9 +96,45 @@ def save_uploaded_file(file: UploadFile, user_id: int) -> str:
             detail=f"Error saving file: {str(e)}"
         )
 
+def optimize_image(file_path: str) -> None:
+    """Масштабирует фото до 4000px и перекодирует в JPEG (на месте, атомарной заменой файла)"""
+    from PIL import Image
+    
+    full_path = Path(settings.UPLOAD_DIR) / Path(file_path).name
+    if not full_path.exists():
+        return  # Фото уже заменили и удалили
+    
+    img = Image.open(full_path)
+    
+    # Проверка размеров (защита от слишком больших изображений)
+    max_dimension = 4000
+    if img.width > max_dimension or img.height > max_dimension:
+        # Масштабируем если слишком большое
+        ratio = min(max_dimension / img.width, max_dimension / img.height)
+        new_size = (int(img.width * ratio), int(img.height * ratio))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+    
+    # Конвертируем в RGB если нужно
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Сохраняем с оптимизацией во временный файл: раздача не увидит недописанное фото
+    tmp_path = full_path.with_name(full_path.name + ".tmp")
+    img.save(tmp_path, 'JPEG', quality=85, optimize=True)
+    os.replace(tmp_path, full_path)
+
 def delete_file(file_path: str):
     """Удаление файла"""
     if file_path:
         full_path = Path(settings.UPLOAD_DIR) / Path(file_path).name
         if full_path.exists():
             full_path.unlink()
+
+jobs.register(PHOTO_OPTIMIZE_JOB, lambda payload: optimize_image(payload["photo_url"]))
+jobs.register(PHOTO_DELETE_JOB, lambda payload: delete_file(payload["photo_url"]))
@@ -0,0 +1,134 @@
+"""
+Сервис инбокса входящих лайков
+
+Таблица incoming_likes хранит ровно пары «лайкнул меня, я ещё не ответил».
+Она обновляется в той же транзакции, что и свайп, поэтому чтение инбокса -
+это один index range scan по (owner_user_id, liked_at) без учёта истории
+свайпов пользователя.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional, Tuple
+from datetime import datetime
+
+from app.database import Profile, Swipe, IncomingLike
+from app.pagination import encode_cursor, decode_cursor
+from app.services import swipe_archive_service
+
+def apply_swipe(
+    db: Session,
+    user_id: int,
+    user_profile_id: Optional[int],
+    target_user_id: int,
+    action: str,
+    swiped_at: Optional[datetime] = None
+) -> bool:
+    """
+    Обновляет инбокс после свайпа user_id по профилю target_user_id
+
+    Не делает commit - вызывается внутри транзакции свайпа.
+    Возвращает True, если у target_user_id появился входящий лайк.
+    """
+    # Любой свайп - это ответ на входящий лайк от target_user_id (если он был)
+    db.query(IncomingLike).filter(
+        IncomingLike.owner_user_id == user_id,
+        IncomingLike.liker_user_id == target_user_id
+    ).delete(synchronize_session=False)
+
+    if action != 'like':
+        # Лайк сменился на пропуск - у цели больше нет входящего лайка от нас
+        db.query(IncomingLike).filter(
+            IncomingLike.owner_user_id == target_user_id,
+            IncomingLike.liker_user_id == user_id
+        ).delete(synchronize_session=False)
+        return False
+
+    # Без профиля лайкнувшего показать в инбоксе нечего
+    if user_profile_id is None:
+        return False
+
+    # Если цель уже ответила на наш профиль (в том числе архивным пропуском), лайк в инбокс не попадает
+    already_answered = db.query(Swipe.user_id).filter(
+        Swipe.user_id == target_user_id,
+        Swipe.target_profile_id == user_profile_id
+    ).first() is not None or swipe_archive_service.is_archived(db, target_user_id, user_profile_id)
+    if already_answered:
+        return False
+
+    liked_at = swiped_at or datetime.utcnow()
+    stmt = pg_insert(IncomingLike.__table__).values(
+        owner_user_id=target_user_id,
+        liker_user_id=user_id,
+        liker_profile_id=user_profile_id,
+        liked_at=liked_at
+    ).on_conflict_do_update(
+        index_elements=["owner_user_id", "liker_user_id"],
+        set_={"liked_at": liked_at, "liker_profile_id": user_profile_id}
+    )
+    db.execute(stmt)
+    return True
+
+def inbox_query(db: Session, user_id: int, cursor_key: Optional[Tuple[datetime, int]] = None):
+    """
+    Запрос инбокса без лимита: (Profile, liked_at, liker_user_id), новые сверху
+
+    cursor_key - (liked_at, liker_user_id) последнего прочитанного элемента.
+    Общий для страницы и потокового ответа.
+    """
+    query = db.query(Profile, IncomingLike.liked_at, IncomingLike.liker_user_id).join(
+        IncomingLike,
+        IncomingLike.liker_profile_id == Profile.id
+    ).filter(
+        IncomingLike.owner_user_id == user_id,
+        Profile.is_active == True,
+        Profile.deleted_at == None
+    )
+
+    if cursor_key:
+        query = query.filter(
+            tuple_(IncomingLike.liked_at, IncomingLike.liker_user_id) < tuple_(*cursor_key)
+        )
+
+    return query.order_by(
+        IncomingLike.liked_at.desc(),
+        IncomingLike.liker_user_id.desc()
+    )
+
+def get_inbox_page(
+    db: Session,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[Profile], Optional[str]]:
+    """
+    Страница инбокса: профили лайкнувших, новые сверху
+
+    Возвращает (profiles, next_cursor). Некорректный курсор - ValueError.
+    """
+    cursor_key = decode_cursor(cursor) if cursor else None
+    rows = inbox_query(db, user_id, cursor_key).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        _, last_liked_at, last_liker_id = rows[-1]
+        next_cursor = encode_cursor(last_liked_at, last_liker_id)
+
+    return [row[0] for row in rows], next_cursor
+
+def count_inbox(db: Session, user_id: int) -> int:
+    """
+    Количество неотвеченных входящих лайков (для бейджа)
+
+    Те же условия, что у inbox_query: лайки деактивированных и удалённых
+    профилей в инбоксе остаются (до очистки или навсегда), но не считаются.
+    """
+    return db.query(func.count()).select_from(IncomingLike).join(
+        Profile,
+        IncomingLike.liker_profile_id == Profile.id
+    ).filter(
+        IncomingLike.owner_user_id == user_id,
+        Profile.is_active == True,
+        Profile.deleted_at == None
+    ).scalar() or 0
@@ -0,0 +1,208 @@
+"""
+Нечёткий поиск профилей и автодополнение городов/университетов
+
+- lookup_profiles: триграммный поиск (pg_trgm) по name, username, university
+  и city; фильтры обслуживаются GIN-индексами *_trgm (миграция 006).
+- PrefixIndex: отсортированный в памяти список нормализованных названий
+  университетов и городов с частотами. Подсказка - bisect по префиксу
+  (в том числе по началу любого слова названия), без запроса к БД.
+  Вариантом написания для подсказки выбирается самый частый. Ответы на
+  короткие (широкие) префиксы мемоизируются до следующего изменения индекса.
+  Сохранение профиля сдвигает частоты на -1/+1 по снимку значений до и
+  после изменения (как счётчики фасетов).
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.database import Profile
+from app.services.facet_service import ProfileFacets, snapshot
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_FIELDS = ("university", "city")
+MIN_LOOKUP_LENGTH = 2
+SUGGEST_MEMO_SIZE = 2048
+
+_LOOKUP_SQL = text("""
+    SELECT p.id
+    FROM profiles p
+    WHERE p.is_active = TRUE
+        AND p.deleted_at IS NULL
+        AND p.user_id != :user_id
+        AND (
+            p.name % :q OR p.username % :q OR p.university % :q OR p.city % :q
+            OR p.name ILIKE :pattern OR p.username ILIKE :pattern
+            OR p.university ILIKE :pattern OR p.city ILIKE :pattern
+        )
+    ORDER BY GREATEST(
+        similarity(p.name, :q),
+        similarity(COALESCE(p.username, ''), :q),
+        similarity(p.university, :q),
+        similarity(p.city, :q)
+    ) DESC, p.id DESC
+    LIMIT :limit
+""")
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def lookup_profiles(db: Session, user_id: int, q: str, limit: int = 20) -> List[Profile]:
+    """Профили, похожие на q по имени, username, университету или городу (лучшие сверху)"""
+    q = q.strip()
+    if len(q) < MIN_LOOKUP_LENGTH:
+        return []
+    ids = [row[0] for row in db.execute(_LOOKUP_SQL, {
+        "user_id": user_id,
+        "q": q,
+        "pattern": f"%{_escape_like(q)}%",
+        "limit": limit,
+    })]
+    if not ids:
+        return []
+    profiles_by_id = {profile.id: profile for profile in db.query(Profile).filter(Profile.id.in_(ids))}
+    return [profiles_by_id[pid] for pid in ids if pid in profiles_by_id]
+
+def _normalize(value: str) -> str:
+    return " ".join(value.casefold().replace("ё", "е").split())
+
+class PrefixIndex:
+    """Автодополнение по префиксу для одного поля (университет или город)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Нормализованное название -> {вариант написания: число профилей}
+        self._spellings: Dict[str, Dict[str, int]] = {}
+        # Отсортированные ключи (начало слова..., нормализованное название)
+        self._keys: List[Tuple[str, str]] = []
+        self._memo: Dict[Tuple[str, int], List[str]] = {}
+        self.built_at: Optional[float] = None
+
+    def _entries(self, normalized: str) -> List[Tuple[str, str]]:
+        # Ключ на начало каждого слова: «мгу имени ломоносова» находится и по «ломон»
+        words = normalized.split(" ")
+        return [(" ".join(words[i:]), normalized) for i in range(len(words))]
+
+    def load(self, counts: List[Tuple[str, int]]) -> None:
+        spellings: Dict[str, Dict[str, int]] = {}
+        for value, count in counts:
+            if not value or not value.strip():
+                continue
+            variants = spellings.setdefault(_normalize(value), {})
+            variants[value.strip()] = variants.get(value.strip(), 0) + count
+        keys = sorted(entry for normalized in spellings for entry in self._entries(normalized))
+        with self._lock:
+            self._spellings = spellings
+            self._keys = keys
+            self._memo = {}
+        self.built_at = time.monotonic()
+
+    def add(self, value: Optional[str]) -> None:
+        """Учитывает значение профиля, появившееся после сохранения"""
+        if not value or not value.strip():
+            return
+        normalized = _normalize(value)
+        with self._lock:
+            variants = self._spellings.get(normalized)
+            if variants is None:
+                variants = self._spellings[normalized] = {}
+                for entry in self._entries(normalized):
+                    bisect.insort(self._keys, entry)
+            variants[value.strip()] = variants.get(value.strip(), 0) + 1
+            self._memo = {}
+
+    def remove(self, value: Optional[str]) -> None:
+        """Убирает прежнее значение профиля; название без профилей исчезает из подсказок"""
+        if not value or not value.strip():
+            return
+        normalized = _normalize(value)
+        with self._lock:
+            variants = self._spellings.get(normalized)
+            count = variants.get(value.strip()) if variants else None
+            if count is None:
+                return
+            if count > 1:
+                variants[value.strip()] = count - 1
+            else:
+                del variants[value.strip()]
+            if not variants:
+                del self._spellings[normalized]
+                for entry in self._entries(normalized):
+                    i = bisect.bisect_left(self._keys, entry)
+                    if i < len(self._keys) and self._keys[i] == entry:
+                        del self._keys[i]
+            self._memo = {}
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Самые частые названия, начинающиеся с prefix (или у которых с него начинается слово)"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            cached = self._memo.get((prefix, limit))
+            if cached is not None:
+                return cached
+            keys = self._keys
+            matched = set()
+            for i in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+                key, normalized = keys[i]
+                if not key.startswith(prefix):
+                    break
+                matched.add(normalized)
+            ranked = heapq.nlargest(
+                limit,
+                matched,
+                key=lambda normalized: (sum(self._spellings[normalized].values()), normalized)
+            )
+            result = [max(self._spellings[n].items(), key=lambda item: item[1])[0] for n in ranked]
+            if len(self._memo) >= SUGGEST_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[(prefix, limit)] = result
+            return result
+
+_indexes: Dict[str, PrefixIndex] = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+_build_lock = threading.Lock()
+
+def _ensure_loaded(db: Session, field: str) -> PrefixIndex:
+    index = _indexes[field]
+    if index.built_at is not None and time.monotonic() - index.built_at < settings.AUTOCOMPLETE_REFRESH_SECONDS:
+        return index
+    with _build_lock:
+        if index.built_at is None or time.monotonic() - index.built_at >= settings.AUTOCOMPLETE_REFRESH_SECONDS:
+            column = getattr(Profile, field)
+            counts = db.query(column, func.count()).filter(
+                Profile.is_active == True,
+                Profile.deleted_at == None
+            ).group_by(column).all()
+            index.load(counts)
+            logger.info(f"🔤 Autocomplete: индекс {field} построен, значений={len(counts)}")
+    return index
+
+def autocomplete(db: Session, field: str, prefix: str, limit: int = 10) -> List[str]:
+    """Подсказки для поля university или city"""
+    return _ensure_loaded(db, field).suggest(prefix, limit)
+
+def on_profile_changed(old: Optional[ProfileFacets], profile: Optional[Profile]) -> None:
+    """
+    Сдвигает частоты в уже построенных индексах после сохранения профиля
+
+    old - снимок профиля до изменения (facet_service.snapshot). Учитываются
+    только активные профили, а неизменившееся значение не трогается.
+    """
+    new = snapshot(profile)
+    for field in AUTOCOMPLETE_FIELDS:
+        index = _indexes[field]
+        if index.built_at is None:
+            continue
+        old_value = getattr(old, field) if old is not None and old.active else None
+        new_value = getattr(new, field) if new is not None and new.active else None
+        if old_value != new_value:
+            index.remove(old_value)
+            index.add(new_value)
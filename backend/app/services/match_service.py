@@ -2,12 +2,50 @@
 Сервис для работы с мэтчами и свайпами
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import List, Tuple
+from sqlalchemy import tuple_
+from typing import List, Optional, Tuple
 from datetime import datetime
 
-from app.database import Profile, Swipe, Match
+from app.database import Profile, Swipe, Match, MatchEdge
+from app.pagination import encode_cursor, decode_cursor
 from app.services.profile_service import get_profile_by_user_id
+from app.services.inbox_service import apply_swipe
+from app.services import profile_stats_service, swipe_archive_service
+from app.services.realtime import publish
+
+def _create_match(db: Session, user_a: int, user_b: int) -> bool:
+    """
+    Создаёт мэтч и два ребра match_edges (по одному на каждую сторону)
+
+    Не делает commit. Возвращает True, если мэтч создан (а не существовал).
+    """
+    user1_id = min(user_a, user_b)
+    user2_id = max(user_a, user_b)
+    
+    existing_match = db.query(Match.id).filter(
+        Match.user1_id == user1_id,
+        Match.user2_id == user2_id
+    ).first()
+    
+    if existing_match:
+        return False
+    
+    matched_at = datetime.utcnow()
+    new_match = Match(user1_id=user1_id, user2_id=user2_id, matched_at=matched_at)
+    db.add(new_match)
+    db.flush()  # Нужен id мэтча для рёбер
+    
+    db.add_all([
+        MatchEdge(user_id=user1_id, peer_user_id=user2_id, match_id=new_match.id, matched_at=matched_at),
+        MatchEdge(user_id=user2_id, peer_user_id=user1_id, match_id=new_match.id, matched_at=matched_at),
+    ])
+    profile_stats_service.record_match(db, user1_id, user2_id)
+    return True
+
+def _publish_match(db: Session, user_a: int, profile_a_id: int, user_b: int, profile_b_id: int) -> None:
+    """Публикует событие мэтча обеим сторонам (доставляется после commit)"""
+    publish(db, user_a, "match", {"user_id": user_b, "profile_id": profile_b_id})
+    publish(db, user_b, "match", {"user_id": user_a, "profile_id": profile_a_id})
 
 def like_profile(db: Session, user_id: int, profile_id: int) -> Tuple[bool, str]:
     """
@@ -31,10 +69,12 @@ def like_profile(db: Session, user_id: int, profile_id: int) -> Tuple[bool, str]
             raise ValueError("Cannot like your own profile")
         
         # Проверяем, не было ли уже свайпа
+        # FOR UPDATE: архивация пропусков (compact_swipes.py) не удалит строку между чтением и изменением
         existing_swipe = db.query(Swipe).filter(
             Swipe.user_id == user_id,
             Swipe.target_profile_id == profile_id
-        ).first()
+        ).with_for_update().first()
+        previous_action = existing_swipe.action if existing_swipe else None
         
         if existing_swipe:
             if existing_swipe.action == 'like':
@@ -52,9 +92,23 @@ def like_profile(db: Session, user_id: int, profile_id: int) -> Tuple[bool, str]
             )
             db.add(new_swipe)
         
+        profile_stats_service.record_swipe(db, user_id, target_profile.user_id, previous_action, 'like')
+        
         # Проверяем, есть ли взаимный лайк
         current_user_profile = get_profile_by_user_id(db, user_id)
         
+        # Обновляем инбокс входящих лайков в той же транзакции
+        added_to_inbox = apply_swipe(
+            db, user_id,
+            current_user_profile.id if current_user_profile else None,
+            target_profile.user_id, 'like'
+        )
+        if added_to_inbox:
+            publish(db, target_profile.user_id, "like", {
+                "from_user_id": user_id,
+                "profile_id": current_user_profile.id
+            })
+        
         if not current_user_profile:
             db.commit()
             return (False, "Liked successfully")
@@ -69,18 +123,9 @@ def like_profile(db: Session, user_id: int, profile_id: int) -> Tuple[bool, str]
         matched = False
         if mutual_swipe:
             # Создаём мэтч
-            user1_id = min(user_id, target_profile.user_id)
-            user2_id = max(user_id, target_profile.user_id)
-            
-            existing_match = db.query(Match).filter(
-                Match.user1_id == user1_id,
-                Match.user2_id == user2_id
-            ).first()
-            
-            if not existing_match:
-                new_match = Match(user1_id=user1_id, user2_id=user2_id)
-                db.add(new_match)
-                matched = True
+            matched = _create_match(db, user_id, target_profile.user_id)
+            if matched:
+                _publish_match(db, user_id, current_user_profile.id, target_profile.user_id, target_profile.id)
         
         db.commit()
         return (matched, "Liked successfully")
@@ -102,11 +147,15 @@ def pass_profile(db: Session, user_id: int, profile_id: int) -> str:
             raise ValueError("Profile not found")
         
         # Проверяем, не было ли уже свайпа
+        # FOR UPDATE: архивация пропусков (compact_swipes.py) не удалит строку между чтением и изменением
         existing_swipe = db.query(Swipe).filter(
             Swipe.user_id == user_id,
             Swipe.target_profile_id == profile_id
-        ).first()
+        ).with_for_update().first()
+        previous_action = existing_swipe.action if existing_swipe else None
         
+        if existing_swipe is None and swipe_archive_service.is_archived(db, user_id, profile_id):
+            return "Already passed"
         if existing_swipe:
             if existing_swipe.action == 'pass':
                 return "Already passed"
@@ -123,6 +172,9 @@ def pass_profile(db: Session, user_id: int, profile_id: int) -> str:
             )
             db.add(new_swipe)
         
+        profile_stats_service.record_swipe(db, user_id, target_profile.user_id, previous_action, 'pass')
+        apply_swipe(db, user_id, None, target_profile.user_id, 'pass')
+        
         db.commit()
         return "Passed successfully"
     except Exception as e:
@@ -158,7 +210,8 @@ def respond_to_like(
         existing_swipe = db.query(Swipe).filter(
             Swipe.user_id == user_id,
             Swipe.target_profile_id == target_user_profile.id
-        ).first()
+        ).with_for_update().first()
+        previous_action = existing_swipe.action if existing_swipe else None
         
         if existing_swipe:
             existing_swipe.action = swipe_action
@@ -171,21 +224,15 @@ def respond_to_like(
             )
             db.add(new_swipe)
         
+        profile_stats_service.record_swipe(db, user_id, target_user_id, previous_action, swipe_action)
+        apply_swipe(db, user_id, current_user_profile.id, target_user_id, swipe_action)
+        
         # Если приняли лайк, проверяем мэтч
         matched = False
         if action == 'accept':
-            user1_id = min(user_id, target_user_id)
-            user2_id = max(user_id, target_user_id)
-            
-            existing_match = db.query(Match).filter(
-                Match.user1_id == user1_id,
-                Match.user2_id == user2_id
-            ).first()
-            
-            if not existing_match:
-                new_match = Match(user1_id=user1_id, user2_id=user2_id)
-                db.add(new_match)
-                matched = True
+            matched = _create_match(db, user_id, target_user_id)
+            if matched:
+                _publish_match(db, user_id, current_user_profile.id, target_user_id, target_user_profile.id)
         
         db.commit()
         return (matched, f"Response recorded: {action}")
@@ -193,42 +240,63 @@ def respond_to_like(
         db.rollback()
         raise
 
-def get_matches(db: Session, user_id: int) -> List[Profile]:
+def matches_query(db: Session, user_id: int, cursor_key: Optional[Tuple[datetime, int]] = None):
+    """
+    Запрос мэтчей без лимита: (Profile, matched_at, peer_user_id), новые сверху
+
+    cursor_key - (matched_at, peer_user_id) последнего прочитанного элемента.
+    Общий для страницы и потокового ответа.
     """
-    Получение списка мэтчей для пользователя (оптимизированная версия с JOIN)
+    query = db.query(Profile, MatchEdge.matched_at, MatchEdge.peer_user_id).join(
+        MatchEdge,
+        MatchEdge.peer_user_id == Profile.user_id
+    ).filter(
+        MatchEdge.user_id == user_id,
+        Profile.is_active == True,
+        Profile.deleted_at == None
+    )
+    
+    if cursor_key:
+        query = query.filter(
+            tuple_(MatchEdge.matched_at, MatchEdge.peer_user_id) < tuple_(*cursor_key)
+        )
     
-    Возвращает профили пользователей, с которыми есть взаимный лайк (мэтч)
+    return query.order_by(
+        MatchEdge.matched_at.desc(),
+        MatchEdge.peer_user_id.desc()
+    )
+
+def get_matches(
+    db: Session,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[Profile], Optional[str]]:
+    """
+    Получение страницы мэтчей пользователя (новые сверху)
+    
+    Читает рёбра match_edges одним index range scan по (user_id, matched_at),
+    поэтому стоимость страницы не зависит от общего числа мэтчей.
+    Возвращает (profiles, next_cursor). Некорректный курсор - ValueError.
     """
-    from sqlalchemy import case
     import logging
     
     logger = logging.getLogger(__name__)
     
+    cursor_key = decode_cursor(cursor) if cursor else None
+    
     try:
-        # Проверяем, что профиль пользователя существует
-        current_user_profile = get_profile_by_user_id(db, user_id)
-        if not current_user_profile:
-            logger.warning(f"User profile not found for user_id: {user_id}")
-            return []
-        
-        # Оптимизированный запрос с JOIN вместо множественных запросов
-        # Используем индексы для быстрого поиска (idx_matches_user1_id, idx_matches_user2_id, idx_matches_matched_at_desc)
-        # DISTINCT не используем, чтобы избежать конфликта с ORDER BY в Postgres
-        matched_profiles = db.query(Profile).join(
-            Match,
-            or_(
-                and_(Match.user1_id == user_id, Match.user2_id == Profile.user_id),
-                and_(Match.user2_id == user_id, Match.user1_id == Profile.user_id)
-            )
-        ).filter(
-            Profile.is_active == True,
-            Profile.deleted_at == None,
-            Profile.user_id != user_id
-        ).order_by(Match.matched_at.desc()).all()
+        rows = matches_query(db, user_id, cursor_key).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            _, last_matched_at, last_peer_id = rows[-1]
+            next_cursor = encode_cursor(last_matched_at, last_peer_id)
         
-        logger.info(f"Found {len(matched_profiles)} matches for user_id: {user_id}")
-        return matched_profiles
+        logger.info(f"Found {len(rows)} matches for user_id: {user_id}")
+        return [row[0] for row in rows], next_cursor
     except Exception as e:
         logger.error(f"Error getting matches for user_id {user_id}: {e}", exc_info=True)
         # Возвращаем пустой список вместо исключения, чтобы не ломать фронтенд
-        return []
+        return [], None
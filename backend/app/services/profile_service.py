@@ -1,17 +1,109 @@
 """
 Сервис для работы с профилями
 """
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import and_, or_, not_
-from typing import List, Optional
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
 from datetime import datetime
+import asyncio
 import json
 
-from app.database import Profile, Swipe, Match
-from app.services.file_storage import save_uploaded_file, delete_file
+from app.database import Profile, MatchEdge, SessionLocal, ReadSessionLocal
+from app.services.file_storage import save_uploaded_file, PHOTO_OPTIMIZE_JOB, PHOTO_DELETE_JOB
+from app.services.inbox_service import get_inbox_page, count_inbox
+from app.services import ranking, tag_service, lookup_service, facet_service, realtime, swipe_archive_service
+from app import jobs
+from app.cache import TTLCache
+from app.db_routing import recently_wrote
+from app.singleflight import SingleFlight
 from fastapi import UploadFile, HTTPException
 from config import settings
 
+# Версии профилей (profile_id, updated_at) для условных GET: ("id", profile_id) / ("user", user_id)
+PROFILE_CHANGED_EVENT = "profile_changed"
+# Задача очистки удалённого профиля (обработчик - purge_service)
+PURGE_PROFILE_JOB = "profile.purge"
+_versions = TTLCache(ttl=settings.PROFILE_VERSION_CACHE_SECONDS, maxsize=settings.PROFILE_VERSION_CACHE_MAX_KEYS)
+
+def remember_profile_version(profile: Profile) -> Tuple[int, Optional[datetime]]:
+    """Запоминает версию только что прочитанного профиля"""
+    version = (profile.id, profile.updated_at or profile.created_at)
+    _versions.set(("id", profile.id), version)
+    _versions.set(("user", profile.user_id), version)
+    return version
+
+def get_profile_version(
+    db: Session,
+    profile_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> Optional[Tuple[int, Optional[datetime]]]:
+    """
+    Версия активного профиля (profile_id, updated_at) без загрузки строки
+
+    Берётся из кэша версий, иначе - из узкого запроса по индексу.
+    None - профиля нет (или он неактивен).
+    """
+    key = ("id", profile_id) if profile_id is not None else ("user", user_id)
+    version = _versions.get(key)
+    if version is not None:
+        return version
+    column = Profile.id if profile_id is not None else Profile.user_id
+    row = db.query(Profile.id, Profile.user_id, Profile.updated_at, Profile.created_at).filter(
+        column == key[1],
+        Profile.is_active == True,
+        Profile.deleted_at == None
+    ).first()
+    if row is None:
+        return None
+    version = (row.id, row.updated_at or row.created_at)
+    _versions.set(("id", row.id), version)
+    _versions.set(("user", row.user_id), version)
+    return version
+
+# Одновременные чтения одного профиля - одна загрузка (+ микрокэш); ключи как у _versions
+_profile_flight = SingleFlight(ttl=settings.PROFILE_SINGLEFLIGHT_CACHE_SECONDS, maxsize=settings.PROFILE_VERSION_CACHE_MAX_KEYS)
+
+def _forget_profile_version(user_id: int, data: dict) -> None:
+    _versions.delete(("user", user_id))
+    _profile_flight.forget(("user", user_id))
+    if data.get("profile_id") is not None:
+        _versions.delete(("id", data["profile_id"]))
+        _profile_flight.forget(("id", data["profile_id"]))
+        if data.get("removed"):
+            ranking.on_profile_removed(data["profile_id"])
+
+def _load_profile_detached(key: Tuple[str, int], session_factory) -> Optional[Profile]:
+    """Загружает профиль своей сессией и отвязывает его от неё (для разделяемого чтения)"""
+    db = session_factory()
+    try:
+        kind, value = key
+        profile = get_profile_by_id(db, value) if kind == "id" else get_profile_by_user_id(db, value)
+        if profile is not None:
+            remember_profile_version(profile)
+            db.expunge(profile)
+        return profile
+    finally:
+        db.close()
+
+async def get_profile_shared(
+    profile_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    reader_user_id: Optional[int] = None
+) -> Optional[Profile]:
+    """
+    Профиль по id или user_id для отдачи «как есть» (только чтение)
+
+    Одновременные запросы одного профиля ждут одну загрузку в threadpool
+    (single-flight) и получают один и тот же отвязанный объект. Читатель,
+    только что записавший что-то сам, читает отдельно с primary
+    (read-your-writes), не попадая в общий результат.
+    """
+    key = ("id", profile_id) if profile_id is not None else ("user", user_id)
+    if reader_user_id is not None and recently_wrote(reader_user_id):
+        return await asyncio.to_thread(_load_profile_detached, key, SessionLocal)
+    return await _profile_flight.do(key, _load_profile_detached, key, ReadSessionLocal)
+
+realtime.register_internal(PROFILE_CHANGED_EVENT, _forget_profile_version)
+
 def get_profile_by_user_id(db: Session, user_id: int) -> Optional[Profile]:
     """Получение профиля по user_id"""
     return db.query(Profile).filter(
@@ -35,28 +127,38 @@ def get_profiles_for_swipe(db: Session, user_id: int, page: int = 0, size: int =
     if not current_user_profile:
         return []
     
-    # Получаем ID профилей, которые уже были свайпнуты
-    swiped_profile_ids = db.query(Swipe.target_profile_id).filter(
-        Swipe.user_id == user_id
-    ).subquery()
+    # ID профилей, которые уже были свайпнуты (включая архив старых пропусков)
+    swiped_profile_ids = swipe_archive_service.get_swiped_profile_ids(db, user_id)
     
-    # Получаем ID профилей мэтчей одним запросом через JOIN (оптимизация: вместо 2 запросов - 1)
-    # Мэтч может быть где user1_id = user_id или user2_id = user_id
-    matched_profile_ids_subq = db.query(Profile.id).join(
-        Match,
-        or_(
-            and_(Match.user1_id == user_id, Match.user2_id == Profile.user_id),
-            and_(Match.user2_id == user_id, Match.user1_id == Profile.user_id)
-        )
-    ).subquery()
+    # Пользователи, с которыми уже есть мэтч (index range scan по match_edges)
+    matched_user_ids = [row[0] for row in db.query(MatchEdge.peer_user_id).filter(
+        MatchEdge.user_id == user_id
+    )]
+    
+    # Ранжирование по интересам/целям/городу/вузу/свежести (см. ranking.py)
+    ranked_ids = ranking.rank_candidates(
+        db, current_user_profile, swiped_profile_ids, matched_user_ids, page * size, size
+    )
+    if ranked_ids is not None:
+        if not ranked_ids:
+            return []
+        profiles_by_id = {
+            profile.id: profile
+            for profile in db.query(Profile).filter(
+                Profile.id.in_(ranked_ids),
+                Profile.is_active == True,
+                Profile.deleted_at == None
+            )
+        }
+        return [profiles_by_id[pid] for pid in ranked_ids if pid in profiles_by_id]
     
-    # Получаем профили, которые ещё не были свайпнуты и не являются мэтчами
+    # Фолбэк: профили, которые ещё не были свайпнуты и не являются мэтчами, новые сверху
     query = db.query(Profile).filter(
         Profile.is_active == True,
         Profile.deleted_at == None,
         Profile.user_id != user_id,
         ~Profile.id.in_(swiped_profile_ids),
-        ~Profile.id.in_(db.query(matched_profile_ids_subq.c.id))
+        ~Profile.user_id.in_(matched_user_ids)
     )
     
     profiles = query.order_by(Profile.created_at.desc()).offset(page * size).limit(size).all()
@@ -87,6 +189,8 @@ def create_or_update_profile(
     except json.JSONDecodeError:
         interests_list = []
         goals_list = []
+    interests_list = tag_service.clean_values(interests_list if isinstance(interests_list, list) else [])
+    goals_list = tag_service.clean_values(goals_list if isinstance(goals_list, list) else [])
     
     # Валидация
     if gender not in ['male', 'female', 'other']:
@@ -96,18 +200,22 @@ def create_or_update_profile(
     if len(bio or '') > 300:
         raise HTTPException(status_code=400, detail="Bio must be 300 characters or less")
     
+    # Коды словаря tags для фильтрации и скоринга
+    interest_ids = tag_service.encode(db, tag_service.KIND_INTEREST, interests_list)
+    goal_ids = tag_service.encode(db, tag_service.KIND_GOAL, goals_list)
+    
     # Проверяем, существует ли профиль
     existing_profile = db.query(Profile).filter(Profile.user_id == user_id).first()
+    previous_facets = facet_service.snapshot(existing_profile)
     
-    # Обработка фото
+    # Обработка фото: в запросе - проверка и сохранение, оптимизация и удаление
+    # старого фото - фоновыми задачами после commit
     photo_url = None
     if photo:
-        # Удаляем старое фото, если есть
-        if existing_profile and existing_profile.photo_url:
-            delete_file(existing_profile.photo_url)
-        
-        # Сохраняем новое фото
         photo_url = save_uploaded_file(photo, user_id)
+        jobs.enqueue(db, PHOTO_OPTIMIZE_JOB, {"photo_url": photo_url})
+        if existing_profile and existing_profile.photo_url:
+            jobs.enqueue(db, PHOTO_DELETE_JOB, {"photo_url": existing_profile.photo_url})
     
     if existing_profile:
         # Обновляем существующий профиль
@@ -121,15 +229,22 @@ def create_or_update_profile(
         existing_profile.university = university
         existing_profile.interests = interests_list
         existing_profile.goals = goals_list
+        existing_profile.interest_ids = interest_ids
+        existing_profile.goal_ids = goal_ids
         existing_profile.bio = bio
         if photo_url:
             existing_profile.photo_url = photo_url
         existing_profile.updated_at = datetime.utcnow()
         existing_profile.is_active = True
         existing_profile.deleted_at = None
+        # Сброс кэша версий во всех воркерах (доставляется после commit)
+        realtime.publish(db, user_id, PROFILE_CHANGED_EVENT, {"profile_id": existing_profile.id})
         
         db.commit()
         db.refresh(existing_profile)
+        ranking.on_profile_saved(existing_profile)
+        lookup_service.on_profile_changed(previous_facets, existing_profile)
+        facet_service.on_profile_changed(previous_facets, existing_profile)
         return existing_profile
     else:
         # Создаём новый профиль
@@ -145,106 +260,65 @@ def create_or_update_profile(
             university=university,
             interests=interests_list,
             goals=goals_list,
+            interest_ids=interest_ids,
+            goal_ids=goal_ids,
             bio=bio,
             photo_url=photo_url
         )
         db.add(new_profile)
+        realtime.publish(db, user_id, PROFILE_CHANGED_EVENT, {"profile_id": None})
         db.commit()
         db.refresh(new_profile)
+        ranking.on_profile_saved(new_profile)
+        lookup_service.on_profile_changed(None, new_profile)
+        facet_service.on_profile_changed(None, new_profile)
         return new_profile
 
-def get_incoming_likes(db: Session, user_id: int) -> List[Profile]:
-    """Получение списка пользователей, которые лайкнули текущего пользователя"""
-    # #region agent log
-    import json
-    import os
-    log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.cursor', 'debug.log')
-    try:
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"profile_service.py:162","message":"Function entry","data":{"user_id":user_id},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    
-    current_user_profile = get_profile_by_user_id(db, user_id)
-    
-    # #region agent log
-    try:
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"profile_service.py:166","message":"After get_profile_by_user_id","data":{"has_profile":current_user_profile is not None,"profile_id":current_user_profile.id if current_user_profile else None},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    
-    if not current_user_profile:
-        return []
-    
-    # Получаем ID профилей, на которые текущий пользователь уже ответил
-    # #region agent log
-    with open('c:\\Users\\Lenovo\\stud-net\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-        f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"B","location":"profile_service.py:172","message":"Before responded query","data":{"user_id":user_id},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    # #endregion
-    
-    responded_profile_ids_list = [row[0] for row in db.query(Swipe.target_profile_id).filter(
-        Swipe.user_id == user_id
-    ).all()]
-    
-    # #region agent log
-    try:
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"B","location":"profile_service.py:177","message":"After responded query","data":{"responded_count":len(responded_profile_ids_list)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    
-    # Используем JOIN для получения профилей тех, кто лайкнул текущего пользователя
-    # Это избегает проблем с корреляцией подзапросов
-    # #region agent log
-    try:
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"profile_service.py:181","message":"Before main query construction","data":{"current_profile_id":current_user_profile.id},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    
-    # Основной запрос с JOIN - избегаем подзапросов, которые могут вызвать проблемы с корреляцией
-    # Создаём алиас для Swipe, чтобы избежать конфликтов при множественных JOIN
-    like_swipe = aliased(Swipe)
-    query = db.query(Profile).join(
-        like_swipe, 
-        and_(
-            like_swipe.target_profile_id == current_user_profile.id,
-            like_swipe.action == 'like',
-            Profile.user_id == like_swipe.user_id
-        )
-    ).filter(
-        Profile.is_active == True,
+def deactivate_profile(db: Session, user_id: int, delete: bool = False) -> Optional[Profile]:
+    """
+    Скрывает профиль пользователя (is_active = False) или помечает удалённым
+
+    Флаги меняются сразу одной короткой транзакцией, кэши версий и индекс
+    колоды сбрасываются во всех воркерах. Свайпы, мэтчи и фото удалённого
+    профиля очищаются позже пачками (см. purge_service); до очистки повторное
+    сохранение профиля восстанавливает его.
+    None - активного профиля нет.
+    """
+    profile = db.query(Profile).filter(
+        Profile.user_id == user_id,
         Profile.deleted_at == None
-    )
-    
-    # Исключаем профили, на которые уже ответили, используя простой фильтр с in_
-    if responded_profile_ids_list:
-        query = query.filter(~Profile.id.in_(responded_profile_ids_list))
-    
-    query = query.order_by(like_swipe.created_at.desc())
-    
-    # #region agent log
-    with open('c:\\Users\\Lenovo\\stud-net\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-        f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"profile_service.py:201","message":"Before query execution","data":{"has_responded_filter":bool(responded_profile_ids_list)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    # #endregion
-    
-    try:
-        liker_profiles = query.all()
-    except Exception as e:
-        # #region agent log
-        try:
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"profile_service.py:206","message":"Query execution error","data":{"error":str(e),"error_type":type(e).__name__},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
-        raise
-    
-    # #region agent log
-    try:
-        with open(log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"profile_service.py:213","message":"After query execution","data":{"profiles_count":len(liker_profiles)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    
-    return liker_profiles
+    ).with_for_update().first()
+    if profile is None or (not profile.is_active and not delete):
+        db.rollback()
+        return None
+    previous_facets = facet_service.snapshot(profile)
+    now = datetime.utcnow()
+    profile.is_active = False
+    if delete:
+        profile.deleted_at = now
+        jobs.enqueue(db, PURGE_PROFILE_JOB, {"profile_id": profile.id}, delay_seconds=settings.PROFILE_PURGE_DELAY_SECONDS)
+    profile.updated_at = now
+    realtime.publish(db, user_id, PROFILE_CHANGED_EVENT, {"profile_id": profile.id, "removed": True})
+    db.commit()
+    db.refresh(profile)
+    lookup_service.on_profile_changed(previous_facets, profile)
+    facet_service.on_profile_changed(previous_facets, profile)
+    return profile
+
+def get_incoming_likes(
+    db: Session,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[Profile], Optional[str]]:
+    """
+    Получение страницы пользователей, которые лайкнули текущего пользователя
+
+    Читает инбокс incoming_likes (одним index range scan), а не пересчитывает
+    его по истории свайпов. Возвращает (profiles, next_cursor).
+    """
+    return get_inbox_page(db, user_id, limit, cursor)
+
+def count_incoming_likes(db: Session, user_id: int) -> int:
+    """Количество неотвеченных входящих лайков"""
+    return count_inbox(db, user_id)
@@ -0,0 +1,135 @@
+"""
+Статистика пользователя (profile_stats): лайки полученные/отправленные и мэтчи
+
+Строка на user_id меняется инкрементом (INSERT ... ON CONFLICT DO UPDATE)
+в той же транзакции, что и свайп или мэтч, поэтому чтение - поиск по
+первичному ключу без агрегации по swipes/matches. Изменения одного вызова
+пишутся одним оператором в порядке user_id: встречные лайки двух
+пользователей блокируют строки в одном порядке и не взаимоблокируются.
+
+recompute_batch() пересчитывает пачку пользователей по истории (swipes,
+match_edges) и исправляет расхождения - ручные правки БД, свайпы во время
+backfill (см. recompute_profile_stats.py).
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.database import Profile, ProfileStats
+
+STAT_FIELDS = ("likes_received", "likes_sent", "matches_count")
+
+_RECOMPUTE_SQL = text("""
+    INSERT INTO profile_stats (user_id, likes_received, likes_sent, matches_count, updated_at)
+    SELECT p.user_id,
+        (SELECT COUNT(*) FROM swipes s WHERE s.target_profile_id = p.id AND s.action = 'like'),
+        (SELECT COUNT(*) FROM swipes s WHERE s.user_id = p.user_id AND s.action = 'like'),
+        (SELECT COUNT(*) FROM match_edges e WHERE e.user_id = p.user_id),
+        CURRENT_TIMESTAMP
+    FROM profiles p
+    WHERE p.user_id = ANY(:user_ids)
+    ON CONFLICT (user_id) DO UPDATE SET
+        likes_received = EXCLUDED.likes_received,
+        likes_sent = EXCLUDED.likes_sent,
+        matches_count = EXCLUDED.matches_count,
+        updated_at = EXCLUDED.updated_at
+    WHERE (profile_stats.likes_received, profile_stats.likes_sent, profile_stats.matches_count)
+        IS DISTINCT FROM (EXCLUDED.likes_received, EXCLUDED.likes_sent, EXCLUDED.matches_count)
+    RETURNING user_id
+""")
+
+def _empty(user_id: int) -> Dict[str, int]:
+    return {"user_id": user_id, **{field: 0 for field in STAT_FIELDS}}
+
+def _bump(db: Session, deltas: Dict[int, Dict[str, int]]) -> None:
+    """Прибавляет дельты к строкам пользователей одним оператором (без commit)"""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, **{field: delta.get(field, 0) for field in STAT_FIELDS}, "updated_at": now}
+        for user_id, delta in sorted(deltas.items())
+        if any(delta.values())
+    ]
+    if not rows:
+        return
+    table = ProfileStats.__table__
+    stmt = pg_insert(table).values(rows)
+    updates = {field: func.greatest(0, table.c[field] + stmt.excluded[field]) for field in STAT_FIELDS}
+    updates["updated_at"] = stmt.excluded.updated_at
+    db.execute(stmt.on_conflict_do_update(index_elements=["user_id"], set_=updates))
+
+def record_swipe(
+    db: Session,
+    user_id: int,
+    target_user_id: int,
+    old_action: Optional[str],
+    new_action: str
+) -> None:
+    """Учитывает свайп (новый или сменивший действие); не делает commit"""
+    delta = (new_action == 'like') - (old_action == 'like')
+    if delta:
+        deltas = defaultdict(dict)
+        deltas[user_id]["likes_sent"] = delta
+        deltas[target_user_id]["likes_received"] = delta
+        _bump(db, deltas)
+
+def adjust(db: Session, deltas: Dict[int, Dict[str, int]]) -> None:
+    """Произвольные дельты по пользователям (например, при очистке удалённого профиля); не делает commit"""
+    _bump(db, deltas)
+
+def record_match(db: Session, user_a: int, user_b: int) -> None:
+    """Учитывает новый мэтч обеим сторонам; не делает commit"""
+    _bump(db, {user_a: {"matches_count": 1}, user_b: {"matches_count": 1}})
+
+def get_stats(db: Session, user_id: int) -> Dict[str, int]:
+    """Статистика пользователя (нули, если строки ещё нет)"""
+    return get_stats_many(db, [user_id])[user_id]
+
+def get_stats_many(db: Session, user_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """Статистика пачки пользователей одним запросом по первичному ключу"""
+    user_ids = list(dict.fromkeys(user_ids))
+    result = {user_id: _empty(user_id) for user_id in user_ids}
+    if not user_ids:
+        return result
+    columns = [getattr(ProfileStats, field) for field in STAT_FIELDS]
+    for row in db.query(ProfileStats.user_id, *columns).filter(ProfileStats.user_id.in_(user_ids)):
+        result[row[0]] = {"user_id": row[0], **dict(zip(STAT_FIELDS, row[1:]))}
+    return result
+
+def recompute_batch(
+    db: Session,
+    after_user_id: int = 0,
+    batch_size: int = 1000,
+    user_ids: Optional[List[int]] = None
+) -> Tuple[List[int], int]:
+    """
+    Пересчитывает статистику пачки пользователей по истории и делает commit
+
+    Пачка - user_ids или следующие batch_size профилей после after_user_id.
+    Строки сначала блокируются (FOR UPDATE), а подсчёт идёт следующим
+    оператором со свежим снимком: свайп, закоммиченный до блокировки, уже
+    виден в подсчёте, а незакоммиченный дождётся блокировки и добавит
+    свой инкремент к пересчитанному значению.
+    Возвращает (user_id пачки по возрастанию, число исправленных строк).
+    """
+    if user_ids is None:
+        user_ids = [row[0] for row in db.query(Profile.user_id).filter(
+            Profile.user_id > after_user_id
+        ).order_by(Profile.user_id).limit(batch_size)]
+    else:
+        user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return [], 0
+    try:
+        db.query(ProfileStats.user_id).filter(
+            ProfileStats.user_id.in_(user_ids)
+        ).order_by(ProfileStats.user_id).with_for_update().all()
+        fixed = len(db.execute(_RECOMPUTE_SQL, {"user_ids": user_ids}).fetchall())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return user_ids, fixed
@@ -0,0 +1,257 @@
+"""
+Фоновая очистка удалённых профилей
+
+DELETE /api/profiles/me только ставит deleted_at - профиль сразу пропадает
+из выдачи - и в той же транзакции ставит задачу PURGE_PROFILE_JOB (app/jobs.py)
+с отсрочкой PROFILE_PURGE_DELAY_SECONDS (окно восстановления). Задача
+удаляет данные профиля: свайпы в обе стороны, входящие лайки, отметки
+полезности, рёбра мэтчей и мэтчи, затем фото и саму строку профиля.
+
+Каждая пачка (PROFILE_PURGE_BATCH_SIZE строк) - своя короткая транзакция с
+паузой после неё, поэтому блокировки не держатся дольше одной пачки, а
+каскады внешних ключей при удалении строки профиля почти ничего не
+находят. Пачка начинается с FOR SHARE по строке профиля: восстановление
+профиля (POST /api/profiles) не пересекается с пачкой, а следующая пачка
+видит deleted_at IS NULL и прекращает очистку.
+
+Счётчики соседей (profile_stats, connection_feedback_counts) уменьшаются в
+транзакции той же пачки по строкам из DELETE ... RETURNING, поэтому
+одновременный запуск в нескольких воркерах ничего не считает дважды.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import jobs
+from app.database import SessionLocal
+from app.services import profile_stats_service, feedback_service
+from app.services.profile_service import PURGE_PROFILE_JOB
+from app.services.file_storage import delete_file
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_LOCK_SQL = text("""
+    SELECT user_id, photo_url FROM profiles
+    WHERE id = :pid AND deleted_at IS NOT NULL
+    FOR SHARE
+""")
+
+_DUE_SQL = text("""
+    SELECT id, user_id FROM profiles
+    WHERE deleted_at IS NOT NULL AND deleted_at <= :cutoff
+    ORDER BY deleted_at
+    LIMIT :limit
+""")
+
+# Свайпы других пользователей по удаляемому профилю
+_SWIPES_TO_SQL = text("""
+    DELETE FROM swipes WHERE (user_id, target_profile_id) IN (
+        SELECT user_id, target_profile_id FROM swipes WHERE target_profile_id = :pid LIMIT :n
+    )
+    RETURNING user_id, action
+""")
+
+# Свайпы удаляемого пользователя: владелец профиля-цели - для его likes_received
+_SWIPES_FROM_SQL = text("""
+    WITH deleted AS (
+        DELETE FROM swipes WHERE user_id = :uid AND target_profile_id IN (
+            SELECT target_profile_id FROM swipes WHERE user_id = :uid LIMIT :n
+        )
+        RETURNING target_profile_id, action
+    )
+    SELECT p.user_id, deleted.action
+    FROM deleted JOIN profiles p ON p.id = deleted.target_profile_id
+""")
+
+# Лайки удаляемого пользователя в чужих инбоксах и его собственный инбокс
+_INBOX_LIKER_SQL = text("""
+    DELETE FROM incoming_likes WHERE (owner_user_id, liker_user_id) IN (
+        SELECT owner_user_id, liker_user_id FROM incoming_likes WHERE liker_profile_id = :pid LIMIT :n
+    )
+""")
+_INBOX_OWNER_SQL = text("""
+    DELETE FROM incoming_likes WHERE (owner_user_id, liker_user_id) IN (
+        SELECT owner_user_id, liker_user_id FROM incoming_likes WHERE owner_user_id = :uid LIMIT :n
+    )
+""")
+
+# Отметки полезности в обе стороны (до мэтчей: каскад по match_id не уменьшил бы счётчики)
+_FEEDBACK_SQL = text("""
+    DELETE FROM connection_feedbacks WHERE id IN (
+        SELECT id FROM connection_feedbacks WHERE from_user_id = :uid OR to_user_id = :uid LIMIT :n
+    )
+    RETURNING to_user_id, feedback_type
+""")
+
+# Мэтч удаляется вместе с обоими рёбрами; возвращаются соседи для matches_count
+_MATCHES_SQL = text("""
+    WITH edges AS (
+        DELETE FROM match_edges WHERE (user_id, peer_user_id) IN (
+            SELECT user_id, peer_user_id FROM match_edges WHERE user_id = :uid LIMIT :n
+        )
+        RETURNING peer_user_id, match_id
+    ), peer_edges AS (
+        DELETE FROM match_edges m USING edges
+        WHERE m.user_id = edges.peer_user_id AND m.peer_user_id = :uid
+    ), matches_deleted AS (
+        DELETE FROM matches USING edges WHERE matches.id = edges.match_id
+    )
+    SELECT peer_user_id FROM edges
+""")
+
+# Мэтчи без рёбер (созданные до миграции 003)
+_LEGACY_MATCHES_SQL = text("""
+    DELETE FROM matches WHERE id IN (
+        SELECT id FROM matches WHERE user1_id = :uid OR user2_id = :uid LIMIT :n
+    )
+""")
+
+# Счётчики уменьшаются и у соседей, и у самого пользователя: если профиль
+# восстановят посреди очистки, его статистика совпадёт с оставшимися данными
+
+def _on_swipes_to(db: Session, rows, user_id: int) -> None:
+    likes = Counter(liker_id for liker_id, action in rows if action == 'like')
+    deltas = defaultdict(dict, {liker_id: {"likes_sent": -n} for liker_id, n in likes.items()})
+    deltas[user_id]["likes_received"] = -sum(likes.values())
+    profile_stats_service.adjust(db, deltas)
+
+def _on_swipes_from(db: Session, rows, user_id: int) -> None:
+    likes = Counter(owner_id for owner_id, action in rows if action == 'like')
+    deltas = defaultdict(dict, {owner_id: {"likes_received": -n} for owner_id, n in likes.items()})
+    deltas[user_id]["likes_sent"] = -sum(likes.values())
+    profile_stats_service.adjust(db, deltas)
+
+def _on_feedback(db: Session, rows, user_id: int) -> None:
+    feedback_service.remove_counts(db, Counter((to_user_id, feedback_type) for to_user_id, feedback_type in rows))
+
+def _on_matches(db: Session, rows, user_id: int) -> None:
+    peers = Counter(peer_user_id for (peer_user_id,) in rows)
+    deltas = defaultdict(dict, {peer_id: {"matches_count": -n} for peer_id, n in peers.items()})
+    deltas[user_id]["matches_count"] = -sum(peers.values())
+    profile_stats_service.adjust(db, deltas)
+
+def _run_batches(
+    pid: int,
+    user_id: int,
+    statement,
+    params: dict,
+    on_rows: Optional[Callable] = None
+) -> Optional[int]:
+    """
+    Повторяет пачечный DELETE до пустой пачки, каждую пачку - своей транзакцией
+
+    Возвращает число удалённых строк или None, если профиль восстановили.
+    """
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            if db.execute(_LOCK_SQL, {"pid": pid}).first() is None:
+                db.rollback()
+                return None
+            result = db.execute(statement, {**params, "n": settings.PROFILE_PURGE_BATCH_SIZE})
+            if on_rows is not None:
+                rows = result.all()
+                count = len(rows)
+                if rows:
+                    on_rows(db, rows, user_id)
+            else:
+                count = result.rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += count
+        if count < settings.PROFILE_PURGE_BATCH_SIZE:
+            return total
+        if settings.PROFILE_PURGE_PAUSE_SECONDS > 0:
+            time.sleep(settings.PROFILE_PURGE_PAUSE_SECONDS)
+
+def purge_profile(pid: int, user_id: int) -> bool:
+    """
+    Удаляет данные и строку удалённого профиля пачками
+
+    Возвращает False, если профиль восстановили (очистка прекращена).
+    """
+    steps = [
+        (_SWIPES_TO_SQL, {"pid": pid}, _on_swipes_to),
+        (_SWIPES_FROM_SQL, {"uid": user_id}, _on_swipes_from),
+        (_INBOX_LIKER_SQL, {"pid": pid}, None),
+        (_INBOX_OWNER_SQL, {"uid": user_id}, None),
+        (_FEEDBACK_SQL, {"uid": user_id}, _on_feedback),
+        (_MATCHES_SQL, {"uid": user_id}, _on_matches),
+        (_LEGACY_MATCHES_SQL, {"uid": user_id}, None),
+    ]
+    for statement, params, on_rows in steps:
+        if _run_batches(pid, user_id, statement, params, on_rows) is None:
+            logger.info(f"↩️ Очистка профиля {pid} прекращена: профиль восстановлен")
+            return False
+
+    db = SessionLocal()
+    try:
+        row = db.execute(_LOCK_SQL, {"pid": pid}).first()
+        if row is None:
+            db.rollback()
+            return False
+        db.execute(text("DELETE FROM profile_stats WHERE user_id = :uid"), {"uid": user_id})
+        db.execute(text("DELETE FROM connection_feedback_counts WHERE user_id = :uid"), {"uid": user_id})
+        db.execute(text("DELETE FROM swipe_exclusions WHERE user_id = :uid"), {"uid": user_id})
+        db.execute(text("DELETE FROM profiles WHERE id = :pid AND deleted_at IS NOT NULL"), {"pid": pid})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if row.photo_url:
+        delete_file(row.photo_url)
+    return True
+
+def _purge_job(payload: dict) -> None:
+    """Задача очистки: профиль, всё ещё удалённый дольше PROFILE_PURGE_DELAY_SECONDS"""
+    pid = payload["profile_id"]
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.PROFILE_PURGE_DELAY_SECONDS)
+    db = SessionLocal()
+    try:
+        row = db.execute(text("SELECT user_id, deleted_at FROM profiles WHERE id = :pid"), {"pid": pid}).first()
+        db.rollback()
+    finally:
+        db.close()
+    # Уже очищен или восстановлен; удалён повторно позже - очистит задача того удаления
+    if row is None or row.deleted_at is None or row.deleted_at > cutoff:
+        return
+    started = time.perf_counter()
+    if purge_profile(pid, row.user_id):
+        logger.info(f"🧹 Профиль {pid} (user_id={row.user_id}) очищен за {time.perf_counter() - started:.1f}s")
+
+def enqueue_overdue(limit: int = 1000) -> int:
+    """
+    Ставит задачи очистки удалённым профилям, чьё окно восстановления прошло
+
+    Для профилей, оставшихся без задачи (удалены до перехода на очередь или
+    их задача исчерпала попытки); лишняя задача ничего не ломает.
+    Возвращает число поставленных задач.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.PROFILE_PURGE_DELAY_SECONDS)
+    db = SessionLocal()
+    try:
+        due = db.execute(_DUE_SQL, {"cutoff": cutoff, "limit": limit}).all()
+        for pid, _ in due:
+            jobs.enqueue(db, PURGE_PROFILE_JOB, {"profile_id": pid})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return len(due)
+
+jobs.register(PURGE_PROFILE_JOB, _purge_job)
@@ -0,0 +1,362 @@
+"""
+Ранжирование кандидатов для колоды свайпов
+
+Держит в памяти процесса компактную матрицу активных профилей:
+- интересы и цели - битсеты (uint64-слова, один бит на id из словаря tags);
+- город и университет - целочисленные коды;
+- время создания профиля - для свежести.
+
+Скоринг всех кандидатов пользователя - один векторный проход NumPy
+(пересечение интересов/целей через popcount, совпадение города/вуза,
+экспоненциальное затухание свежести), затем argpartition для top-K.
+
+Индекс строится лениво при первом запросе колоды и обновляется точечно при
+сохранении профиля. Раз в RANKING_REFRESH_SECONDS фоновая задача (lifespan)
+перестраивает его полностью, чтобы подтянуть изменения, сделанные другими
+воркерами: запросы тем временем ранжируют по старому индексу, новый
+подменяет его одним присваиванием.
+Если NumPy недоступен или RANKING_ENABLED=false, rank_candidates возвращает
+None и колода сортируется по created_at, как раньше.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import Profile, SessionLocal
+from config import settings
+
+# NumPy импортируется при первом запросе колоды, а не при старте воркера
+np = None
+
+logger = logging.getLogger(__name__)
+
+# Веса компонент скоринга
+WEIGHT_INTERESTS = 3.0
+WEIGHT_GOALS = 2.0
+WEIGHT_CITY = 1.5
+WEIGHT_UNIVERSITY = 1.0
+WEIGHT_FRESHNESS = 1.0
+FRESHNESS_HALF_LIFE_DAYS = 14.0
+
+_INITIAL_CAPACITY = 1024
+_WORD_BITS = 64
+
+def _normalize(value) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+class _Vocabulary:
+    """Словарь значение -> плотный код (номер бита или код категории)"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value) -> int:
+        key = _normalize(value)
+        if not key:
+            return -1
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.codes)
+            self.codes[key] = code
+        return code
+
+    def lookup(self, value) -> int:
+        """Код без добавления в словарь (-1, если значение никому не встречалось)"""
+        return self.codes.get(_normalize(value), -1)
+
+    def words(self) -> int:
+        return max(1, (len(self.codes) + _WORD_BITS - 1) // _WORD_BITS)
+
+class CandidateIndex:
+    """Матрица признаков активных профилей (одна на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._interest_vocab = _Vocabulary()
+        self._goal_vocab = _Vocabulary()
+        self._city_vocab = _Vocabulary()
+        self._university_vocab = _Vocabulary()
+        self._row_of: Dict[int, int] = {}
+        self._size = 0
+        self._allocate(_INITIAL_CAPACITY, 1, 1)
+        self.built_at: Optional[float] = None
+
+    def _allocate(self, capacity: int, interest_words: int, goal_words: int) -> None:
+        self._profile_ids = np.zeros(capacity, dtype=np.int64)
+        self._user_ids = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._interests = np.zeros((capacity, interest_words), dtype=np.uint64)
+        self._goals = np.zeros((capacity, goal_words), dtype=np.uint64)
+        self._city = np.full(capacity, -1, dtype=np.int32)
+        self._university = np.full(capacity, -1, dtype=np.int32)
+        self._created = np.zeros(capacity, dtype=np.float64)
+
+    def _grow(self, min_capacity: int) -> None:
+        """Увеличивает число строк и/или слов битсетов, сохраняя данные"""
+        old = (
+            self._profile_ids, self._user_ids, self._active, self._interests,
+            self._goals, self._city, self._university, self._created
+        )
+        capacity = len(self._profile_ids)
+        while capacity < min_capacity:
+            capacity *= 2
+        interest_words = max(self._interests.shape[1], self._interest_vocab.words())
+        goal_words = max(self._goals.shape[1], self._goal_vocab.words())
+        self._allocate(capacity, interest_words, goal_words)
+        n = self._size
+        self._profile_ids[:n] = old[0][:n]
+        self._user_ids[:n] = old[1][:n]
+        self._active[:n] = old[2][:n]
+        self._interests[:n, :old[3].shape[1]] = old[3][:n]
+        self._goals[:n, :old[4].shape[1]] = old[4][:n]
+        self._city[:n] = old[5][:n]
+        self._university[:n] = old[6][:n]
+        self._created[:n] = old[7][:n]
+
+    def _bitset(self, values: Optional[Iterable], vocab: _Vocabulary, words: int, add: bool):
+        bits = np.zeros(words, dtype=np.uint64)
+        for value in values or ():
+            code = vocab.code(value) if add else vocab.lookup(value)
+            if 0 <= code < words * _WORD_BITS:
+                bits[code // _WORD_BITS] |= np.uint64(1) << np.uint64(code % _WORD_BITS)
+        return bits
+
+    def _set_row(self, profile) -> None:
+        # Сначала регистрируем значения в словарях, чтобы хватило слов битсета
+        for value in profile.interest_ids or ():
+            self._interest_vocab.code(value)
+        for value in profile.goal_ids or ():
+            self._goal_vocab.code(value)
+
+        row = self._row_of.get(profile.id)
+        needs_row = row is None
+        if (
+            (needs_row and self._size >= len(self._profile_ids))
+            or self._interest_vocab.words() > self._interests.shape[1]
+            or self._goal_vocab.words() > self._goals.shape[1]
+        ):
+            self._grow(self._size + 1)
+        if needs_row:
+            row = self._size
+            self._size += 1
+            self._row_of[profile.id] = row
+
+        self._profile_ids[row] = profile.id
+        self._user_ids[row] = profile.user_id
+        self._active[row] = bool(profile.is_active) and profile.deleted_at is None
+        self._interests[row] = self._bitset(profile.interest_ids, self._interest_vocab, self._interests.shape[1], True)
+        self._goals[row] = self._bitset(profile.goal_ids, self._goal_vocab, self._goals.shape[1], True)
+        self._city[row] = self._city_vocab.code(profile.city)
+        self._university[row] = self._university_vocab.code(profile.university)
+        # created_at в БД - наивное UTC: без tzinfo timestamp() считал бы его местным временем
+        created_at = profile.created_at or datetime.utcnow()
+        self._created[row] = created_at.replace(tzinfo=timezone.utc).timestamp()
+
+    def load(self, profiles: Iterable) -> None:
+        """Заполняет пустой индекс пачкой профилей"""
+        for profile in profiles:
+            self._set_row(profile)
+        self.built_at = time.monotonic()
+
+    def upsert(self, profile) -> None:
+        with self._lock:
+            self._set_row(profile)
+
+    def remove(self, profile_id: int) -> None:
+        with self._lock:
+            row = self._row_of.get(profile_id)
+            if row is not None:
+                self._active[row] = False
+
+    def __len__(self) -> int:
+        return int(self._active[:self._size].sum())
+
+    def top_k(
+        self,
+        profile,
+        exclude_profile_ids: Sequence[int],
+        exclude_user_ids: Sequence[int],
+        offset: int,
+        limit: int
+    ) -> List[int]:
+        """ID профилей-кандидатов в порядке убывания релевантности"""
+        with self._lock:
+            n = self._size
+            if n == 0 or limit <= 0:
+                return []
+
+            user_interests = self._bitset(profile.interest_ids, self._interest_vocab, self._interests.shape[1], False)
+            user_goals = self._bitset(profile.goal_ids, self._goal_vocab, self._goals.shape[1], False)
+            user_city = self._city_vocab.lookup(profile.city)
+            user_university = self._university_vocab.lookup(profile.university)
+
+            mask = self._active[:n] & (self._user_ids[:n] != profile.user_id)
+            if len(exclude_profile_ids):
+                mask &= ~np.isin(self._profile_ids[:n], np.asarray(exclude_profile_ids, dtype=np.int64))
+            if len(exclude_user_ids):
+                mask &= ~np.isin(self._user_ids[:n], np.asarray(exclude_user_ids, dtype=np.int64))
+            candidates = np.flatnonzero(mask)
+            if candidates.size <= offset:
+                return []
+
+            interest_total = max(1, int(np.bitwise_count(user_interests).sum()))
+            goal_total = max(1, int(np.bitwise_count(user_goals).sum()))
+            interest_overlap = np.bitwise_count(self._interests[candidates] & user_interests).sum(axis=1)
+            goal_overlap = np.bitwise_count(self._goals[candidates] & user_goals).sum(axis=1)
+            created = self._created[candidates]
+            age_days = np.maximum(time.time() - created, 0.0) / 86400.0
+
+            scores = (
+                WEIGHT_INTERESTS * (interest_overlap / interest_total)
+                + WEIGHT_GOALS * (goal_overlap / goal_total)
+                + WEIGHT_FRESHNESS * np.exp2(-age_days / FRESHNESS_HALF_LIFE_DAYS)
+            )
+            if user_city >= 0:
+                scores += WEIGHT_CITY * (self._city[candidates] == user_city)
+            if user_university >= 0:
+                scores += WEIGHT_UNIVERSITY * (self._university[candidates] == user_university)
+
+            k = min(offset + limit, candidates.size)
+            if k < candidates.size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(candidates.size)
+            # При равном скоре новее - выше
+            order = np.lexsort((-created[top], -scores[top]))
+            ranked = candidates[top[order]][offset:offset + limit]
+            return self._profile_ids[ranked].tolist()
+
+# Поля профиля, которые читает индекс (снимок, а не ORM-объект: его можно
+# применить позже, когда сессия профиля уже закрыта)
+_IndexRow = namedtuple("_IndexRow", (
+    "id", "user_id", "city", "university", "interest_ids", "goal_ids",
+    "created_at", "is_active", "deleted_at"
+))
+
+_index: Optional[CandidateIndex] = None
+_build_lock = threading.Lock()
+# Изменения профилей во время фоновой перестройки: (id профиля, снимок или
+# None для исключения). Применяются к новому индексу перед подменой
+_pending_lock = threading.Lock()
+_pending: Optional[List[Tuple[int, Optional[_IndexRow]]]] = None
+
+def _numpy_available() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+def is_enabled() -> bool:
+    return settings.RANKING_ENABLED and _numpy_available()
+
+def _build_index(db: Session) -> CandidateIndex:
+    index = CandidateIndex()
+    profiles = db.query(
+        Profile.id, Profile.user_id, Profile.city, Profile.university,
+        Profile.interest_ids, Profile.goal_ids, Profile.created_at,
+        Profile.is_active, Profile.deleted_at
+    ).filter(
+        Profile.is_active == True,
+        Profile.deleted_at == None
+    ).yield_per(2000)
+    started = time.perf_counter()
+    index.load(profiles)
+    logger.info(f"📊 Ranking: индекс построен, профилей={len(index)} за {(time.perf_counter() - started) * 1000:.0f}ms")
+    return index
+
+def _get_index(db: Session) -> CandidateIndex:
+    """Индекс процесса; при первом обращении строится в запросе, дальше его обновляет refresh_index()"""
+    global _index
+    index = _index
+    if index is not None:
+        return index
+    with _build_lock:
+        if _index is None:
+            _index = _build_index(db)
+        return _index
+
+def refresh_index() -> bool:
+    """
+    Полная перестройка индекса вне запросов (фоновая задача, раз в RANKING_REFRESH_SECONDS)
+
+    Индекс, который ещё ни разу не строился (колоду не запрашивали), не
+    трогается. Изменения профилей, пришедшие во время построения, применяются
+    к новому индексу перед подменой, иначе они пропали бы до следующей
+    перестройки. Читает основную БД: снимок не отстаёт от этих изменений.
+    """
+    global _index, _pending
+    if _index is None or not is_enabled():
+        return False
+    with _build_lock:
+        with _pending_lock:
+            _pending = []
+        try:
+            db = SessionLocal()
+            try:
+                index = _build_index(db)
+            finally:
+                db.close()
+            with _pending_lock:
+                for profile_id, row in _pending:
+                    if row is None:
+                        index.remove(profile_id)
+                    else:
+                        index.upsert(row)
+                _index = index
+        finally:
+            with _pending_lock:
+                _pending = None
+    return True
+
+def rank_candidates(
+    db: Session,
+    profile: Profile,
+    exclude_profile_ids: Sequence[int],
+    exclude_user_ids: Sequence[int],
+    offset: int,
+    limit: int
+) -> Optional[List[int]]:
+    """
+    Top-K кандидатов для колоды (ID профилей, по убыванию релевантности)
+
+    Возвращает None, если ранжирование выключено или сломалось -
+    вызывающий код должен откатиться на сортировку по created_at.
+    """
+    if not is_enabled():
+        return None
+    try:
+        return _get_index(db).top_k(profile, exclude_profile_ids, exclude_user_ids, offset, limit)
+    except Exception as e:
+        logger.warning(f"⚠️ Ranking: ошибка ранжирования, используем created_at: {e}")
+        return None
+
+def _apply(profile_id: int, row: Optional[_IndexRow]) -> None:
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append((profile_id, row))
+        index = _index
+        if index is not None:
+            if row is None:
+                index.remove(profile_id)
+            else:
+                index.upsert(row)
+
+def on_profile_saved(profile: Profile) -> None:
+    """Точечное обновление строки индекса после создания/изменения профиля"""
+    _apply(profile.id, _IndexRow(
+        profile.id, profile.user_id, profile.city, profile.university, profile.interest_ids,
+        profile.goal_ids, profile.created_at, profile.is_active, profile.deleted_at
+    ))
+
+def on_profile_removed(profile_id: int) -> None:
+    """Исключает профиль из колоды до следующей перестройки индекса"""
+    _apply(profile_id, None)
@@ -0,0 +1,186 @@
+"""
+Сервис realtime-событий (мэтчи и входящие лайки)
+
+Сервисы публикуют события через publish() внутри своей транзакции.
+Доставка происходит только после commit:
+- по умолчанию событие кладётся в session.info и после commit раздаётся
+  подписчикам текущего процесса;
+- при REALTIME_PG_NOTIFY=true событие отправляется через pg_notify (NOTIFY
+  транзакционный и уходит в момент commit), а PgEventListener в каждом
+  воркере слушает канал и раздаёт события своим подписчикам. Так события
+  доходят до пользователя, чьё SSE-соединение открыто в другом воркере.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "studnet_events"
+SUBSCRIBER_QUEUE_SIZE = 100
+_PENDING_KEY = "realtime_events"
+
+class EventBroker:
+    """In-process pub/sub: user_id -> набор очередей открытых SSE-соединений"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Регистрирует подписчика (вызывается из event loop)"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(q) for q in self._subscribers.values())
+
+    def dispatch(self, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        """Раздаёт событие подписчикам; потокобезопасно (можно звать из любого потока)"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or user_id not in self._subscribers:
+            return
+        loop.call_soon_threadsafe(self._deliver, user_id, {"type": event_type, "data": data})
+
+    def _deliver(self, user_id: int, message: Dict[str, Any]) -> None:
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Медленный клиент: событие теряется, клиент дочитает состояние REST-запросом
+                pass
+
+broker = EventBroker()
+
+# Служебные события (не для SSE-клиентов): тип -> обработчик(user_id, data)
+_internal_handlers: Dict[str, Callable[[int, Dict[str, Any]], None]] = {}
+
+def register_internal(event_type: str, handler: Callable[[int, Dict[str, Any]], None]) -> None:
+    """Регистрирует обработчик служебного события, которое не раздаётся подписчикам"""
+    _internal_handlers[event_type] = handler
+
+def _route(user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+    handler = _internal_handlers.get(event_type)
+    if handler is not None:
+        handler(user_id, data)
+    else:
+        broker.dispatch(user_id, event_type, data)
+
+def publish(db: Session, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+    """
+    Публикует событие для user_id в рамках текущей транзакции
+
+    Событие будет доставлено только если транзакция закоммитится.
+    """
+    if settings.REALTIME_PG_NOTIFY:
+        payload = json.dumps({"user_id": user_id, "type": event_type, "data": data}, separators=(",", ":"))
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+    else:
+        db.info.setdefault(_PENDING_KEY, []).append((user_id, event_type, data))
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending_events(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        for user_id, event_type, data in pending:
+            _route(user_id, event_type, data)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+class PgEventListener:
+    """
+    Фоновый поток с отдельным соединением, слушающий LISTEN studnet_events
+
+    Соединение не берётся из пула приложения: LISTEN держит его постоянно.
+    """
+
+    def __init__(self, database_url: str):
+        url = make_url(database_url).set(drivername="postgresql")
+        self._dsn = url.render_as_string(hide_password=False)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="pg-event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        import psycopg2
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.set_session(autocommit=True)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                logger.info(f"📡 Realtime: слушаем канал {CHANNEL}")
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"⚠️ Realtime listener: {e}; переподключение через {backoff:.0f}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    @staticmethod
+    def _handle(payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            _route(int(message["user_id"]), message["type"], message.get("data") or {})
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"⚠️ Realtime: некорректный payload: {payload[:200]}")
+
+_listener: Optional[PgEventListener] = None
+
+def start_listener() -> None:
+    """Запускает LISTEN-поток, если включён режим pg_notify"""
+    global _listener
+    if settings.REALTIME_PG_NOTIFY and _listener is None:
+        # LISTEN держит сессию, поэтому в обход PgBouncer, если задан прямой URL
+        _listener = PgEventListener(settings.DATABASE_DIRECT_URL or settings.DATABASE_URL)
+        _listener.start()
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
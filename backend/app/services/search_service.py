@@ -0,0 +1,147 @@
+"""
+Сервис фильтрованного поиска профилей (обёртка над SQL-функцией search_profiles)
+
+Функция вызывается без p_user_id, поэтому окно результатов (id, user_id,
+created_at) зависит только от фильтров и курсора и одинаково для всех
+пользователей - такие окна кэшируются на SEARCH_CACHE_TTL_SECONDS.
+Уже свайпнутые профили и мэтчи отсекаются поверх окна точечными запросами
+по (user_id, target_profile_id) и (user_id, peer_user_id).
+"""
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.database import Profile, MatchEdge
+from app.pagination import encode_cursor, decode_cursor
+from app.services import swipe_archive_service
+from config import settings
+
+# Сколько строк берётся из search_profiles за один вызов
+SEARCH_WINDOW = 200
+# Сколько окон максимум просматривается за запрос (если почти всё уже свайпнуто)
+MAX_WINDOWS_PER_REQUEST = 5
+
+_window_cache = TTLCache(ttl=settings.SEARCH_CACHE_TTL_SECONDS, maxsize=settings.SEARCH_CACHE_MAX_KEYS)
+
+_SEARCH_SQL = text("""
+    SELECT id, user_id, created_at
+    FROM search_profiles(
+        p_city => :city,
+        p_university => :university,
+        p_gender => :gender,
+        p_min_age => :min_age,
+        p_max_age => :max_age,
+        p_interests => CAST(:interests AS JSONB),
+        p_goals => CAST(:goals AS JSONB),
+        p_limit => :limit,
+        p_cursor_created_at => :cursor_created_at,
+        p_cursor_id => :cursor_id
+    )
+""")
+
+def _normalize_values(values: Optional[Sequence[str]]) -> Optional[Tuple[str, ...]]:
+    cleaned = sorted({value.strip() for value in values or () if value and value.strip()})
+    return tuple(cleaned) or None
+
+def _fetch_window(db: Session, filters: tuple, after: Optional[Tuple[datetime, int]]) -> List[tuple]:
+    """Окно кандидатов после ключа after (общий для всех пользователей кэш)"""
+    key = (filters, after)
+    rows = _window_cache.get(key)
+    if rows is not None:
+        return rows
+
+    city, university, gender, min_age, max_age, interests, goals = filters
+    rows = [tuple(row) for row in db.execute(_SEARCH_SQL, {
+        "city": city,
+        "university": university,
+        "gender": gender,
+        "min_age": min_age,
+        "max_age": max_age,
+        "interests": json.dumps(list(interests)) if interests else None,
+        "goals": json.dumps(list(goals)) if goals else None,
+        "limit": SEARCH_WINDOW,
+        "cursor_created_at": after[0] if after else None,
+        "cursor_id": after[1] if after else None,
+    })]
+    _window_cache.set(key, rows)
+    return rows
+
+def search_profiles(
+    db: Session,
+    user_id: int,
+    city: Optional[str] = None,
+    university: Optional[str] = None,
+    gender: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    interests: Optional[Sequence[str]] = None,
+    goals: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List[Profile], Optional[str]]:
+    """
+    Страница профилей по фильтрам без уже свайпнутых и мэтчей, новые сверху
+
+    interests/goals - совпадение хотя бы по одному значению.
+    Возвращает (profiles, next_cursor). Некорректный курсор - ValueError.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    filters = (
+        city or None,
+        university or None,
+        gender or None,
+        min_age,
+        max_age,
+        _normalize_values(interests),
+        _normalize_values(goals),
+    )
+
+    picked: List[int] = []
+    has_more = True
+    for _ in range(MAX_WINDOWS_PER_REQUEST):
+        window = _fetch_window(db, filters, after)
+        if not window:
+            has_more = False
+            break
+
+        window_ids = [row[0] for row in window]
+        window_user_ids = [row[1] for row in window]
+        swiped = swipe_archive_service.get_swiped_among(db, user_id, window_ids)
+        matched = {row[0] for row in db.query(MatchEdge.peer_user_id).filter(
+            MatchEdge.user_id == user_id,
+            MatchEdge.peer_user_id.in_(window_user_ids)
+        )}
+
+        for profile_id, profile_user_id, created_at in window:
+            after = (created_at, profile_id)
+            if profile_user_id == user_id or profile_id in swiped or profile_user_id in matched:
+                continue
+            picked.append(profile_id)
+            if len(picked) == limit:
+                break
+
+        # Короткое окно, дочитанное до конца, - результатов больше нет
+        if len(window) < SEARCH_WINDOW and after == (window[-1][2], window[-1][0]):
+            has_more = False
+            break
+        if len(picked) == limit:
+            break
+
+    next_cursor = encode_cursor(*after) if has_more and after is not None else None
+    if not picked:
+        return [], next_cursor
+
+    # Окно могло устареть за TTL - повторно проверяем активность
+    profiles_by_id = {
+        profile.id: profile
+        for profile in db.query(Profile).filter(
+            Profile.id.in_(picked),
+            Profile.is_active == True,
+            Profile.deleted_at == None
+        )
+    }
+    return [profiles_by_id[pid] for pid in picked if pid in profiles_by_id], next_cursor
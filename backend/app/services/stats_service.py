@@ -0,0 +1,80 @@
+"""
+Статистика для /api/debug/stats: активные профили, свайпы и мэтчи
+
+Стоимость не зависит от размера таблиц; способ подсчёта - STATS_MODE:
+- counters - сумма шардов table_counters, которые ведут триггеры
+  (миграция 007): точное значение на момент чтения, несколько строк;
+- estimate - pg_class.reltuples (оценка autovacuum/ANALYZE; для
+  секционированных таблиц - сумма по секциям). Для profiles это все
+  строки, а не только активные;
+- exact - COUNT(*) по таблицам (линейно от размера, для сверки).
+Пока миграция 007 не применена, counters откатывается на estimate.
+Результат кэшируется в процессе на STATS_REFRESH_SECONDS (см. routers/debug.py).
+"""
+import logging
+from typing import Dict
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import Session
+
+from app.database import Profile, Swipe, Match, TableCounter
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("profiles", "swipes", "matches")
+MODES = ("counters", "estimate", "exact")
+
+# Сумма reltuples самой таблицы или её листовых секций (у секционированного
+# родителя строк нет); -1 у ещё не проанализированных таблиц считается как 0
+_ESTIMATE_SQL = text("""
+    SELECT t.name, COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+    FROM unnest(CAST(:names AS text[])) AS t(name)
+    JOIN pg_class c ON c.relkind <> 'p' AND c.oid IN (
+        SELECT t.name::regclass
+        UNION ALL
+        SELECT relid FROM pg_partition_tree(t.name::regclass) WHERE isleaf
+    )
+    GROUP BY t.name
+""")
+
+_counters_missing = False
+
+def _from_counters(db: Session) -> Dict[str, int]:
+    rows = (
+        db.query(TableCounter.name, func.sum(TableCounter.value))
+        .filter(TableCounter.name.in_(COUNTERS))
+        .group_by(TableCounter.name)
+        .all()
+    )
+    counts = {name: 0 for name in COUNTERS}
+    counts.update({name: int(value) for name, value in rows})
+    return counts
+
+def _from_estimate(db: Session) -> Dict[str, int]:
+    counts = {name: 0 for name in COUNTERS}
+    counts.update({name: int(value) for name, value in db.execute(_ESTIMATE_SQL, {"names": list(COUNTERS)})})
+    return counts
+
+def _exact(db: Session) -> Dict[str, int]:
+    return {
+        "profiles": db.query(Profile).filter(Profile.is_active == True, Profile.deleted_at == None).count(),
+        "swipes": db.query(Swipe).count(),
+        "matches": db.query(Match).count(),
+    }
+
+def get_stats(db: Session) -> Dict[str, object]:
+    """Количество активных профилей, свайпов и мэтчей и способ подсчёта ("mode")"""
+    global _counters_missing
+    mode = settings.STATS_MODE if settings.STATS_MODE in MODES else "counters"
+    if mode == "exact":
+        return {**_exact(db), "mode": mode}
+    if mode == "counters" and not _counters_missing:
+        try:
+            return {**_from_counters(db), "mode": mode}
+        except ProgrammingError:
+            db.rollback()
+            _counters_missing = True
+            logger.warning("⚠️  Stats: таблицы table_counters нет (миграция 007) - используется оценка reltuples до перезапуска")
+    return {**_from_estimate(db), "mode": "estimate"}
@@ -0,0 +1,103 @@
+"""
+Архив старых пропусков (swipe_exclusions)
+
+Пропуск нужен только для того, чтобы профиль больше не показывался, поэтому
+пропуски старше SWIPE_ARCHIVE_AFTER_DAYS переносятся из swipes в одну
+строку на пользователя - отсортированный массив id профилей. Лайки и свежие
+пропуски остаются в swipes (их читают мэтчи, инбокс и profile_stats).
+
+Всё, что раньше проверяло «пользователь уже свайпал профиль», смотрит в оба
+места через функции этого модуля: колода, поиск, инбокс, повторный пропуск.
+Лайк профиля из архива создаёт обычную строку swipes; id в архиве при этом
+остаётся и по-прежнему только исключает профиль из выдачи.
+
+compact_batch() переносит пропуски пачки пользователей одним оператором
+(DELETE ... RETURNING -> INSERT ... ON CONFLICT) - см. compact_swipes.py.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.database import Profile, Swipe, SwipeExclusion
+
+_COMPACT_SQL = text("""
+    WITH moved AS (
+        DELETE FROM swipes
+        WHERE user_id = ANY(:user_ids) AND action = 'pass' AND created_at < :cutoff
+        RETURNING user_id, target_profile_id
+    ), grouped AS (
+        SELECT user_id, array_agg(DISTINCT target_profile_id ORDER BY target_profile_id) AS profile_ids
+        FROM moved
+        GROUP BY user_id
+    ), saved AS (
+        INSERT INTO swipe_exclusions AS e (user_id, profile_ids, updated_at)
+        SELECT user_id, profile_ids, CURRENT_TIMESTAMP FROM grouped
+        ON CONFLICT (user_id) DO UPDATE SET
+            profile_ids = ARRAY(
+                SELECT DISTINCT x FROM unnest(e.profile_ids || EXCLUDED.profile_ids) AS x ORDER BY x
+            ),
+            updated_at = EXCLUDED.updated_at
+        RETURNING user_id
+    )
+    SELECT (SELECT COUNT(*) FROM moved), (SELECT COUNT(*) FROM saved)
+""")
+
+def get_swiped_profile_ids(db: Session, user_id: int) -> List[int]:
+    """Все профили, которые пользователь свайпал (swipes + архив), одним запросом"""
+    recent = db.query(Swipe.target_profile_id).filter(Swipe.user_id == user_id)
+    archived = db.query(func.unnest(SwipeExclusion.profile_ids)).filter(SwipeExclusion.user_id == user_id)
+    return [row[0] for row in recent.union_all(archived)]
+
+def get_swiped_among(db: Session, user_id: int, profile_ids: Iterable[int]) -> Set[int]:
+    """Какие из profile_ids пользователь уже свайпал (swipes + архив)"""
+    profile_ids = list(profile_ids)
+    if not profile_ids:
+        return set()
+    recent = db.query(Swipe.target_profile_id).filter(
+        Swipe.user_id == user_id,
+        Swipe.target_profile_id.in_(profile_ids)
+    )
+    archived_ids = func.unnest(SwipeExclusion.profile_ids).column_valued("profile_id")
+    archived = db.query(archived_ids).select_from(SwipeExclusion).filter(
+        SwipeExclusion.user_id == user_id,
+        archived_ids.in_(profile_ids)
+    )
+    return {row[0] for row in recent.union_all(archived)}
+
+def is_archived(db: Session, user_id: int, profile_id: int) -> bool:
+    """Есть ли профиль в архиве пропусков пользователя"""
+    return db.query(SwipeExclusion.user_id).filter(
+        SwipeExclusion.user_id == user_id,
+        SwipeExclusion.profile_ids.contains([profile_id])
+    ).first() is not None
+
+def compact_batch(
+    db: Session,
+    cutoff: datetime,
+    after_user_id: int = 0,
+    batch_size: int = 1000,
+    user_ids: Optional[List[int]] = None
+) -> Tuple[List[int], int]:
+    """
+    Переносит пропуски старше cutoff пачки пользователей в архив и делает commit
+
+    Пачка - user_ids или следующие batch_size профилей после after_user_id.
+    Возвращает (user_id пачки по возрастанию, число перенесённых пропусков).
+    """
+    if user_ids is None:
+        user_ids = [row[0] for row in db.query(Profile.user_id).filter(
+            Profile.user_id > after_user_id
+        ).order_by(Profile.user_id).limit(batch_size)]
+    else:
+        user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return [], 0
+    try:
+        moved, _ = db.execute(_COMPACT_SQL, {"user_ids": user_ids, "cutoff": cutoff}).one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return user_ids, moved
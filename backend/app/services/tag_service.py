@@ -0,0 +1,102 @@
+"""
+Словарь интересов и целей (таблица tags)
+
+Каждое различное значение интереса/цели получает небольшой целочисленный id,
+а профиль хранит массивы interest_ids/goal_ids рядом с исходным JSONB.
+Фильтрация и скоринг работают с целыми числами, а при ответе id
+раскодируются пачкой через кэш словаря процесса.
+
+Словарь только растёт и почти не меняется, поэтому кэш не инвалидируется:
+неизвестные id догружаются одним запросом в prime().
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.database import Tag, engine
+
+logger = logging.getLogger(__name__)
+
+KIND_INTEREST = "interest"
+KIND_GOAL = "goal"
+MAX_TAG_LENGTH = 255
+
+_lock = threading.Lock()
+_values: Dict[int, str] = {}
+_ids: Dict[Tuple[str, str], int] = {}
+
+def _remember(kind: str, rows: Iterable[Tuple[int, str]]) -> None:
+    with _lock:
+        for tag_id, value in rows:
+            _values[tag_id] = value
+            _ids[(kind, value)] = tag_id
+
+def clean_values(values: Optional[Sequence]) -> List[str]:
+    """Обрезает пробелы, убирает пустые значения и дубликаты (порядок сохраняется)"""
+    result: List[str] = []
+    seen = set()
+    for value in values or ():
+        value = str(value).strip()[:MAX_TAG_LENGTH]
+        if value and value not in seen:
+            seen.add(value)
+            result.append(value)
+    return result
+
+def encode(db: Session, kind: str, values: Sequence[str]) -> List[int]:
+    """
+    Кодирует значения в id словаря, добавляя новые значения
+
+    Новые записи словаря вставляются отдельной короткой транзакцией: они
+    безвредны, даже если транзакция профиля потом откатится, и кэш процесса
+    никогда не ссылается на незакоммиченные id.
+    """
+    values = clean_values(values)
+    missing = [value for value in values if (kind, value) not in _ids]
+    if missing:
+        with engine.begin() as conn:
+            conn.execute(
+                pg_insert(Tag.__table__)
+                .values([{"kind": kind, "value": value} for value in missing])
+                .on_conflict_do_nothing(index_elements=["kind", "value"])
+            )
+        _remember(kind, db.query(Tag.id, Tag.value).filter(Tag.kind == kind, Tag.value.in_(missing)))
+    return [_ids[(kind, value)] for value in values if (kind, value) in _ids]
+
+def encode_many(db: Session, kind: str, value_lists: Sequence[Sequence[str]]) -> List[List[int]]:
+    """Кодирует списки значений пачки профилей: новые значения всей пачки добавляются одной вставкой"""
+    value_lists = [clean_values(values) for values in value_lists]
+    encode(db, kind, [value for values in value_lists for value in values])
+    return [[_ids[(kind, value)] for value in values if (kind, value) in _ids] for values in value_lists]
+
+def lookup(db: Session, kind: str, values: Sequence[str]) -> List[int]:
+    """id существующих значений без добавления новых (для фильтров поиска)"""
+    values = clean_values(values)
+    missing = [value for value in values if (kind, value) not in _ids]
+    if missing:
+        _remember(kind, db.query(Tag.id, Tag.value).filter(Tag.kind == kind, Tag.value.in_(missing)))
+    return [_ids[(kind, value)] for value in values if (kind, value) in _ids]
+
+def prime_ids(db: Session, tag_ids: Iterable[int]) -> None:
+    """Догружает в кэш одним запросом id, которых там ещё нет"""
+    missing = {tag_id for tag_id in tag_ids if tag_id not in _values}
+    if missing:
+        rows = db.query(Tag.id, Tag.kind, Tag.value).filter(Tag.id.in_(missing)).all()
+        with _lock:
+            for tag_id, kind, value in rows:
+                _values[tag_id] = value
+                _ids[(kind, value)] = tag_id
+
+def prime(db: Session, profiles: Iterable) -> None:
+    """Догружает в кэш одним запросом все id, встречающиеся в профилях"""
+    tag_ids = []
+    for profile in profiles:
+        tag_ids.extend(profile.interest_ids or ())
+        tag_ids.extend(profile.goal_ids or ())
+    prime_ids(db, tag_ids)
+
+def decode(tag_ids: Optional[Sequence[int]]) -> List[str]:
+    """Раскодирует id из кэша (перед этим для пачки профилей нужен prime())"""
+    return [_values[tag_id] for tag_id in tag_ids or () if tag_id in _values]
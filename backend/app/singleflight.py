@@ -0,0 +1,68 @@
+"""
+Single-flight: одна загрузка на ключ для одновременных одинаковых запросов
+
+Первый вызов SingleFlight.do(key, fn, ...) запускает fn в threadpool
+(синхронный доступ к БД не блокирует event loop), остальные вызовы с тем же
+ключом, пришедшие до завершения, ждут ту же задачу и получают тот же
+результат (или то же исключение). Отмена одного ожидающего (клиент
+отключился) не отменяет загрузку для остальных.
+
+С ttl > 0 результат ещё ttl секунд отдаётся из микрокэша. forget(key)
+сбрасывает кэш и «отвязывает» идущую загрузку: её результат не попадёт в
+кэш, а новые вызовы начнут новую загрузку.
+
+Результат разделяется между запросами - он должен использоваться только
+на чтение.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from app.cache import TTLCache
+
+class SingleFlight:
+    """Объединение одинаковых одновременных загрузок в пределах воркера"""
+
+    def __init__(self, ttl: float = 0.0, maxsize: int = 1024):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize) if ttl > 0 else None
+        self.loads = 0
+        self.shared = 0
+        self.cache_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached[0]
+        task = self._inflight.get(key)
+        if task is None:
+            self.loads += 1
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is not task:
+            # Ключ сброшен через forget() во время загрузки
+            if not task.cancelled():
+                task.exception()
+            return
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self._cache is not None:
+            # Кортеж - чтобы закэшировать и результат None
+            self._cache.set(key, (task.result(),))
+
+    def forget(self, key: Hashable) -> None:
+        """Сбрасывает микрокэш ключа и отвязывает идущую загрузку"""
+        if self._cache is not None:
+            self._cache.delete(key)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"loads": self.loads, "shared": self.shared, "cache_hits": self.cache_hits, "in_flight": len(self._inflight)}
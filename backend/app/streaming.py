@@ -0,0 +1,92 @@
+"""
+Потоковые ответы списков: серверный курсор -> порции -> JSON-массив или NDJSON
+
+Обычная страница списка (мэтчи, входящие лайки) собирается целиком и
+сериализуется одним JSONResponse. В потоковом режиме (?stream=json|ndjson
+или Accept: application/x-ndjson) весь список с позиции курсора читается
+серверным курсором (yield_per) порциями по STREAM_CHUNK_SIZE строк, и
+каждая порция сразу сериализуется и отправляется: память запроса - одна
+порция, первый байт уходит после первой порции, а не после всего списка.
+
+Генератор тела выполняется в threadpool (StreamingResponse с обычным
+итератором) и открывает свою сессию: сессия зависимости закрывается
+раньше, чем заканчивается отправка. Соединение БД занято, пока идёт
+отправка. Статус 200 уходит до чтения данных, поэтому ошибка посреди
+потока обрывает соединение (тело без завершающего чанка) - клиент видит
+неполный ответ, а не короткий список.
+"""
+import json
+import logging
+from itertools import islice
+from typing import Callable, Iterator, List, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM_JSON = "json"
+STREAM_NDJSON = "ndjson"
+STREAM_PATTERN = f"^({STREAM_JSON}|{STREAM_NDJSON})$"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def stream_format(request: Request, stream: Optional[str]) -> Optional[str]:
+    """Формат потокового ответа (?stream= или Accept: application/x-ndjson); None - обычная страница"""
+    if stream:
+        return stream
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return STREAM_NDJSON
+    return None
+
+def _dumps(item: dict) -> str:
+    # Как у JSONResponse
+    return json.dumps(item, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+def stream_list(
+    fmt: str,
+    session_factory: Callable[[], Session],
+    build_query: Callable[[Session], Query],
+    serialize: Callable[[Session, list], List[dict]],
+    label: str = "list"
+) -> StreamingResponse:
+    """
+    StreamingResponse со всеми строками build_query(db)
+
+    serialize(db, rows) превращает порцию строк запроса в элементы ответа
+    (одним запросом на порцию для связанных данных, как для страницы).
+    """
+    chunk_size = settings.STREAM_CHUNK_SIZE
+
+    def body() -> Iterator[bytes]:
+        db = session_factory()
+        total = 0
+        try:
+            if fmt == STREAM_JSON:
+                yield b"["
+            rows = iter(build_query(db).yield_per(chunk_size))
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                items = [_dumps(item) for item in serialize(db, chunk)]
+                if fmt == STREAM_NDJSON:
+                    payload = "".join(item + "\n" for item in items)
+                else:
+                    payload = ("," if total else "") + ",".join(items)
+                total += len(items)
+                yield payload.encode()
+            if fmt == STREAM_JSON:
+                yield b"]"
+            logger.info(f"📤 Поток {label}: отправлено {total} элементов")
+        except Exception as e:
+            logger.error(f"❌ Поток {label} оборван после {total} элементов: {e}", exc_info=True)
+            raise
+        finally:
+            db.close()
+
+    media_type = NDJSON_MEDIA_TYPE if fmt == STREAM_NDJSON else "application/json"
+    # X-Accel-Buffering: nginx отдаёт порции сразу, а не после всего тела
+    return StreamingResponse(body(), media_type=media_type, headers={"X-Accel-Buffering": "no"})
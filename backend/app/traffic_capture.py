@@ -0,0 +1,199 @@
+"""
+Запись анонимизированного трафика для последующего воспроизведения (replay)
+
+Включается через TRAFFIC_CAPTURE_ENABLED. На каждый попавший в выборку запрос
+пишется одна строка JSONL (у каждого процесса свой файл <имя>.<pid>.jsonl): метод, шаблон роута, «форма» query-параметров и тела,
+статус и длительность. Значения идентификаторов не сохраняются - вместо них
+пишутся псевдонимы (HMAC с солью), чтобы при воспроизведении сохранить
+распределение «горячих» ключей, не раскрывая сами данные.
+
+Запись в файл идёт из отдельного потока (QueueHandler/QueueListener),
+поэтому event loop не блокируется на дисковом вводе-выводе.
+"""
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+# Query-параметры, значения которых безопасно сохранять как есть (пагинация, режимы)
+SAFE_QUERY_KEYS = {"page", "size", "limit", "stream", "mode", "format"}
+
+# Тело запроса читаем для анализа формы только если это JSON и не больше лимита
+MAX_BODY_BYTES = 64 * 1024
+
+def _shape(value: Any, depth: int = 0) -> Any:
+    """Описывает «форму» значения без самих данных"""
+    if depth > 4:
+        return "..."
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return f"str:{len(value)}"
+    if isinstance(value, list):
+        return {"list": len(value), "item": _shape(value[0], depth + 1) if value else None}
+    if isinstance(value, dict):
+        return {str(k): _shape(v, depth + 1) for k, v in value.items()}
+    return type(value).__name__
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который отбрасывает записи при переполненной очереди вместо ошибки"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+def _query_shape(value: str) -> str:
+    """Форма строкового значения из query string"""
+    if value.lstrip("-").isdigit():
+        return "int"
+    return f"str:{len(value)}"
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware для выборочной записи конвертов запросов
+
+    Записываются только HTTP-запросы с путём, начинающимся с path_prefix.
+    """
+
+    def __init__(
+        self,
+        app,
+        path: str,
+        sample_rate: float = 0.1,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 5,
+        salt: str = "",
+        path_prefix: str = "/api",
+    ):
+        self.app = app
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.path_prefix = path_prefix
+        # Без явной соли псевдонимы стабильны только в пределах процесса
+        self._salt = (salt or secrets.token_hex(16)).encode()
+        self._logger = self._build_logger(path, max_bytes, backup_count)
+
+    @staticmethod
+    def _build_logger(path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+        """Логгер, пишущий сырые JSON-строки в ротируемый файл через фоновый поток"""
+        # RotatingFileHandler не рассчитан на несколько процессов - у каждого воркера свой файл
+        base = Path(path)
+        file_path = base.with_name(f"{base.stem}.{os.getpid()}{base.suffix}")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        file_handler = RotatingFileHandler(
+            file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+
+        logger = logging.getLogger(f"traffic_capture.{os.getpid()}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers = [_DroppingQueueHandler(log_queue)]
+        return logger
+
+    def _pseudonym(self, value: str) -> str:
+        """Стабильный псевдоним значения (идентификатора, токена)"""
+        return hmac.new(self._salt, value.encode(), hashlib.sha256).hexdigest()[:12]
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.path_prefix)
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        content_type = headers.get("content-type", "")
+        capture_body = content_type.startswith("application/json")
+        body = bytearray()
+        body_size = 0
+        status_holder: Dict[str, Optional[int]] = {"status": None}
+
+        async def receive_wrapper():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if capture_body and len(body) + len(chunk) <= MAX_BODY_BYTES:
+                    body.extend(chunk)
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        wall_ts = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            try:
+                self._record(scope, headers, content_type, bytes(body), body_size,
+                             status_holder["status"] or 500, wall_ts, duration_ms)
+            except Exception:
+                # Запись трафика никогда не должна ломать обработку запроса
+                pass
+
+    def _record(self, scope, headers, content_type, body, body_size, status_code, wall_ts, duration_ms):
+        route = scope.get("route")
+        template = getattr(route, "path", None)
+
+        path_params = {
+            name: self._pseudonym(str(value))
+            for name, value in (scope.get("path_params") or {}).items()
+        }
+
+        query = {}
+        for key, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+            query[key] = value if key in SAFE_QUERY_KEYS else _query_shape(value)
+
+        body_shape = None
+        if body_size:
+            body_shape = {"content_type": content_type.split(";")[0], "bytes": body_size}
+            if body:
+                try:
+                    body_shape["json"] = _shape(json.loads(body))
+                except ValueError:
+                    pass
+
+        authorization = headers.get("authorization")
+        envelope = {
+            "ts": round(wall_ts, 4),
+            "method": scope["method"],
+            "route": template,
+            "path_params": path_params,
+            "query": query,
+            "body": body_shape,
+            "actor": self._pseudonym(authorization) if authorization else None,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+        }
+        self._logger.info(json.dumps(envelope, ensure_ascii=False, separators=(",", ":")))
@@ -0,0 +1,96 @@
+"""
+Массовая загрузка и выгрузка профилей, свайпов и мэтчей
+
+Загрузка - COPY пачками во временные таблицы и вставка с пропуском уже
+существующих записей (см. app/services/bulk_service.py): миллион профилей
+загружается за минуты вместо часов запросов POST /api/profiles. Выгрузка
+читает серверным курсором и пишет NDJSON или CSV с постоянной памятью.
+Пользователи в файлах задаются user_id, поэтому выгрузку одной базы можно
+загрузить в другую (staging, миграция). Порядок загрузки: профили, мэтчи,
+свайпы.
+
+Использование:
+    python bulk_io.py export profiles -o profiles.ndjson
+    python bulk_io.py export swipes --format csv -o swipes.csv
+    python bulk_io.py import profiles profiles.ndjson --batch-size 20000
+    python bulk_io.py import matches matches.csv
+    cat swipes.ndjson | python bulk_io.py import swipes -
+"""
+import argparse
+import sys
+import time
+
+from app.database import SessionLocal, ReadSessionLocal
+from app.services.bulk_service import FORMATS, KINDS, export_records, import_records, read_records
+
+MAX_PRINTED_ERRORS = 20
+
+def _format_for(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+def _import(args) -> int:
+    fmt = _format_for(args.file, args.format)
+    stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8", newline="")
+    started = time.perf_counter()
+
+    def progress(result):
+        print(f"📦 {args.kind}: прочитано {result.read}, вставлено {result.inserted} ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        result = import_records(db, args.kind, read_records(stream, fmt), batch_size=args.batch_size, on_batch=progress)
+    finally:
+        db.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    for line_no, reason in result.errors[:MAX_PRINTED_ERRORS]:
+        print(f"⚠️ строка {line_no}: {reason}", file=sys.stderr)
+    if len(result.errors) > MAX_PRINTED_ERRORS:
+        print(f"⚠️ ... и ещё {len(result.errors) - MAX_PRINTED_ERRORS} отклонённых записей", file=sys.stderr)
+    print(
+        f"✅ {args.kind}: вставлено {result.inserted}, пропущено {result.skipped} (уже есть или нет профиля), "
+        f"отклонено {len(result.errors)} из {result.read} за {time.perf_counter() - started:.1f}s",
+        file=sys.stderr
+    )
+    return 1 if result.errors else 0
+
+def _export(args) -> int:
+    fmt = _format_for(args.output, args.format)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    started = time.perf_counter()
+    db = ReadSessionLocal()
+    try:
+        total = export_records(db, args.kind, fmt, out, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ {args.kind}: выгружено {total} записей за {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Массовая загрузка и выгрузка данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Загрузить записи из файла")
+    import_parser.add_argument("kind", choices=KINDS)
+    import_parser.add_argument("file", help="Путь к файлу или - для stdin")
+    import_parser.add_argument("--format", choices=FORMATS, help="По умолчанию - по расширению файла (.csv или NDJSON)")
+    import_parser.add_argument("--batch-size", type=int, default=10000, help="Записей в одной транзакции")
+    import_parser.set_defaults(handler=_import)
+
+    export_parser = commands.add_parser("export", help="Выгрузить записи в файл")
+    export_parser.add_argument("kind", choices=KINDS)
+    export_parser.add_argument("-o", "--output", default="-", help="Путь к файлу или - для stdout")
+    export_parser.add_argument("--format", choices=FORMATS, help="По умолчанию - по расширению файла (.csv или NDJSON)")
+    export_parser.add_argument("--chunk-size", type=int, default=5000, help="Строк за одно чтение курсора")
+    export_parser.set_defaults(handler=_export)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+"""
+Перенос старых пропусков из swipes в архив swipe_exclusions
+
+Пропуски старше SWIPE_ARCHIVE_AFTER_DAYS (или --older-than-days) удаляются
+из swipes и добавляются в массив исключений пользователя - таблица свайпов
+и её индексы перестают расти вместе с историей. Идёт пачками по user_id с
+commit после каждой пачки, поэтому его можно запускать на работающем
+сервисе (например, раз в сутки по расписанию).
+
+Использование:
+    python compact_swipes.py                                # все пользователи
+    python compact_swipes.py --older-than-days 30 --batch-size 500 --sleep 0.1
+    python compact_swipes.py --user-id 123 --user-id 456
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.services.swipe_archive_service import compact_batch
+from config import settings
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Архивация старых пропусков")
+    parser.add_argument("--older-than-days", type=int, default=settings.SWIPE_ARCHIVE_AFTER_DAYS, help="Переносить пропуски старше N дней")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Пользователей в одной транзакции")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Пауза между пачками, сек (снижает нагрузку на БД)")
+    parser.add_argument("--user-id", type=int, action="append", help="Только эти пользователи")
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    started = time.perf_counter()
+    processed = moved = 0
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            user_ids, moved = compact_batch(db, cutoff, user_ids=args.user_id)
+            processed = len(user_ids)
+        else:
+            after = 0
+            while True:
+                user_ids, batch_moved = compact_batch(db, cutoff, after_user_id=after, batch_size=args.batch_size)
+                if not user_ids:
+                    break
+                processed += len(user_ids)
+                moved += batch_moved
+                after = user_ids[-1]
+                if batch_moved:
+                    print(f"📦 user_id <= {after}: перенесено {batch_moved}")
+                if args.sleep:
+                    time.sleep(args.sleep)
+    finally:
+        db.close()
+
+    print(f"✅ Обработано {processed} пользователей, в архив перенесено {moved} пропусков за {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -13,7 +13,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic import field_validator, model_validator
 import os
 
@@ -48,15 +48,9 @@ class Settings(BaseSettings):
             # Проверяем переменную окружения напрямую
             jwt_secret = os.getenv('JWT_SECRET', '')
             if jwt_secret:
-                print(f"✅ JWT_SECRET найден в переменных окружения (длина: {len(jwt_secret)})")
                 self.JWT_SECRET_KEY = jwt_secret
             elif self.JWT_SECRET:
-                print(f"✅ JWT_SECRET найден в настройках (длина: {len(self.JWT_SECRET)})")
                 self.JWT_SECRET_KEY = self.JWT_SECRET
-            else:
-                print("⚠️  JWT_SECRET не найден в переменных окружения")
-        else:
-            print(f"✅ JWT_SECRET_KEY уже установлен (длина: {len(self.JWT_SECRET_KEY)})")
         return self
     
     # Telegram
@@ -74,7 +68,128 @@ class Settings(BaseSettings):
     # File Upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE_MB: int = 5
-    
+
+    # Старт приложения (выполняется в lifespan, а не при импорте)
+    DB_CREATE_ALL: bool = False  # create_all по моделям; в продакшене схема - schema.sql + migrations/
+    DB_STARTUP_CHECK: bool = False  # Отдельная проверка SELECT 1 до приёма запросов
+    DB_POOL_PREWARM: int = 2  # Сколько соединений пула открыть заранее (в фоне, параллельно)
+
+    # Пул соединений одного воркера
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # Общий лимит соединений всех воркеров к БД (0 - не ограничивать, используются значения выше).
+    # Если задан, пул каждого воркера делится поровну: DB_MAX_CONNECTIONS / WEB_CONCURRENCY
+    DB_MAX_CONNECTIONS: int = 0
+    DB_POOL_TIMEOUT: int = 30  # Секунд ожидания свободного соединения пула до ошибки
+
+    # Режим PgBouncer (transaction pooling): без pre-ping и серверных prepared statements,
+    # живость соединений проверяется в фоне раз в DB_LIVENESS_INTERVAL_SECONDS
+    DB_PGBOUNCER: bool = False
+    DB_PGBOUNCER_RECYCLE_SECONDS: int = 300  # Меньше client_idle_timeout PgBouncer
+    DB_LIVENESS_INTERVAL_SECONDS: int = 30
+    # Прямое подключение к Postgres в обход PgBouncer (для LISTEN realtime-событий)
+    DATABASE_DIRECT_URL: Optional[str] = None
+
+    # Реплика для чтения (опционально): GET-эндпоинты читают с неё через отдельный пул.
+    # Пусто - все запросы идут в DATABASE_URL
+    DATABASE_READ_URL: Optional[str] = None
+    # Сколько секунд после своей записи пользователь читает с primary (read-your-writes)
+    READ_YOUR_WRITES_SECONDS: int = 5
+
+    # Число воркеров (выставляется serve.py для процессов-воркеров)
+    WEB_CONCURRENCY: int = 1
+    SERVER_MAX_WORKERS: int = 8  # Верхняя граница автоподбора по числу CPU
+    SERVER_GRACEFUL_TIMEOUT: int = 20  # Секунд на дренаж запросов (и SSE) при остановке/перезапуске
+    # Адреса/подсети прокси, которым верим X-Forwarded-For/-Proto (через запятую); "*" - всем
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+
+    # Сжатие ответов (br/zstd/gzip): минимальный размер тела и кэш сжатых публичных тел по ETag
+    COMPRESSION_MIN_SIZE: int = 512
+    COMPRESSION_CACHE_MB: int = 16
+
+    # Контроль нагрузки (app/admission.py)
+    ADMISSION_ENABLED: bool = True
+    # Token bucket на пользователя: запросов в минуту и запас для всплеска
+    RATE_LIMIT_SWIPES_PER_MINUTE: int = 120
+    RATE_LIMIT_SWIPES_BURST: int = 30
+    RATE_LIMIT_WRITES_PER_MINUTE: int = 30
+    RATE_LIMIT_WRITES_BURST: int = 10
+    # Одновременных запросов на класс в воркере (0 - по размеру пула БД)
+    ADMISSION_READ_CONCURRENCY: int = 0
+    ADMISSION_WRITE_CONCURRENCY: int = 0
+    # Одновременных потоковых списков в воркере (0 - половина пула БД)
+    ADMISSION_STREAM_CONCURRENCY: int = 0
+    # Пороги перегрузки: при превышении лимит класса уменьшается вдвое
+    ADMISSION_POOL_WAIT_P95_MS: int = 100
+    ADMISSION_LATENCY_P95_MS: int = 1000
+
+    # Запись трафика для replay-бенчмарков (выключено по умолчанию)
+    TRAFFIC_CAPTURE_ENABLED: bool = False
+    TRAFFIC_CAPTURE_PATH: str = "captures/traffic.jsonl"
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = 0.1  # Доля записываемых запросов (0..1)
+    TRAFFIC_CAPTURE_MAX_MB: int = 50  # Размер файла до ротации
+    TRAFFIC_CAPTURE_BACKUP_COUNT: int = 5
+    TRAFFIC_CAPTURE_SALT: str = ""  # Соль для псевдонимов; без неё псевдонимы живут до рестарта
+
+    # Realtime-события: раздача между воркерами через Postgres LISTEN/NOTIFY
+    # Нужно включить, если запущено больше одного воркера
+    REALTIME_PG_NOTIFY: bool = False
+    EVENTS_TICKET_SECONDS: int = 60  # Срок жизни билета на подключение к /api/events
+
+    # Ранжирование колоды свайпов (NumPy-индекс в памяти процесса)
+    RANKING_ENABLED: bool = True
+    RANKING_REFRESH_SECONDS: int = 300  # Полная перестройка индекса (подхват изменений других воркеров)
+
+    # Кэш окон результатов поиска /api/profiles/search (общий для всех пользователей)
+    SEARCH_CACHE_TTL_SECONDS: int = 30
+    SEARCH_CACHE_MAX_KEYS: int = 1000
+
+    # Индекс автодополнения университетов/городов: период полной перестройки
+    AUTOCOMPLETE_REFRESH_SECONDS: int = 600
+
+    # Фасеты (города/вузы/интересы/цели с количеством): период полной перестройки
+    FACETS_REFRESH_SECONDS: int = 600
+
+    # Кэш версий профилей для ответов 304 без чтения строки (ETag = id + updated_at).
+    # Изменения сбрасываются сразу (в других воркерах - через REALTIME_PG_NOTIFY), TTL - страховка
+    PROFILE_VERSION_CACHE_SECONDS: int = 15
+    PROFILE_VERSION_CACHE_MAX_KEYS: int = 10000
+    # Микрокэш single-flight чтений профиля (сек; 0 - только объединение одновременных запросов)
+    PROFILE_SINGLEFLIGHT_CACHE_SECONDS: float = 1.0
+
+    # Кэш счётчиков отметок полезности (встраиваются в ответы с профилями).
+    # Новые отметки сбрасывают кэш сразу (в других воркерах - через REALTIME_PG_NOTIFY), TTL - страховка
+    FEEDBACK_CACHE_SECONDS: int = 300
+    FEEDBACK_CACHE_MAX_KEYS: int = 50000
+
+    # /api/debug/stats: counters - счётчики table_counters (миграция 007),
+    # estimate - оценка pg_class.reltuples, exact - COUNT(*) по таблицам
+    STATS_MODE: str = "counters"
+    STATS_REFRESH_SECONDS: float = 10.0  # Сколько секунд отдаётся закэшированный результат
+
+    # Фоновая очистка удалённых профилей (DELETE /api/profiles/me): через
+    # PROFILE_PURGE_DELAY_SECONDS (окно восстановления) задача очереди удаляет свайпы,
+    # мэтчи, отметки и фото пачками по PROFILE_PURGE_BATCH_SIZE строк, каждая - короткой транзакцией
+    PROFILE_PURGE_DELAY_SECONDS: int = 3600
+    PROFILE_PURGE_BATCH_SIZE: int = 500
+    PROFILE_PURGE_PAUSE_SECONDS: float = 0.05  # Пауза между пачками
+
+    # Пропуски старше стольких дней compact_swipes.py переносит из swipes в архив swipe_exclusions
+    SWIPE_ARCHIVE_AFTER_DAYS: int = 90
+
+    # Фоновые задачи (таблица jobs, миграция 012): воркер в процессе приложения
+    # (JOBS_IN_PROCESS) и/или отдельный процесс worker.py
+    JOBS_IN_PROCESS: bool = True
+    JOBS_CONCURRENCY: int = 2  # Задач одновременно на процесс
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0  # Пауза опроса, когда готовых задач нет
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 10.0  # Пауза перед повтором: base * 2^(попытка-1), с разбросом
+    JOBS_RETRY_MAX_SECONDS: float = 3600.0
+    JOBS_LOCK_TIMEOUT_SECONDS: int = 600  # Задача в running дольше - воркер считается упавшим
+
+    # Потоковые списки (?stream=json|ndjson): строк серверного курсора на одну порцию ответа
+    STREAM_CHUNK_SIZE: int = 200
+
     @field_validator('CORS_ORIGINS', mode='before')
     @classmethod
     def parse_cors_origins(cls, v):
@@ -102,18 +217,35 @@ if not isinstance(settings.CORS_ORIGINS, list):
 if not settings.JWT_SECRET_KEY or settings.JWT_SECRET_KEY == "your-secret-key-here-change-in-production":
     jwt_secret_env = os.getenv('JWT_SECRET', '')
     if jwt_secret_env:
-        print(f"✅ JWT_SECRET загружен из переменных окружения (длина: {len(jwt_secret_env)})")
         settings.JWT_SECRET_KEY = jwt_secret_env
-    else:
-        print("⚠️  JWT_SECRET не найден в переменных окружения при дополнительной проверке")
-else:
-    print(f"✅ JWT_SECRET_KEY уже установлен при дополнительной проверке (длина: {len(settings.JWT_SECRET_KEY)})")
-
-# Простая проверка при загрузке модуля
-def _check_config():
-    """Проверяет, загружены ли важные переменные окружения"""
-    import os
-    
+
+def db_pool_limits():
+    """
+    (pool_size, max_overflow) для пула одного воркера
+
+    При заданном DB_MAX_CONNECTIONS бюджет делится между WEB_CONCURRENCY
+    воркерами (минус LISTEN-соединение realtime, если оно идёт через тот же
+    DATABASE_URL), чтобы
+    все воркеры вместе не превысили лимит соединений БД.
+    """
+    if settings.DB_MAX_CONNECTIONS <= 0:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    workers = max(1, settings.WEB_CONCURRENCY)
+    per_worker = settings.DB_MAX_CONNECTIONS // workers
+    if settings.REALTIME_PG_NOTIFY and not settings.DATABASE_DIRECT_URL:
+        per_worker -= 1
+    per_worker = max(1, per_worker)
+    max_overflow = min(settings.DB_MAX_OVERFLOW, per_worker // 3)
+    pool_size = min(settings.DB_POOL_SIZE, per_worker - max_overflow)
+    return max(1, pool_size), max_overflow
+
+def check_config():
+    """
+    Проверяет, загружены ли важные переменные окружения, и печатает сводку
+
+    Вызывается из lifespan приложения (а не при импорте), чтобы не
+    задерживать импорт в каждом воркере и утилитах.
+    """
     warnings = []
     
     # Проверяем DATABASE_URL
@@ -126,7 +258,7 @@ def _check_config():
     if settings.JWT_SECRET_KEY == "your-secret-key-here-change-in-production":
         warnings.append("⚠️  JWT_SECRET_KEY использует значение по умолчанию (НЕБЕЗОПАСНО!) - установите в Koyeb")
     else:
-        print("✅ JWT_SECRET_KEY загружен из переменных окружения")
+        print(f"✅ JWT_SECRET_KEY загружен из переменных окружения (длина: {len(settings.JWT_SECRET_KEY)})")
     
     # Проверяем CORS_ORIGINS
     cors_origins_list = settings.CORS_ORIGINS if isinstance(settings.CORS_ORIGINS, list) else [settings.CORS_ORIGINS]
@@ -136,6 +268,13 @@ def _check_config():
     else:
         print(f"✅ CORS_ORIGINS загружен: {cors_str}")
     
+    # LISTEN держит сессию - в transaction pooling PgBouncer он не работает
+    if settings.DB_PGBOUNCER and settings.REALTIME_PG_NOTIFY and not settings.DATABASE_DIRECT_URL:
+        warnings.append("⚠️  DB_PGBOUNCER + REALTIME_PG_NOTIFY: задайте DATABASE_DIRECT_URL (LISTEN не работает через PgBouncer в transaction pooling)")
+    
+    if settings.STATS_MODE not in ("counters", "estimate", "exact"):
+        warnings.append(f"⚠️  STATS_MODE={settings.STATS_MODE!r} неизвестен - используется counters (допустимо: counters, estimate, exact)")
+    
     if warnings:
         print("\n" + "="*60)
         print("⚠️  ВНИМАНИЕ: Обнаружены проблемы с конфигурацией:")
@@ -144,10 +283,3 @@ def _check_config():
         print("="*60 + "\n")
     else:
         print("✅ Все важные переменные окружения загружены корректно\n")
-
-# Выполняем проверку при импорте (только если не в тестах)
-if __name__ != "__main__" or True:  # Всегда проверяем
-    try:
-        _check_config()
-    except Exception:
-        pass  # Игнорируем ошибки при проверке
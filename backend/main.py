@@ -40,15 +40,23 @@ sys.stderr = FilteredStderr(sys.stderr)
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
-from config import settings
-from app.routers import auth, profiles, matches, debug
+from config import settings, check_config
+from app.routers import auth, profiles, matches, debug, events
 from app.services.file_storage import UPLOAD_DIR
+from app.traffic_capture import TrafficCaptureMiddleware
+from app.services import realtime, ranking, purge_service, file_storage  # purge_service/file_storage регистрируют обработчики задач
+from app import database, jobs
+from app.pool_metrics import pool_status
+from app.pagination import NEXT_CURSOR_HEADER
+from app.compression import CompressionMiddleware
+from app.admission import AdmissionMiddleware, TokenBuckets, CLASS_READ, CLASS_STREAM, CLASS_SWIPE, CLASS_WRITE
 
 # Настройка логирования
 logging.basicConfig(
@@ -56,11 +64,92 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+_SECRET_QUERY_RE = re.compile(r"([?&](?:ticket|token)=)[^&\s]*")
+
+class RedactQueryFilter(logging.Filter):
+    """Скрывает билеты и токены из query string в access-логе uvicorn"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Аргументы access-лога uvicorn: (клиент, метод, путь с query, версия HTTP, статус)
+        if isinstance(record.args, tuple) and len(record.args) >= 3 and isinstance(record.args[2], str):
+            args = list(record.args)
+            args[2] = _SECRET_QUERY_RE.sub(r"\1***", args[2])
+            record.args = tuple(args)
+        return True
+
+logging.getLogger("uvicorn.access").addFilter(RedactQueryFilter())
+
+async def _pool_liveness_loop(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(database.check_pool_liveness)
+
+async def _ranking_refresh_loop(interval: int):
+    """Перестройка индекса колоды вне запросов (см. app/services/ranking.py)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(ranking.refresh_index)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"⚠️ Ranking: не удалось перестроить индекс: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Инициализация и завершение приложения
+
+    Всё, что раньше выполнялось при импорте модулей (проверки конфигурации,
+    create_all, проверка БД), делается здесь. Проверки схемы по умолчанию
+    выключены, а пул соединений прогревается в фоне, не задерживая приём
+    первого запроса.
+    """
+    check_config()
+    print(f"🔧 CORS настроен для origins: {settings.CORS_ORIGINS}")
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    if settings.DB_CREATE_ALL:
+        await asyncio.to_thread(database.create_tables)
+    if settings.DB_STARTUP_CHECK:
+        await asyncio.to_thread(database.check_database_connection)
+    prewarm = None
+    if settings.DB_POOL_PREWARM > 0:
+        prewarm = asyncio.create_task(asyncio.to_thread(database.prewarm_pool, settings.DB_POOL_PREWARM))
+    # Вместо pre-ping за PgBouncer - периодическая проверка живости соединений
+    liveness = None
+    if settings.DB_PGBOUNCER and settings.DB_LIVENESS_INTERVAL_SECONDS > 0:
+        liveness = asyncio.create_task(_pool_liveness_loop(settings.DB_LIVENESS_INTERVAL_SECONDS))
+    # LISTEN-поток для realtime-событий (если включён REALTIME_PG_NOTIFY)
+    realtime.start_listener()
+    ranking_refresh = None
+    if settings.RANKING_ENABLED and settings.RANKING_REFRESH_SECONDS > 0:
+        ranking_refresh = asyncio.create_task(_ranking_refresh_loop(settings.RANKING_REFRESH_SECONDS))
+    # Воркер фоновых задач в процессе приложения (см. app/jobs.py; отдельно - worker.py)
+    jobs_stop = asyncio.Event()
+    jobs_worker = None
+    if settings.JOBS_IN_PROCESS:
+        jobs_worker = asyncio.create_task(jobs.run_worker(jobs_stop))
+    try:
+        yield
+    finally:
+        realtime.stop_listener()
+        if jobs_worker is not None:
+            jobs_stop.set()
+            try:
+                await asyncio.wait_for(jobs_worker, timeout=10)
+            except asyncio.TimeoutError:
+                jobs_worker.cancel()
+        if ranking_refresh is not None:
+            ranking_refresh.cancel()
+        if liveness is not None:
+            liveness.cancel()
+        if prewarm is not None and not prewarm.done():
+            prewarm.cancel()
+
 # Инициализация FastAPI приложения
 app = FastAPI(
     title="StudNet API",
     description="Backend API для приложения нетворкинга StudNet",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Сбор простой статистики по латентности
@@ -68,8 +157,43 @@ LATENCIES = deque(maxlen=200)
 LATENCY_LOG_EVERY = 50
 LATENCY_COUNTER = 0
 
-# GZip сжатие ответов
-app.add_middleware(GZipMiddleware, minimum_size=512)
+# Сжатие ответов: br/zstd/gzip по Accept-Encoding, кэш сжатых тел по ETag (см. app/compression.py)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    cache_max_bytes=settings.COMPRESSION_CACHE_MB * 1024 * 1024,
+)
+
+# Контроль нагрузки: token bucket на пользователя и лимит одновременных запросов
+# на класс маршрутов (429/503 + Retry-After вместо ожидания пула БД до таймаута)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        limits={
+            CLASS_READ: settings.ADMISSION_READ_CONCURRENCY or database.POOL_SIZE + database.MAX_OVERFLOW,
+            CLASS_STREAM: settings.ADMISSION_STREAM_CONCURRENCY or database.POOL_SIZE // 2,
+            CLASS_SWIPE: settings.ADMISSION_WRITE_CONCURRENCY or database.POOL_SIZE,
+            CLASS_WRITE: settings.ADMISSION_WRITE_CONCURRENCY or database.POOL_SIZE,
+        },
+        buckets={
+            CLASS_SWIPE: TokenBuckets(settings.RATE_LIMIT_SWIPES_PER_MINUTE, settings.RATE_LIMIT_SWIPES_BURST),
+            CLASS_WRITE: TokenBuckets(settings.RATE_LIMIT_WRITES_PER_MINUTE, settings.RATE_LIMIT_WRITES_BURST),
+        },
+        pool=database.engine.pool,
+        pool_wait_threshold_ms=settings.ADMISSION_POOL_WAIT_P95_MS,
+        latency_threshold_ms=settings.ADMISSION_LATENCY_P95_MS,
+    )
+
+# Выборочная запись трафика для replay-бенчмарков (см. replay_traffic.py)
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        path=settings.TRAFFIC_CAPTURE_PATH,
+        sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+        max_bytes=settings.TRAFFIC_CAPTURE_MAX_MB * 1024 * 1024,
+        backup_count=settings.TRAFFIC_CAPTURE_BACKUP_COUNT,
+        salt=settings.TRAFFIC_CAPTURE_SALT,
+    )
 
 # Обработчик ошибок валидации (422)
 @app.exception_handler(RequestValidationError)
@@ -141,6 +265,11 @@ async def log_headers_middleware(request: Request, call_next):
         p95 = sorted_lat[int(0.95 * (len(sorted_lat) - 1))]
         logger = logging.getLogger("latency")
         logger.info(f"latency path={request.url.path} p50={p50:.1f}ms p95={p95:.1f}ms samples={len(sorted_lat)}")
+        pool = pool_status(database.engine.pool)
+        logging.getLogger("pool").info(
+            f"pool in_use={pool['checked_out']}/{pool['size']} overflow={pool['overflow']} "
+            f"wait_p95={pool['wait_p95_ms']:.1f}ms timeouts={pool['timeouts']}"
+        )
 
     # Добавляем кэш для статики /uploads
     if request.url.path.startswith("/uploads"):
@@ -149,14 +278,15 @@ async def log_headers_middleware(request: Request, call_next):
     return response
 
 # Настройка CORS
-print(f"🔧 CORS настроен для origins: {settings.CORS_ORIGINS}")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # "*" не работает вместе с allow_credentials: браузер не отдаёт скрипту
+    # заголовки, не перечисленные явно
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
     max_age=3600,
 )
 
@@ -165,9 +295,10 @@ app.include_router(auth.router)
 app.include_router(profiles.router)
 app.include_router(matches.router)
 app.include_router(debug.router)
+app.include_router(events.router)
 
-# Подключение статических файлов (фотографии)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Подключение статических файлов (фотографии); директория создаётся в lifespan
+app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR), check_dir=False), name="uploads")
 
 @app.get("/")
 async def root():
@@ -184,7 +315,8 @@ async def api_root():
             "auth": "/api/auth",
             "profiles": "/api/profiles",
             "matches": "/api/matches",
-            "debug": "/api/debug"
+            "debug": "/api/debug",
+            "events": "/api/events"
         }
     }
 
@@ -0,0 +1,55 @@
+"""
+Пересчёт статистики пользователей (profile_stats) по истории свайпов и мэтчей
+
+Счётчики обновляются инкрементами в транзакции свайпа; пересчёт выравнивает
+расхождения (свайпы во время backfill миграции 008, ручные правки БД).
+Идёт пачками по user_id с commit после каждой пачки и блокирует только
+строки текущей пачки, поэтому его можно запускать на работающем сервисе
+(например, раз в сутки по расписанию).
+
+Использование:
+    python recompute_profile_stats.py                       # все пользователи
+    python recompute_profile_stats.py --batch-size 500 --sleep 0.1
+    python recompute_profile_stats.py --user-id 123 --user-id 456
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.services.profile_stats_service import recompute_batch
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Пересчёт profile_stats")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Пользователей в одной транзакции")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Пауза между пачками, сек (снижает нагрузку на БД)")
+    parser.add_argument("--user-id", type=int, action="append", help="Пересчитать только этих пользователей")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    processed = fixed = 0
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            user_ids, fixed = recompute_batch(db, user_ids=args.user_id)
+            processed = len(user_ids)
+        else:
+            after = 0
+            while True:
+                user_ids, batch_fixed = recompute_batch(db, after_user_id=after, batch_size=args.batch_size)
+                if not user_ids:
+                    break
+                processed += len(user_ids)
+                fixed += batch_fixed
+                after = user_ids[-1]
+                if batch_fixed:
+                    print(f"🔧 user_id <= {after}: исправлено {batch_fixed}")
+                if args.sleep:
+                    time.sleep(args.sleep)
+    finally:
+        db.close()
+
+    print(f"✅ Пересчитано {processed} пользователей, исправлено {fixed} за {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
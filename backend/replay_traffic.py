@@ -0,0 +1,257 @@
+"""
+Воспроизведение записанного трафика и сравнение латентности двух сборок
+
+Трафик записывается TrafficCaptureMiddleware (TRAFFIC_CAPTURE_ENABLED=true).
+
+Использование:
+    # Прогнать запись против локального инстанса в 5 раз быстрее реального времени
+    python replay_traffic.py run captures/traffic.*.jsonl \\
+        --target http://localhost:8000 --speed 5 \\
+        --token $JWT_A --token $JWT_B \\
+        --param profile_id=1-500 --param user_id=100000-100200 \\
+        --out build_a.json
+
+    # Сравнить распределения латентности двух прогонов
+    python replay_traffic.py compare build_a.json build_b.json
+
+Значения path-параметров в записи заменены псевдонимами. При воспроизведении
+каждый псевдоним детерминированно отображается на значение из пула --param,
+поэтому «горячие» ключи остаются горячими. Тела запросов синтезируются по
+записанной форме (только JSON; multipart-запросы пропускаются).
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+MIN_SPEED = 1.0
+MAX_SPEED = 20.0
+
+def _load_envelopes(paths: List[str]) -> List[Dict[str, Any]]:
+    """Читает конверты из одного или нескольких JSONL-файлов и сортирует по времени"""
+    envelopes = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    envelope = json.loads(line)
+                except ValueError:
+                    continue
+                if envelope.get("route"):
+                    envelopes.append(envelope)
+    envelopes.sort(key=lambda e: e["ts"])
+    return envelopes
+
+def _parse_pool(spec: str) -> Tuple[str, List[str]]:
+    """Разбирает --param name=1-500 или name=a,b,c"""
+    name, _, values = spec.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"Invalid --param: {spec}")
+    if "-" in values and "," not in values:
+        low, high = values.split("-", 1)
+        return name, [str(v) for v in range(int(low), int(high) + 1)]
+    return name, [v for v in values.split(",") if v]
+
+def _pick(pool: List[str], pseudonym: str) -> str:
+    """Детерминированно выбирает значение из пула по псевдониму"""
+    digest = int(hashlib.sha1(pseudonym.encode()).hexdigest()[:8], 16)
+    return pool[digest % len(pool)]
+
+def _synthesize(shape: Any) -> Any:
+    """Строит значение по записанной форме"""
+    if isinstance(shape, dict):
+        if "list" in shape and "item" in shape:
+            item = shape["item"]
+            return [_synthesize(item) for _ in range(shape["list"])] if item is not None else []
+        return {k: _synthesize(v) for k, v in shape.items()}
+    if shape == "int":
+        return 1
+    if shape == "float":
+        return 1.0
+    if shape == "bool":
+        return False
+    if isinstance(shape, str) and shape.startswith("str:"):
+        return "x" * int(shape[4:] or 0)
+    return None
+
+class Replayer:
+    """Переигрывает конверты с заданным ускорением и собирает латентность по роутам"""
+
+    def __init__(self, target: str, speed: float, tokens: List[str], pools: Dict[str, List[str]],
+                 concurrency: int, timeout: float):
+        self.target = target.rstrip("/")
+        self.speed = speed
+        self.tokens = tokens
+        self.pools = pools
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.skipped = 0
+        self.max_lag_ms = 0.0
+
+    def _build_request(self, envelope: Dict[str, Any]) -> Optional[urllib.request.Request]:
+        path = envelope["route"]
+        for name, pseudonym in envelope.get("path_params", {}).items():
+            pool = self.pools.get(name)
+            if not pool:
+                return None
+            path = path.replace("{" + name + "}", _pick(pool, pseudonym))
+
+        query = {}
+        for key, value in envelope.get("query", {}).items():
+            query[key] = _synthesize(value) if value == "int" or str(value).startswith("str:") else value
+        url = self.target + path + (f"?{urlencode(query)}" if query else "")
+
+        data = None
+        headers = {}
+        body = envelope.get("body")
+        if body:
+            if "json" not in body:
+                return None
+            data = json.dumps(_synthesize(body["json"])).encode()
+            headers["Content-Type"] = "application/json"
+
+        if envelope.get("actor") and self.tokens:
+            headers["Authorization"] = f"Bearer {_pick(self.tokens, envelope['actor'])}"
+
+        return urllib.request.Request(url, data=data, headers=headers, method=envelope["method"])
+
+    def _fire(self, key: str, request: urllib.request.Request):
+        start = time.perf_counter()
+        status = 0
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = 0
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        with self.lock:
+            bucket = self.results.setdefault(key, {"latencies_ms": [], "statuses": {}})
+            bucket["latencies_ms"].append(round(duration_ms, 2))
+            bucket["statuses"][str(status)] = bucket["statuses"].get(str(status), 0) + 1
+
+    def run(self, envelopes: List[Dict[str, Any]]):
+        if not envelopes:
+            return
+        t0_capture = envelopes[0]["ts"]
+        t0_replay = time.perf_counter()
+        for envelope in envelopes:
+            request = self._build_request(envelope)
+            if request is None:
+                self.skipped += 1
+                continue
+
+            due = (envelope["ts"] - t0_capture) / self.speed
+            delay = due - (time.perf_counter() - t0_replay)
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.max_lag_ms = max(self.max_lag_ms, -delay * 1000)
+
+            key = f"{envelope['method']} {envelope['route']}"
+            self.executor.submit(self._fire, key, request)
+        self.executor.shutdown(wait=True)
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "p99": _percentile(values, 0.99),
+    }
+
+def cmd_run(args) -> int:
+    if not MIN_SPEED <= args.speed <= MAX_SPEED:
+        print(f"--speed must be between {MIN_SPEED:g} and {MAX_SPEED:g}", file=sys.stderr)
+        return 2
+
+    envelopes = _load_envelopes(args.captures)
+    pools = dict(_parse_pool(spec) for spec in args.param)
+    replayer = Replayer(args.target, args.speed, args.token, pools, args.concurrency, args.timeout)
+
+    print(f"▶️  Воспроизведение {len(envelopes)} запросов против {args.target} (x{args.speed:g})")
+    started = time.time()
+    replayer.run(envelopes)
+    elapsed = time.time() - started
+
+    report = {
+        "meta": {
+            "target": args.target,
+            "speed": args.speed,
+            "requests": len(envelopes),
+            "skipped": replayer.skipped,
+            "elapsed_s": round(elapsed, 2),
+            "max_lag_ms": round(replayer.max_lag_ms, 1),
+        },
+        "routes": replayer.results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+    print(f"✅ Готово за {elapsed:.1f}s, пропущено {replayer.skipped}, макс. отставание {replayer.max_lag_ms:.0f}ms")
+    for key, bucket in sorted(replayer.results.items()):
+        s = _summary(bucket["latencies_ms"])
+        print(f"   {key:<50} n={s['count']:<6} p50={s['p50']:.1f}ms p95={s['p95']:.1f}ms p99={s['p99']:.1f}ms")
+    return 0
+
+def cmd_compare(args) -> int:
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["routes"]
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)["routes"]
+
+    print(f"{'route':<50} {'n':>6} {'p50 A':>9} {'p50 B':>9} {'p95 A':>9} {'p95 B':>9} {'Δp95':>8}")
+    for key in sorted(set(baseline) | set(candidate)):
+        a = _summary(baseline.get(key, {}).get("latencies_ms", []))
+        b = _summary(candidate.get(key, {}).get("latencies_ms", []))
+        delta = f"{(b['p95'] - a['p95']) / a['p95'] * 100:+.0f}%" if a["p95"] and b["count"] else "-"
+        print(f"{key:<50} {min(a['count'], b['count']):>6} {a['p50']:>8.1f} {b['p50']:>8.1f} "
+              f"{a['p95']:>8.1f} {b['p95']:>8.1f} {delta:>8}")
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay записанного трафика StudNet API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Воспроизвести запись против инстанса")
+    run.add_argument("captures", nargs="+", help="JSONL-файлы записи")
+    run.add_argument("--target", default="http://localhost:8000")
+    run.add_argument("--speed", type=float, default=1.0, help="Ускорение 1..20")
+    run.add_argument("--token", action="append", default=[], help="JWT для авторизованных запросов (можно несколько)")
+    run.add_argument("--param", action="append", default=[], help="Пул значений path-параметра: name=1-500 или name=a,b")
+    run.add_argument("--concurrency", type=int, default=32)
+    run.add_argument("--timeout", type=float, default=10.0)
+    run.add_argument("--out", default="replay_result.json")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="Сравнить два прогона")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@
 
 Использование:
     python run.py
+
+Для production используется serve.py (несколько воркеров, без автоперезагрузки).
 """
 
 import uvicorn
@@ -0,0 +1,107 @@
+"""
+Запуск production-сервера (несколько воркеров uvicorn)
+
+- Число воркеров: WEB_CONCURRENCY, а если не задано - по числу доступных
+  процессу CPU (affinity и квота cgroup), но не больше SERVER_MAX_WORKERS.
+  Несколько воркеров - только с REALTIME_PG_NOTIFY: без него события SSE,
+  сброс кэшей версий профилей и счётчиков отметок и отметки
+  read-your-writes не доходят до других воркеров. Без него автоподбор
+  даёт один воркер, а явный WEB_CONCURRENCY > 1 - ошибка запуска.
+  Token bucket'ы пользователей у каждого воркера свои: при N воркерах
+  пользователь на разных соединениях получает до N лимитов.
+- X-Forwarded-For/-Proto принимаются только от FORWARDED_ALLOW_IPS
+  (адрес прокси/балансировщика), иначе клиент подменил бы свой IP
+  и обошёл бы лимиты анонимных запросов по IP.
+- Цикл событий uvloop и HTTP-парсер httptools, если они установлены
+  (иначе asyncio и h11).
+- Число воркеров передаётся воркерам через WEB_CONCURRENCY: при заданном
+  DB_MAX_CONNECTIONS каждый воркер берёт себе равную долю соединений к БД
+  (см. config.db_pool_limits), и все воркеры вместе не превышают лимит.
+- Сигналы мастер-процессу:
+    SIGHUP  - поочерёдный перезапуск воркеров (новый воркер поднимается
+              до остановки старого), например после деплоя кода;
+    SIGTERM - остановка: воркеры перестают принимать соединения и
+              дорабатывают текущие запросы до SERVER_GRACEFUL_TIMEOUT секунд
+              (SSE-потоки дольше не держат).
+  SIGTTIN/SIGTTOU тоже работают, но пул новых воркеров считается от
+  исходного WEB_CONCURRENCY - при бюджете соединений лучше перезапуск.
+
+Использование:
+    python serve.py
+    WEB_CONCURRENCY=4 DB_MAX_CONNECTIONS=90 python serve.py
+"""
+import os
+from importlib.util import find_spec
+
+import uvicorn
+
+def available_cpus() -> int:
+    """Число CPU, доступных процессу (с учётом affinity и квоты cgroup v2)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+def worker_count(max_workers: int, shared_events: bool) -> int:
+    """
+    WEB_CONCURRENCY из окружения или число CPU (не больше max_workers)
+
+    Без общей шины событий (shared_events=False) автоподбор даёт один
+    воркер, а явно заданное число больше одного - ошибка.
+    """
+    configured = os.environ.get("WEB_CONCURRENCY", "").strip()
+    if configured and configured != "0":
+        workers = max(1, int(configured))
+        if workers > 1 and not shared_events:
+            raise SystemExit(
+                f"❌ WEB_CONCURRENCY={workers} без REALTIME_PG_NOTIFY: события и сброс кэшей "
+                f"не дойдут до других воркеров. Включите REALTIME_PG_NOTIFY=true или WEB_CONCURRENCY=1"
+            )
+        return workers
+    if not shared_events:
+        return 1
+    return max(1, min(available_cpus(), max_workers))
+
+def main():
+    from config import settings, db_pool_limits
+
+    workers = worker_count(settings.SERVER_MAX_WORKERS, settings.REALTIME_PG_NOTIFY)
+    # Воркеры - дочерние процессы: читают WEB_CONCURRENCY при импорте config
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    settings.WEB_CONCURRENCY = workers
+
+    pool_size, max_overflow = db_pool_limits()
+    loop = "uvloop" if find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+
+    print(f"🚀 Воркеров: {workers}, loop={loop}, http={http}")
+    print(
+        f"🗄️  Пул БД на воркер: {pool_size} + {max_overflow} "
+        f"(всего до {workers * (pool_size + max_overflow)} соединений)"
+    )
+    if workers == 1 and not settings.REALTIME_PG_NOTIFY and available_cpus() > 1:
+        print("ℹ️  Один воркер: для нескольких включите REALTIME_PG_NOTIFY=true")
+
+    uvicorn.run(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        log_level="info",
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Отдельный процесс воркера фоновых задач (очередь jobs, см. app/jobs.py)
+
+Забирает те же задачи, что и воркер в процессе приложения (JOBS_IN_PROCESS),
+через FOR UPDATE SKIP LOCKED - их можно запускать одновременно. Чтобы
+тяжёлые задачи не делили CPU с запросами, в приложении поставьте
+JOBS_IN_PROCESS=false и запустите несколько worker.py. Фото хранятся в
+UPLOAD_DIR - воркеру нужен тот же диск, что и приложению.
+
+Использование:
+    python worker.py                              # до SIGTERM / Ctrl+C
+    python worker.py --concurrency 4
+    python worker.py --enqueue-overdue-purges     # поставить очистку удалённым профилям без задачи и выйти
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app import jobs
+# Модули сервисов регистрируют обработчики своих задач при импорте
+from app.services import file_storage, purge_service  # noqa: F401
+from config import settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+async def _run(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await jobs.run_worker(stop, concurrency)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Воркер фоновых задач")
+    parser.add_argument("--concurrency", type=int, default=settings.JOBS_CONCURRENCY, help="Задач одновременно")
+    parser.add_argument("--enqueue-overdue-purges", action="store_true", help="Поставить задачи очистки просроченным удалённым профилям и выйти")
+    args = parser.parse_args()
+
+    if args.enqueue_overdue_purges:
+        print(f"✅ Поставлено задач очистки: {purge_service.enqueue_overdue()}")
+        return 0
+    asyncio.run(_run(args.concurrency))
+    print("👋 Воркер остановлен")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+-- ============================================================================
+-- Миграция: Инбокс входящих лайков (incoming_likes)
+-- Хранит ровно пары «лайкнул меня, я ещё не ответил», поддерживается бэкендом
+-- в транзакции каждого свайпа. Чтение инбокса - один index range scan.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/002_incoming_likes_inbox.sql
+
+-- ============================================================================
+-- ТАБЛИЦА
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS incoming_likes (
+    owner_user_id BIGINT NOT NULL,      -- Кого лайкнули
+    liker_user_id BIGINT NOT NULL,      -- Кто лайкнул
+    liker_profile_id BIGINT NOT NULL,   -- Профиль лайкнувшего (для JOIN по PK)
+    liked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (owner_user_id, liker_user_id),
+    FOREIGN KEY (owner_user_id) REFERENCES profiles(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (liker_profile_id) REFERENCES profiles(id) ON DELETE CASCADE
+);
+
+-- Страница инбокса: WHERE owner_user_id = ? ORDER BY liked_at DESC, liker_user_id DESC
+CREATE INDEX IF NOT EXISTS idx_incoming_likes_owner_liked ON incoming_likes(owner_user_id, liked_at, liker_user_id);
+
+-- ============================================================================
+-- BACKFILL ИЗ ИСТОРИИ СВАЙПОВ
+-- ============================================================================
+
+INSERT INTO incoming_likes (owner_user_id, liker_user_id, liker_profile_id, liked_at)
+SELECT
+    tp.user_id,
+    s.user_id,
+    lp.id,
+    COALESCE(s.created_at, CURRENT_TIMESTAMP)
+FROM swipes s
+JOIN profiles tp ON tp.id = s.target_profile_id
+JOIN profiles lp ON lp.user_id = s.user_id
+WHERE s.action = 'like'
+    AND NOT EXISTS (
+        SELECT 1 FROM swipes r
+        WHERE r.user_id = tp.user_id
+        AND r.target_profile_id = lp.id
+    )
+ON CONFLICT (owner_user_id, liker_user_id) DO NOTHING;
+
+-- ============================================================================
+-- ФУНКЦИЯ get_incoming_likes ЧИТАЕТ ИНБОКС
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_incoming_likes(p_user_id BIGINT)
+RETURNS TABLE (
+    id BIGINT,
+    user_id BIGINT,
+    name VARCHAR,
+    gender VARCHAR,
+    age INTEGER,
+    city VARCHAR,
+    university VARCHAR,
+    interests JSONB,
+    goals JSONB,
+    bio TEXT,
+    photo_url VARCHAR,
+    liked_at TIMESTAMP
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.user_id,
+        p.name,
+        p.gender,
+        p.age,
+        p.city,
+        p.university,
+        p.interests,
+        p.goals,
+        p.bio,
+        p.photo_url,
+        il.liked_at
+    FROM incoming_likes il
+    JOIN profiles p ON p.id = il.liker_profile_id
+    WHERE il.owner_user_id = p_user_id
+        AND p.is_active = TRUE
+        AND p.deleted_at IS NULL
+    ORDER BY il.liked_at DESC, il.liker_user_id DESC;
+END;
+$$ language 'plpgsql';
+
+COMMENT ON TABLE incoming_likes IS 'Входящие лайки без ответа (инбокс), поддерживается бэкендом';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Миграция: Рёбра мэтчей (match_edges)
+-- По строке на каждую сторону мэтча: список мэтчей пользователя читается
+-- одним index range scan по (user_id, matched_at) вместо OR по user1_id/user2_id.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/003_match_edges.sql
+
+-- ============================================================================
+-- ТАБЛИЦА
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS match_edges (
+    user_id BIGINT NOT NULL,
+    peer_user_id BIGINT NOT NULL,
+    match_id BIGINT NOT NULL,
+    matched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, peer_user_id),
+    FOREIGN KEY (match_id) REFERENCES matches(id) ON DELETE CASCADE
+);
+
+-- Страница мэтчей: WHERE user_id = ? ORDER BY matched_at DESC, peer_user_id DESC
+CREATE INDEX IF NOT EXISTS idx_match_edges_user_matched ON match_edges(user_id, matched_at, peer_user_id);
+
+-- ============================================================================
+-- BACKFILL ИЗ ТАБЛИЦЫ MATCHES
+-- ============================================================================
+
+INSERT INTO match_edges (user_id, peer_user_id, match_id, matched_at)
+SELECT user1_id, user2_id, id, COALESCE(matched_at, CURRENT_TIMESTAMP) FROM matches
+UNION ALL
+SELECT user2_id, user1_id, id, COALESCE(matched_at, CURRENT_TIMESTAMP) FROM matches
+ON CONFLICT (user_id, peer_user_id) DO NOTHING;
+
+COMMENT ON TABLE match_edges IS 'Рёбра мэтчей (по строке на каждую сторону), поддерживается бэкендом';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,62 @@
+-- ============================================================================
+-- Миграция: search_profiles с keyset-пагинацией
+-- Функция переписана на LANGUAGE sql STABLE: планировщик встраивает её тело
+-- в вызывающий запрос и видит конкретные значения фильтров, поэтому может
+-- выбрать подходящий частичный индекс (idx_profiles_city_gender и т.п.)
+-- вместо одного generic-плана PL/pgSQL на все комбинации фильтров.
+-- p_user_id стал необязательным: без него свайпы не исключаются, и результат
+-- одинаков для всех пользователей (его кэширует бэкенд).
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/004_search_profiles_keyset.sql
+
+-- Страница поиска: ORDER BY created_at DESC, id DESC по активным профилям
+CREATE INDEX IF NOT EXISTS idx_profiles_active_created_id
+    ON profiles(created_at DESC, id DESC)
+    WHERE is_active = TRUE AND deleted_at IS NULL;
+
+-- Тип результата меняется, поэтому старую функцию нужно удалить
+DROP FUNCTION IF EXISTS search_profiles(BIGINT, VARCHAR, VARCHAR, VARCHAR, INTEGER, INTEGER, JSONB, JSONB, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION search_profiles(
+    p_user_id BIGINT DEFAULT NULL,
+    p_city VARCHAR DEFAULT NULL,
+    p_university VARCHAR DEFAULT NULL,
+    p_gender VARCHAR DEFAULT NULL,
+    p_min_age INTEGER DEFAULT NULL,
+    p_max_age INTEGER DEFAULT NULL,
+    p_interests JSONB DEFAULT NULL,
+    p_goals JSONB DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_created_at TIMESTAMP DEFAULT NULL,
+    p_cursor_id BIGINT DEFAULT NULL
+)
+RETURNS SETOF profiles AS $$
+    SELECT p.*
+    FROM profiles p
+    WHERE p.is_active = TRUE
+        AND p.deleted_at IS NULL
+        AND (p_user_id IS NULL OR p.user_id != p_user_id)
+        AND (p_user_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM swipes s
+            WHERE s.user_id = p_user_id
+            AND s.target_profile_id = p.id
+        ))
+        AND (p_city IS NULL OR p.city = p_city)
+        AND (p_university IS NULL OR p.university = p_university)
+        AND (p_gender IS NULL OR p.gender = p_gender)
+        AND (p_min_age IS NULL OR p.age >= p_min_age)
+        AND (p_max_age IS NULL OR p.age <= p_max_age)
+        AND (p_interests IS NULL OR p.interests ?| ARRAY(SELECT jsonb_array_elements_text(p_interests)))
+        AND (p_goals IS NULL OR p.goals ?| ARRAY(SELECT jsonb_array_elements_text(p_goals)))
+        AND (p_cursor_created_at IS NULL OR (p.created_at, p.id) < (p_cursor_created_at, p_cursor_id))
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT p_limit
+    OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION search_profiles IS 'Поиск профилей с фильтрами по городу, университету, возрасту, интересам и целям (keyset по created_at, id)';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,117 @@
+-- ============================================================================
+-- Миграция: Словарь интересов и целей (tags)
+-- Каждое различное значение получает небольшой целочисленный id; профиль
+-- хранит массивы interest_ids/goal_ids рядом с исходным JSONB. Фильтры
+-- перекрытия работают по int[] (&&) с GIN-индексом, бэкенд раскодирует id
+-- пачкой и не читает JSONB на горячем пути.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/005_tag_dictionary.sql
+
+-- ============================================================================
+-- ТАБЛИЦА СЛОВАРЯ И КОЛОНКИ ПРОФИЛЯ
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS tags (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('interest', 'goal')),
+    value VARCHAR(255) NOT NULL,
+    CONSTRAINT uq_tags_kind_value UNIQUE (kind, value)
+);
+
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS interest_ids INTEGER[] NOT NULL DEFAULT '{}';
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS goal_ids INTEGER[] NOT NULL DEFAULT '{}';
+
+-- Фильтр «есть хотя бы один из»: interest_ids && ARRAY[...]
+CREATE INDEX IF NOT EXISTS idx_profiles_interest_ids_gin ON profiles USING GIN (interest_ids);
+CREATE INDEX IF NOT EXISTS idx_profiles_goal_ids_gin ON profiles USING GIN (goal_ids);
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+INSERT INTO tags (kind, value)
+SELECT DISTINCT 'interest', LEFT(BTRIM(v.value), 255)
+FROM profiles p, jsonb_array_elements_text(p.interests) AS v(value)
+WHERE BTRIM(v.value) <> ''
+ON CONFLICT (kind, value) DO NOTHING;
+
+INSERT INTO tags (kind, value)
+SELECT DISTINCT 'goal', LEFT(BTRIM(v.value), 255)
+FROM profiles p, jsonb_array_elements_text(p.goals) AS v(value)
+WHERE BTRIM(v.value) <> ''
+ON CONFLICT (kind, value) DO NOTHING;
+
+-- Порядок значений сохраняется, дубликаты отбрасываются
+UPDATE profiles p SET
+    interest_ids = COALESCE((
+        SELECT array_agg(d.id ORDER BY d.ord)
+        FROM (
+            SELECT t.id, MIN(e.ord) AS ord
+            FROM jsonb_array_elements_text(p.interests) WITH ORDINALITY AS e(value, ord)
+            JOIN tags t ON t.kind = 'interest' AND t.value = LEFT(BTRIM(e.value), 255)
+            GROUP BY t.id
+        ) d
+    ), '{}'),
+    goal_ids = COALESCE((
+        SELECT array_agg(d.id ORDER BY d.ord)
+        FROM (
+            SELECT t.id, MIN(e.ord) AS ord
+            FROM jsonb_array_elements_text(p.goals) WITH ORDINALITY AS e(value, ord)
+            JOIN tags t ON t.kind = 'goal' AND t.value = LEFT(BTRIM(e.value), 255)
+            GROUP BY t.id
+        ) d
+    ), '{}');
+
+-- ============================================================================
+-- ПОИСК: ФИЛЬТР ПО INT[] ВМЕСТО JSONB
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION search_profiles(
+    p_user_id BIGINT DEFAULT NULL,
+    p_city VARCHAR DEFAULT NULL,
+    p_university VARCHAR DEFAULT NULL,
+    p_gender VARCHAR DEFAULT NULL,
+    p_min_age INTEGER DEFAULT NULL,
+    p_max_age INTEGER DEFAULT NULL,
+    p_interests JSONB DEFAULT NULL,
+    p_goals JSONB DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_created_at TIMESTAMP DEFAULT NULL,
+    p_cursor_id BIGINT DEFAULT NULL
+)
+RETURNS SETOF profiles AS $$
+    SELECT p.*
+    FROM profiles p
+    WHERE p.is_active = TRUE
+        AND p.deleted_at IS NULL
+        AND (p_user_id IS NULL OR p.user_id != p_user_id)
+        AND (p_user_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM swipes s
+            WHERE s.user_id = p_user_id
+            AND s.target_profile_id = p.id
+        ))
+        AND (p_city IS NULL OR p.city = p_city)
+        AND (p_university IS NULL OR p.university = p_university)
+        AND (p_gender IS NULL OR p.gender = p_gender)
+        AND (p_min_age IS NULL OR p.age >= p_min_age)
+        AND (p_max_age IS NULL OR p.age <= p_max_age)
+        AND (p_interests IS NULL OR p.interest_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'interest' AND t.value IN (SELECT jsonb_array_elements_text(p_interests))
+        ))
+        AND (p_goals IS NULL OR p.goal_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'goal' AND t.value IN (SELECT jsonb_array_elements_text(p_goals))
+        ))
+        AND (p_cursor_created_at IS NULL OR (p.created_at, p.id) < (p_cursor_created_at, p_cursor_id))
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT p_limit
+    OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON TABLE tags IS 'Словарь интересов и целей: значение -> id (поддерживается бэкендом)';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,21 @@
+-- ============================================================================
+-- Миграция: Триграммные индексы для нечёткого поиска профилей
+-- Обслуживают GET /api/profiles/lookup: операторы % и ILIKE по name,
+-- username, university и city. Индексы частичные - только активные профили.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/006_trigram_lookup.sql
+
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+CREATE INDEX IF NOT EXISTS idx_profiles_name_trgm
+    ON profiles USING GIN (name gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_username_trgm
+    ON profiles USING GIN (username gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_university_trgm
+    ON profiles USING GIN (university gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_city_trgm
+    ON profiles USING GIN (city gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,144 @@
+-- ============================================================================
+-- Миграция: Счётчики строк (table_counters)
+-- Количество активных профилей, свайпов и мэтчей поддерживается триггерами:
+-- /api/debug/stats суммирует несколько строк вместо COUNT(*) по таблицам.
+-- Счётчик разбит на шарды (по pid соединения), чтобы одновременные вставки
+-- из разных соединений не ждали блокировку одной строки. Триггеры
+-- уровня оператора с transition-таблицами: одно обновление счётчика на
+-- INSERT/DELETE/COPY, сколько бы строк он ни затронул.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/007_table_counters.sql
+-- Создание триггеров блокирует запись в profiles/swipes/matches до конца
+-- транзакции (вместе с backfill-подсчётом) - счётчики сходятся с COUNT(*).
+
+BEGIN;
+
+-- ============================================================================
+-- ТАБЛИЦА И ФУНКЦИИ
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS table_counters (
+    name VARCHAR(50) NOT NULL,
+    shard SMALLINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+-- Прибавить delta к шарду счётчика текущего соединения
+CREATE OR REPLACE FUNCTION bump_table_counter(p_name TEXT, p_delta BIGINT)
+RETURNS VOID AS $$
+    INSERT INTO table_counters (name, shard, value)
+    VALUES (p_name, pg_backend_pid() % 16, p_delta)
+    ON CONFLICT (name, shard) DO UPDATE SET value = table_counters.value + EXCLUDED.value;
+$$ LANGUAGE sql;
+
+-- Счётчик всех строк таблицы (swipes, matches): имя счётчика - TG_ARGV[0]
+CREATE OR REPLACE FUNCTION count_table_rows()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM table_counters WHERE name = TG_ARGV[0];
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO delta FROM new_rows;
+    ELSE
+        SELECT -COUNT(*) INTO delta FROM old_rows;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_table_counter(TG_ARGV[0], delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Счётчик активных профилей (is_active и не удалён): учитывает и UPDATE
+CREATE OR REPLACE FUNCTION count_active_profiles()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT := 0;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM table_counters WHERE name = 'profiles';
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT delta + COUNT(*) INTO delta FROM new_rows WHERE is_active AND deleted_at IS NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT delta - COUNT(*) INTO delta FROM old_rows WHERE is_active AND deleted_at IS NULL;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_table_counter('profiles', delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- ТРИГГЕРЫ (transition-таблицы допускают только одно событие на триггер)
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS count_profiles_insert ON profiles;
+CREATE TRIGGER count_profiles_insert
+    AFTER INSERT ON profiles REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_update ON profiles;
+CREATE TRIGGER count_profiles_update
+    AFTER UPDATE ON profiles REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_delete ON profiles;
+CREATE TRIGGER count_profiles_delete
+    AFTER DELETE ON profiles REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_truncate ON profiles;
+CREATE TRIGGER count_profiles_truncate
+    AFTER TRUNCATE ON profiles
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+
+DROP TRIGGER IF EXISTS count_swipes_insert ON swipes;
+CREATE TRIGGER count_swipes_insert
+    AFTER INSERT ON swipes REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+DROP TRIGGER IF EXISTS count_swipes_delete ON swipes;
+CREATE TRIGGER count_swipes_delete
+    AFTER DELETE ON swipes REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+DROP TRIGGER IF EXISTS count_swipes_truncate ON swipes;
+CREATE TRIGGER count_swipes_truncate
+    AFTER TRUNCATE ON swipes
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+
+DROP TRIGGER IF EXISTS count_matches_insert ON matches;
+CREATE TRIGGER count_matches_insert
+    AFTER INSERT ON matches REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+DROP TRIGGER IF EXISTS count_matches_delete ON matches;
+CREATE TRIGGER count_matches_delete
+    AFTER DELETE ON matches REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+DROP TRIGGER IF EXISTS count_matches_truncate ON matches;
+CREATE TRIGGER count_matches_truncate
+    AFTER TRUNCATE ON matches
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+
+-- ============================================================================
+-- BACKFILL (под блокировкой триггеров - параллельных записей нет)
+-- ============================================================================
+
+DELETE FROM table_counters WHERE name IN ('profiles', 'swipes', 'matches');
+INSERT INTO table_counters (name, shard, value)
+SELECT 'profiles', 0, COUNT(*) FROM profiles WHERE is_active AND deleted_at IS NULL
+UNION ALL
+SELECT 'swipes', 0, COUNT(*) FROM swipes
+UNION ALL
+SELECT 'matches', 0, COUNT(*) FROM matches;
+
+COMMENT ON TABLE table_counters IS 'Счётчики строк по шардам (сумма по name), поддерживаются триггерами';
+
+COMMIT;
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,52 @@
+-- ============================================================================
+-- Миграция: Материализованная статистика профилей (profile_stats)
+-- Представление profile_stats (COUNT(DISTINCT) по swipes/matches на каждый
+-- запрос) заменяется таблицей со строкой на пользователя. Бэкенд обновляет
+-- её в транзакции свайпа/мэтча (app/services/profile_stats_service.py),
+-- чтение - один поиск по первичному ключу.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/008_profile_stats.sql
+-- Применить ДО деплоя бэкенда, который пишет в profile_stats.
+-- Свайпы, сделанные во время backfill, выравнивает recompute_profile_stats.py.
+
+DROP VIEW IF EXISTS profile_stats;
+
+-- ============================================================================
+-- ТАБЛИЦА
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS profile_stats (
+    user_id BIGINT PRIMARY KEY,
+    likes_received INTEGER NOT NULL DEFAULT 0,
+    likes_sent INTEGER NOT NULL DEFAULT 0,
+    matches_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- BACKFILL (один проход с группировкой по каждой таблице)
+-- ============================================================================
+
+INSERT INTO profile_stats (user_id, likes_received, likes_sent, matches_count)
+SELECT p.user_id, COALESCE(r.n, 0), COALESCE(s.n, 0), COALESCE(m.n, 0)
+FROM profiles p
+LEFT JOIN (
+    SELECT target_profile_id, COUNT(*) AS n FROM swipes WHERE action = 'like' GROUP BY target_profile_id
+) r ON r.target_profile_id = p.id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS n FROM swipes WHERE action = 'like' GROUP BY user_id
+) s ON s.user_id = p.user_id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS n FROM match_edges GROUP BY user_id
+) m ON m.user_id = p.user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    likes_received = EXCLUDED.likes_received,
+    likes_sent = EXCLUDED.likes_sent,
+    matches_count = EXCLUDED.matches_count,
+    updated_at = CURRENT_TIMESTAMP;
+
+COMMENT ON TABLE profile_stats IS 'Лайки полученные/отправленные и мэтчи пользователя, поддерживается бэкендом';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,36 @@
+-- ============================================================================
+-- Миграция: Счётчики отметок полезности коннекта (connection_feedback_counts)
+-- Количество полученных отметок каждого типа хранится строкой на
+-- (user_id, feedback_type). Бэкенд обновляет её в транзакции вставки
+-- отметок (app/services/feedback_service.py), поэтому агрегаты для профилей
+-- читаются по первичному ключу, а не группировкой connection_feedbacks.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/009_connection_feedback_counts.sql
+-- Применить ДО деплоя бэкенда с POST /api/matches/feedback.
+
+-- ============================================================================
+-- ТАБЛИЦА
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS connection_feedback_counts (
+    user_id BIGINT NOT NULL,
+    feedback_type VARCHAR(50) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, feedback_type)
+);
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+INSERT INTO connection_feedback_counts (user_id, feedback_type, count)
+SELECT to_user_id, feedback_type, COUNT(*)
+FROM connection_feedbacks
+GROUP BY to_user_id, feedback_type
+ON CONFLICT (user_id, feedback_type) DO UPDATE SET count = EXCLUDED.count;
+
+COMMENT ON TABLE connection_feedback_counts IS 'Полученные отметки полезности по типам, поддерживается бэкендом';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
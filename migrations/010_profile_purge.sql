@@ -0,0 +1,22 @@
+-- ============================================================================
+-- Миграция: Индексы для очистки удалённых профилей
+-- DELETE /api/profiles/me ставит deleted_at, а фоновая очистка
+-- (app/services/purge_service.py) удаляет данные профиля пачками и затем
+-- саму строку. Каскады внешних ключей ищут ссылающиеся строки по
+-- match_edges.match_id и incoming_likes.liker_profile_id - без индексов
+-- каждое удаление мэтча/профиля читало бы эти таблицы целиком.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/010_profile_purge.sql
+
+-- Каскад matches -> match_edges
+CREATE INDEX IF NOT EXISTS idx_match_edges_match_id ON match_edges(match_id);
+
+-- Каскад profiles(id) -> incoming_likes.liker_profile_id
+CREATE INDEX IF NOT EXISTS idx_incoming_likes_liker_profile ON incoming_likes(liker_profile_id);
+
+-- Очередь очистки: удалённые профили по времени удаления
+CREATE INDEX IF NOT EXISTS idx_profiles_purge_queue ON profiles(deleted_at) WHERE deleted_at IS NOT NULL;
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
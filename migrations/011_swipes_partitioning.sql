@@ -0,0 +1,154 @@
+-- ============================================================================
+-- Миграция: Секционирование swipes и архив пропусков (swipe_exclusions)
+-- swipes хранит все лайки и пропуски навсегда, а каждая вставка обновляла
+-- семь индексов. Таблица пересоздаётся секционированной по hash(user_id)
+-- (16 секций) с двумя индексами:
+--   PRIMARY KEY (user_id, target_profile_id) - свайпы пользователя, проверка
+--       «уже свайпал», исключение из колоды и поиска;
+--   idx_swipes_target_action (target_profile_id, action) - лайки по профилю
+--       (пересчёт profile_stats), очистка и каскад удаления профиля.
+-- Старые пропуски переносит compact_swipes.py в swipe_exclusions - одну
+-- строку на пользователя с отсортированным массивом id профилей; колода,
+-- поиск и инбокс исключают профили из обоих мест.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/011_swipes_partitioning.sql
+-- Копирует swipes под эксклюзивной блокировкой (свайпы ждут до конца
+-- транзакции) - на большой таблице выполнять в окно обслуживания.
+-- Применить ДО деплоя бэкенда, читающего swipe_exclusions.
+
+BEGIN;
+
+LOCK TABLE swipes IN ACCESS EXCLUSIVE MODE;
+
+-- ============================================================================
+-- АРХИВ ПРОПУСКОВ
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS swipe_exclusions (
+    user_id BIGINT PRIMARY KEY,
+    profile_ids BIGINT[] NOT NULL DEFAULT '{}',  -- отсортированы, без повторов
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- СЕКЦИОНИРОВАННАЯ ТАБЛИЦА
+-- ============================================================================
+
+-- Последовательность id переходит к новой таблице
+ALTER SEQUENCE swipes_id_seq OWNED BY NONE;
+
+CREATE TABLE swipes_partitioned (
+    id BIGINT NOT NULL DEFAULT nextval('swipes_id_seq'),
+    user_id BIGINT NOT NULL,
+    target_profile_id BIGINT NOT NULL,
+    action VARCHAR(10) NOT NULL CHECK (action IN ('like', 'pass')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, target_profile_id),
+    FOREIGN KEY (target_profile_id) REFERENCES profiles(id) ON DELETE CASCADE
+) PARTITION BY HASH (user_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE swipes_p%s PARTITION OF swipes_partitioned FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            i, i
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO swipes_partitioned (id, user_id, target_profile_id, action, created_at)
+SELECT id, user_id, target_profile_id, action, created_at FROM swipes;
+
+-- Старая таблица удаляется вместе со своими индексами и триггерами
+DROP TABLE swipes;
+ALTER TABLE swipes_partitioned RENAME TO swipes;
+ALTER INDEX swipes_partitioned_pkey RENAME TO swipes_pkey;
+ALTER SEQUENCE swipes_id_seq OWNED BY swipes.id;
+
+CREATE INDEX idx_swipes_target_action ON swipes(target_profile_id, action);
+
+-- ============================================================================
+-- ТРИГГЕРЫ (пересоздаются на новой таблице)
+-- ============================================================================
+
+CREATE TRIGGER count_swipes_insert
+    AFTER INSERT ON swipes REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+CREATE TRIGGER count_swipes_delete
+    AFTER DELETE ON swipes REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+CREATE TRIGGER count_swipes_truncate
+    AFTER TRUNCATE ON swipes
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+
+-- Копирование шло до создания триггеров - счётчик выставляется заново
+DELETE FROM table_counters WHERE name = 'swipes';
+INSERT INTO table_counters (name, shard, value)
+SELECT 'swipes', 0, COUNT(*) FROM swipes;
+
+-- ============================================================================
+-- ПОИСК: исключение архивных пропусков
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION search_profiles(
+    p_user_id BIGINT DEFAULT NULL,
+    p_city VARCHAR DEFAULT NULL,
+    p_university VARCHAR DEFAULT NULL,
+    p_gender VARCHAR DEFAULT NULL,
+    p_min_age INTEGER DEFAULT NULL,
+    p_max_age INTEGER DEFAULT NULL,
+    p_interests JSONB DEFAULT NULL,
+    p_goals JSONB DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_created_at TIMESTAMP DEFAULT NULL,
+    p_cursor_id BIGINT DEFAULT NULL
+)
+RETURNS SETOF profiles AS $$
+    SELECT p.*
+    FROM profiles p
+    WHERE p.is_active = TRUE
+        AND p.deleted_at IS NULL
+        AND (p_user_id IS NULL OR p.user_id != p_user_id)
+        AND (p_user_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM swipes s
+            WHERE s.user_id = p_user_id
+            AND s.target_profile_id = p.id
+        ))
+        AND (p_user_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM swipe_exclusions x
+            WHERE x.user_id = p_user_id
+            AND x.profile_ids @> ARRAY[p.id]
+        ))
+        AND (p_city IS NULL OR p.city = p_city)
+        AND (p_university IS NULL OR p.university = p_university)
+        AND (p_gender IS NULL OR p.gender = p_gender)
+        AND (p_min_age IS NULL OR p.age >= p_min_age)
+        AND (p_max_age IS NULL OR p.age <= p_max_age)
+        AND (p_interests IS NULL OR p.interest_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'interest' AND t.value IN (SELECT jsonb_array_elements_text(p_interests))
+        ))
+        AND (p_goals IS NULL OR p.goal_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'goal' AND t.value IN (SELECT jsonb_array_elements_text(p_goals))
+        ))
+        AND (p_cursor_created_at IS NULL OR (p.created_at, p.id) < (p_cursor_created_at, p_cursor_id))
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT p_limit
+    OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON TABLE swipes IS 'История свайпов (лайки и дизлайки), секционирована по hash(user_id)';
+COMMENT ON COLUMN swipes.action IS 'Действие: like (лайк) или pass (пропуск)';
+COMMENT ON TABLE swipe_exclusions IS 'Архив старых пропусков: id профилей по пользователю (compact_swipes.py)';
+
+COMMIT;
+
+-- Статистика планировщика для новых секций
+ANALYZE swipes;
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,35 @@
+-- ============================================================================
+-- Миграция: Очередь фоновых задач (jobs)
+-- Сервисы ставят задачу строкой в своей транзакции (задача появляется только
+-- вместе с commit), а воркеры (app/jobs.py - в процессе приложения или
+-- отдельным backend/worker.py) забирают её через FOR UPDATE SKIP LOCKED.
+-- Выполненные задачи удаляются, неудачные повторяются с экспоненциальной
+-- паузой, после JOBS_MAX_ATTEMPTS остаются со статусом failed.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/012_jobs.sql
+-- Применить ДО деплоя бэкенда, ставящего задачи.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(10) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    locked_by VARCHAR(100),
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Выборка готовых задач: WHERE status = 'queued' AND run_at <= now() ORDER BY run_at, id
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_run_at ON jobs(run_at, id) WHERE status = 'queued';
+-- Возврат задач упавших воркеров: WHERE status = 'running' AND locked_at < ...
+CREATE INDEX IF NOT EXISTS idx_jobs_running_locked_at ON jobs(locked_at) WHERE status = 'running';
+
+COMMENT ON TABLE jobs IS 'Очередь фоновых задач (app/jobs.py), выполненные удаляются';
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,36 @@
+-- ============================================================================
+-- Миграция: Удаление устаревшего триггера создания мэтчей
+-- Мэтчи создаёт бэкенд (match_service._create_match) вместе с рёбрами
+-- match_edges, profile_stats и событием match. Триггер на swipes вставлял
+-- строку в matches в обход этого кода: бэкенд видел мэтч уже существующим,
+-- и у него не появлялось ни рёбер, ни счётчика, ни события.
+-- ============================================================================
+-- Выполнить: psql -d networking_app -f migrations/013_drop_legacy_match_trigger.sql
+
+DROP TRIGGER IF EXISTS trigger_create_match_on_mutual_like ON swipes;
+DROP FUNCTION IF EXISTS create_match_on_mutual_like();
+
+-- ============================================================================
+-- ДОПОЛНЕНИЕ МЭТЧЕЙ, СОЗДАННЫХ ТРИГГЕРОМ
+-- ============================================================================
+
+INSERT INTO match_edges (user_id, peer_user_id, match_id, matched_at)
+SELECT user1_id, user2_id, id, COALESCE(matched_at, CURRENT_TIMESTAMP) FROM matches
+UNION ALL
+SELECT user2_id, user1_id, id, COALESCE(matched_at, CURRENT_TIMESTAMP) FROM matches
+ON CONFLICT (user_id, peer_user_id) DO NOTHING;
+
+-- Счётчик мэтчей - по рёбрам (только там, где он разошёлся)
+UPDATE profile_stats s
+SET matches_count = m.n, updated_at = CURRENT_TIMESTAMP
+FROM (
+    SELECT p.user_id, COUNT(e.peer_user_id) AS n
+    FROM profiles p
+    LEFT JOIN match_edges e ON e.user_id = p.user_id
+    GROUP BY p.user_id
+) m
+WHERE s.user_id = m.user_id AND s.matches_count <> m.n;
+
+-- ============================================================================
+-- КОНЕЦ МИГРАЦИИ
+-- ============================================================================
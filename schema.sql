@@ -17,6 +17,14 @@ CREATE EXTENSION IF NOT EXISTS "btree_gin"; -- Для GIN индексов на
 -- ТАБЛИЦЫ
 -- ============================================================================
 
+-- Словарь интересов и целей: значение -> небольшой целочисленный id
+CREATE TABLE IF NOT EXISTS tags (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('interest', 'goal')),
+    value VARCHAR(255) NOT NULL,
+    CONSTRAINT uq_tags_kind_value UNIQUE (kind, value)
+);
+
 -- Таблица профилей пользователей
 CREATE TABLE IF NOT EXISTS profiles (
     id BIGSERIAL PRIMARY KEY,
@@ -31,6 +39,8 @@ CREATE TABLE IF NOT EXISTS profiles (
     university VARCHAR(255) NOT NULL,
     interests JSONB DEFAULT '[]'::jsonb, -- JSON массив: ["IT", "Дизайн", ...]
     goals JSONB DEFAULT '[]'::jsonb, -- JSON массив: ["Совместная учёба", "Хакатон", ...]
+    interest_ids INTEGER[] NOT NULL DEFAULT '{}', -- interests, закодированные id из tags
+    goal_ids INTEGER[] NOT NULL DEFAULT '{}', -- goals, закодированные id из tags
     bio TEXT CHECK (LENGTH(bio) <= 300),
     photo_url VARCHAR(500),
     is_active BOOLEAN DEFAULT TRUE, -- Для мягкого удаления/деактивации
@@ -53,39 +63,60 @@ CREATE INDEX IF NOT EXISTS idx_profiles_age ON profiles(age);
 CREATE INDEX IF NOT EXISTS idx_profiles_created_at_desc ON profiles(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_profiles_is_active ON profiles(is_active) WHERE is_active = TRUE;
 CREATE INDEX IF NOT EXISTS idx_profiles_deleted_at ON profiles(deleted_at) WHERE deleted_at IS NULL;
+-- Очередь очистки удалённых профилей (app/services/purge_service.py)
+CREATE INDEX IF NOT EXISTS idx_profiles_purge_queue ON profiles(deleted_at) WHERE deleted_at IS NOT NULL;
 
 -- GIN индексы для быстрого поиска по JSON массивам
 CREATE INDEX IF NOT EXISTS idx_profiles_interests_gin ON profiles USING GIN (interests);
 CREATE INDEX IF NOT EXISTS idx_profiles_goals_gin ON profiles USING GIN (goals);
+-- GIN индексы для фильтра перекрытия по id словаря (interest_ids && ARRAY[...])
+CREATE INDEX IF NOT EXISTS idx_profiles_interest_ids_gin ON profiles USING GIN (interest_ids);
+CREATE INDEX IF NOT EXISTS idx_profiles_goal_ids_gin ON profiles USING GIN (goal_ids);
+
+-- Триграммные индексы для нечёткого поиска (GET /api/profiles/lookup)
+CREATE INDEX IF NOT EXISTS idx_profiles_name_trgm ON profiles USING GIN (name gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_username_trgm ON profiles USING GIN (username gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_university_trgm ON profiles USING GIN (university gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_city_trgm ON profiles USING GIN (city gin_trgm_ops) WHERE is_active = TRUE AND deleted_at IS NULL;
 
 -- Составные индексы для частых запросов
 CREATE INDEX IF NOT EXISTS idx_profiles_city_gender ON profiles(city, gender) WHERE is_active = TRUE AND deleted_at IS NULL;
 CREATE INDEX IF NOT EXISTS idx_profiles_university_age ON profiles(university, age) WHERE is_active = TRUE AND deleted_at IS NULL;
+-- Keyset-пагинация поиска (search_profiles): ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_profiles_active_created_id ON profiles(created_at DESC, id DESC) WHERE is_active = TRUE AND deleted_at IS NULL;
 
--- Таблица свайпов (лайки и дизлайки)
+-- Таблица свайпов (лайки и дизлайки), секционирована по hash(user_id)
 CREATE TABLE IF NOT EXISTS swipes (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     user_id BIGINT NOT NULL,
     target_profile_id BIGINT NOT NULL,
     action VARCHAR(10) NOT NULL CHECK (action IN ('like', 'pass')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(user_id, target_profile_id),
+    -- Свайпы пользователя, проверка «уже свайпал», исключение из колоды и поиска
+    PRIMARY KEY (user_id, target_profile_id),
     FOREIGN KEY (target_profile_id) REFERENCES profiles(id) ON DELETE CASCADE
-);
-
--- Индексы для таблицы swipes
-CREATE INDEX IF NOT EXISTS idx_swipes_user_id ON swipes(user_id);
-CREATE INDEX IF NOT EXISTS idx_swipes_target_profile_id ON swipes(target_profile_id);
-CREATE INDEX IF NOT EXISTS idx_swipes_action ON swipes(action);
-CREATE INDEX IF NOT EXISTS idx_swipes_created_at ON swipes(created_at);
+) PARTITION BY HASH (user_id);
 
--- Составные индексы для оптимизации частых запросов (оптимизация из рекомендаций)
-CREATE INDEX IF NOT EXISTS idx_swipes_user_target ON swipes(user_id, target_profile_id);
--- Индекс для быстрого поиска лайков (аналог matched=true из рекомендаций)
-CREATE INDEX IF NOT EXISTS idx_swipes_target_action ON swipes(target_profile_id, action) WHERE action = 'like';
-CREATE INDEX IF NOT EXISTS idx_swipes_user_action ON swipes(user_id, action) WHERE action = 'like';
--- Дополнительный индекс для поиска входящих лайков (оптимизация)
-CREATE INDEX IF NOT EXISTS idx_swipes_target_like_created ON swipes(target_profile_id, created_at DESC) WHERE action = 'like';
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS swipes_p%s PARTITION OF swipes FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            i, i
+        );
+    END LOOP;
+END $$;
+
+-- Лайки по профилю (пересчёт profile_stats), очистка и каскад удаления профиля
+CREATE INDEX IF NOT EXISTS idx_swipes_target_action ON swipes(target_profile_id, action);
+
+-- Архив старых пропусков: отсортированный массив id профилей на пользователя
+-- (переносит compact_swipes.py; колода и поиск исключают профили и отсюда)
+CREATE TABLE IF NOT EXISTS swipe_exclusions (
+    user_id BIGINT PRIMARY KEY,
+    profile_ids BIGINT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
 
 -- Таблица мэтчей (взаимные лайки)
 CREATE TABLE IF NOT EXISTS matches (
@@ -109,6 +140,39 @@ CREATE INDEX IF NOT EXISTS idx_matches_matched_at_desc ON matches(matched_at DES
 -- Составной индекс для поиска мэтчей (ускоряет запросы с OR условием)
 CREATE INDEX IF NOT EXISTS idx_matches_user1_user2 ON matches(user1_id, user2_id);
 
+-- Рёбра мэтчей: по строке на каждую сторону мэтча
+-- Создаются бэкендом вместе с мэтчем (app/services/match_service.py)
+CREATE TABLE IF NOT EXISTS match_edges (
+    user_id BIGINT NOT NULL,
+    peer_user_id BIGINT NOT NULL,
+    match_id BIGINT NOT NULL,
+    matched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, peer_user_id),
+    FOREIGN KEY (match_id) REFERENCES matches(id) ON DELETE CASCADE
+);
+
+-- Страница мэтчей: WHERE user_id = ? ORDER BY matched_at DESC, peer_user_id DESC
+CREATE INDEX IF NOT EXISTS idx_match_edges_user_matched ON match_edges(user_id, matched_at, peer_user_id);
+-- Каскад удаления мэтча
+CREATE INDEX IF NOT EXISTS idx_match_edges_match_id ON match_edges(match_id);
+
+-- Инбокс входящих лайков: ровно пары «лайкнул меня, я ещё не ответил»
+-- Поддерживается бэкендом в транзакции каждого свайпа (app/services/inbox_service.py)
+CREATE TABLE IF NOT EXISTS incoming_likes (
+    owner_user_id BIGINT NOT NULL,      -- Кого лайкнули
+    liker_user_id BIGINT NOT NULL,      -- Кто лайкнул
+    liker_profile_id BIGINT NOT NULL,   -- Профиль лайкнувшего (для JOIN по PK)
+    liked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (owner_user_id, liker_user_id),
+    FOREIGN KEY (owner_user_id) REFERENCES profiles(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (liker_profile_id) REFERENCES profiles(id) ON DELETE CASCADE
+);
+
+-- Страница инбокса: WHERE owner_user_id = ? ORDER BY liked_at DESC, liker_user_id DESC
+CREATE INDEX IF NOT EXISTS idx_incoming_likes_owner_liked ON incoming_likes(owner_user_id, liked_at, liker_user_id);
+-- Каскад удаления профиля лайкнувшего
+CREATE INDEX IF NOT EXISTS idx_incoming_likes_liker_profile ON incoming_likes(liker_profile_id);
+
 -- Таблица отметок полезности коннекта
 CREATE TABLE IF NOT EXISTS connection_feedbacks (
     id BIGSERIAL PRIMARY KEY,
@@ -130,6 +194,53 @@ CREATE INDEX IF NOT EXISTS idx_connection_feedbacks_to_user_id ON connection_fee
 CREATE INDEX IF NOT EXISTS idx_connection_feedbacks_feedback_type ON connection_feedbacks(feedback_type);
 CREATE INDEX IF NOT EXISTS idx_connection_feedbacks_created_at ON connection_feedbacks(created_at);
 
+-- Полученные отметки по типам: строка на (user_id, feedback_type), обновляется
+-- бэкендом в транзакции вставки отметок (app/services/feedback_service.py)
+CREATE TABLE IF NOT EXISTS connection_feedback_counts (
+    user_id BIGINT NOT NULL,
+    feedback_type VARCHAR(50) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, feedback_type)
+);
+
+-- Статистика пользователя: строка на user_id, обновляется бэкендом в транзакции
+-- свайпа/мэтча (app/services/profile_stats_service.py)
+CREATE TABLE IF NOT EXISTS profile_stats (
+    user_id BIGINT PRIMARY KEY,
+    likes_received INTEGER NOT NULL DEFAULT 0,
+    likes_sent INTEGER NOT NULL DEFAULT 0,
+    matches_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Счётчики строк для /api/debug/stats: сумма value по name, шард - pid соединения % 16
+-- Поддерживаются триггерами ниже (count_active_profiles, count_table_rows)
+CREATE TABLE IF NOT EXISTS table_counters (
+    name VARCHAR(50) NOT NULL,
+    shard SMALLINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+-- Очередь фоновых задач (backend/app/jobs.py): воркеры забирают задачи через
+-- FOR UPDATE SKIP LOCKED, выполненные удаляются, неудачные повторяются с паузой
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(10) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    locked_by VARCHAR(100),
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_run_at ON jobs(run_at, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running_locked_at ON jobs(locked_at) WHERE status = 'running';
+
 -- ============================================================================
 -- ФУНКЦИИ И ТРИГГЕРЫ
 -- ============================================================================
@@ -150,64 +261,14 @@ CREATE TRIGGER update_profiles_updated_at
     FOR EACH ROW 
     EXECUTE FUNCTION update_updated_at_column();
 
--- Функция для автоматического создания мэтча при взаимном лайке
-CREATE OR REPLACE FUNCTION create_match_on_mutual_like()
-RETURNS TRIGGER AS $$
-DECLARE
-    mutual_like_exists BOOLEAN;
-    other_user_id BIGINT;
-    profile_user_id BIGINT;
-BEGIN
-    -- Проверяем, что это лайк (не пропуск)
-    IF NEW.action != 'like' THEN
-        RETURN NEW;
-    END IF;
-
-    -- Получаем user_id профиля, на который лайкнули
-    SELECT user_id INTO profile_user_id
-    FROM profiles
-    WHERE id = NEW.target_profile_id;
-
-    -- Проверяем, есть ли взаимный лайк
-    SELECT EXISTS(
-        SELECT 1
-        FROM swipes s
-        JOIN profiles p ON p.id = s.user_id
-        WHERE s.target_profile_id = (
-            SELECT id FROM profiles WHERE user_id = NEW.user_id
-        )
-        AND s.user_id = profile_user_id
-        AND s.action = 'like'
-    ) INTO mutual_like_exists;
-
-    -- Если есть взаимный лайк, создаем мэтч
-    IF mutual_like_exists THEN
-        -- Определяем порядок user_id для уникальности
-        IF NEW.user_id < profile_user_id THEN
-            INSERT INTO matches (user1_id, user2_id)
-            VALUES (NEW.user_id, profile_user_id)
-            ON CONFLICT (user1_id, user2_id) DO NOTHING;
-        ELSE
-            INSERT INTO matches (user1_id, user2_id)
-            VALUES (profile_user_id, NEW.user_id)
-            ON CONFLICT (user1_id, user2_id) DO NOTHING;
-        END IF;
-    END IF;
-
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
-
--- Триггер для автоматического создания мэтчей
+-- Мэтчи при взаимном лайке создаёт бэкенд (match_service) вместе с рёбрами
+-- match_edges, profile_stats и событием match; прежний триггер удалён (миграция 013)
 DROP TRIGGER IF EXISTS trigger_create_match_on_mutual_like ON swipes;
-CREATE TRIGGER trigger_create_match_on_mutual_like
-    AFTER INSERT ON swipes
-    FOR EACH ROW
-    EXECUTE FUNCTION create_match_on_mutual_like();
+DROP FUNCTION IF EXISTS create_match_on_mutual_like();
 
--- Функция для поиска профилей с фильтрами
+-- Функция для поиска профилей с фильтрами (LANGUAGE sql - встраивается в вызывающий запрос)
 CREATE OR REPLACE FUNCTION search_profiles(
-    p_user_id BIGINT,
+    p_user_id BIGINT DEFAULT NULL,
     p_city VARCHAR DEFAULT NULL,
     p_university VARCHAR DEFAULT NULL,
     p_gender VARCHAR DEFAULT NULL,
@@ -216,58 +277,46 @@ CREATE OR REPLACE FUNCTION search_profiles(
     p_interests JSONB DEFAULT NULL,
     p_goals JSONB DEFAULT NULL,
     p_limit INTEGER DEFAULT 50,
-    p_offset INTEGER DEFAULT 0
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_created_at TIMESTAMP DEFAULT NULL,
+    p_cursor_id BIGINT DEFAULT NULL
 )
-RETURNS TABLE (
-    id BIGINT,
-    user_id BIGINT,
-    name VARCHAR,
-    gender VARCHAR,
-    age INTEGER,
-    city VARCHAR,
-    university VARCHAR,
-    interests JSONB,
-    goals JSONB,
-    bio TEXT,
-    photo_url VARCHAR
-) AS $$
-BEGIN
-    RETURN QUERY
-    SELECT 
-        p.id,
-        p.user_id,
-        p.name,
-        p.gender,
-        p.age,
-        p.city,
-        p.university,
-        p.interests,
-        p.goals,
-        p.bio,
-        p.photo_url
+RETURNS SETOF profiles AS $$
+    SELECT p.*
     FROM profiles p
     WHERE p.is_active = TRUE
         AND p.deleted_at IS NULL
-        AND p.user_id != p_user_id
-        AND NOT EXISTS (
+        AND (p_user_id IS NULL OR p.user_id != p_user_id)
+        AND (p_user_id IS NULL OR NOT EXISTS (
             SELECT 1 FROM swipes s
             WHERE s.user_id = p_user_id
             AND s.target_profile_id = p.id
-        )
+        ))
+        AND (p_user_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM swipe_exclusions x
+            WHERE x.user_id = p_user_id
+            AND x.profile_ids @> ARRAY[p.id]
+        ))
         AND (p_city IS NULL OR p.city = p_city)
         AND (p_university IS NULL OR p.university = p_university)
         AND (p_gender IS NULL OR p.gender = p_gender)
         AND (p_min_age IS NULL OR p.age >= p_min_age)
         AND (p_max_age IS NULL OR p.age <= p_max_age)
-        AND (p_interests IS NULL OR p.interests ?| ARRAY(SELECT jsonb_array_elements_text(p_interests)))
-        AND (p_goals IS NULL OR p.goals ?| ARRAY(SELECT jsonb_array_elements_text(p_goals)))
-    ORDER BY p.created_at DESC
+        AND (p_interests IS NULL OR p.interest_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'interest' AND t.value IN (SELECT jsonb_array_elements_text(p_interests))
+        ))
+        AND (p_goals IS NULL OR p.goal_ids && ARRAY(
+            SELECT t.id FROM tags t
+            WHERE t.kind = 'goal' AND t.value IN (SELECT jsonb_array_elements_text(p_goals))
+        ))
+        AND (p_cursor_created_at IS NULL OR (p.created_at, p.id) < (p_cursor_created_at, p_cursor_id))
+    ORDER BY p.created_at DESC, p.id DESC
     LIMIT p_limit
     OFFSET p_offset;
-END;
-$$ language 'plpgsql';
+$$ LANGUAGE sql STABLE;
 
--- Функция для получения входящих лайков
+-- Функция для получения входящих лайков (читает инбокс incoming_likes)
 CREATE OR REPLACE FUNCTION get_incoming_likes(p_user_id BIGINT)
 RETURNS TABLE (
     id BIGINT,
@@ -297,42 +346,116 @@ BEGIN
         p.goals,
         p.bio,
         p.photo_url,
-        s.created_at as liked_at
-    FROM swipes s
-    JOIN profiles p ON p.id = s.target_profile_id
-    WHERE s.target_profile_id = (SELECT id FROM profiles WHERE user_id = p_user_id)
-        AND s.action = 'like'
-        AND NOT EXISTS (
-            SELECT 1 FROM swipes s2
-            WHERE s2.user_id = p_user_id
-            AND s2.target_profile_id = s.user_id
-        )
+        il.liked_at
+    FROM incoming_likes il
+    JOIN profiles p ON p.id = il.liker_profile_id
+    WHERE il.owner_user_id = p_user_id
         AND p.is_active = TRUE
         AND p.deleted_at IS NULL
-    ORDER BY s.created_at DESC;
+    ORDER BY il.liked_at DESC, il.liker_user_id DESC;
 END;
 $$ language 'plpgsql';
 
+-- Прибавить delta к шарду счётчика текущего соединения
+CREATE OR REPLACE FUNCTION bump_table_counter(p_name TEXT, p_delta BIGINT)
+RETURNS VOID AS $$
+    INSERT INTO table_counters (name, shard, value)
+    VALUES (p_name, pg_backend_pid() % 16, p_delta)
+    ON CONFLICT (name, shard) DO UPDATE SET value = table_counters.value + EXCLUDED.value;
+$$ LANGUAGE sql;
+
+-- Счётчик всех строк таблицы (swipes, matches): имя счётчика - TG_ARGV[0]
+CREATE OR REPLACE FUNCTION count_table_rows()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM table_counters WHERE name = TG_ARGV[0];
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO delta FROM new_rows;
+    ELSE
+        SELECT -COUNT(*) INTO delta FROM old_rows;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_table_counter(TG_ARGV[0], delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Счётчик активных профилей (is_active и не удалён): учитывает и UPDATE
+CREATE OR REPLACE FUNCTION count_active_profiles()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT := 0;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM table_counters WHERE name = 'profiles';
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT delta + COUNT(*) INTO delta FROM new_rows WHERE is_active AND deleted_at IS NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT delta - COUNT(*) INTO delta FROM old_rows WHERE is_active AND deleted_at IS NULL;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_table_counter('profiles', delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры счётчиков (transition-таблицы допускают только одно событие на триггер)
+DROP TRIGGER IF EXISTS count_profiles_insert ON profiles;
+CREATE TRIGGER count_profiles_insert
+    AFTER INSERT ON profiles REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_update ON profiles;
+CREATE TRIGGER count_profiles_update
+    AFTER UPDATE ON profiles REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_delete ON profiles;
+CREATE TRIGGER count_profiles_delete
+    AFTER DELETE ON profiles REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+DROP TRIGGER IF EXISTS count_profiles_truncate ON profiles;
+CREATE TRIGGER count_profiles_truncate
+    AFTER TRUNCATE ON profiles
+    FOR EACH STATEMENT EXECUTE FUNCTION count_active_profiles();
+
+DROP TRIGGER IF EXISTS count_swipes_insert ON swipes;
+CREATE TRIGGER count_swipes_insert
+    AFTER INSERT ON swipes REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+DROP TRIGGER IF EXISTS count_swipes_delete ON swipes;
+CREATE TRIGGER count_swipes_delete
+    AFTER DELETE ON swipes REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+DROP TRIGGER IF EXISTS count_swipes_truncate ON swipes;
+CREATE TRIGGER count_swipes_truncate
+    AFTER TRUNCATE ON swipes
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('swipes');
+
+DROP TRIGGER IF EXISTS count_matches_insert ON matches;
+CREATE TRIGGER count_matches_insert
+    AFTER INSERT ON matches REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+DROP TRIGGER IF EXISTS count_matches_delete ON matches;
+CREATE TRIGGER count_matches_delete
+    AFTER DELETE ON matches REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+DROP TRIGGER IF EXISTS count_matches_truncate ON matches;
+CREATE TRIGGER count_matches_truncate
+    AFTER TRUNCATE ON matches
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_rows('matches');
+
 -- ============================================================================
 -- ПРЕДСТАВЛЕНИЯ (VIEWS)
 -- ============================================================================
 
--- Представление для статистики профилей
-CREATE OR REPLACE VIEW profile_stats AS
-SELECT 
-    p.id,
-    p.user_id,
-    p.name,
-    COUNT(DISTINCT s1.id) as likes_received,
-    COUNT(DISTINCT s2.id) as likes_sent,
-    COUNT(DISTINCT m.id) as matches_count
-FROM profiles p
-LEFT JOIN swipes s1 ON s1.target_profile_id = p.id AND s1.action = 'like'
-LEFT JOIN swipes s2 ON s2.user_id = p.user_id AND s2.action = 'like'
-LEFT JOIN matches m ON (m.user1_id = p.user_id OR m.user2_id = p.user_id)
-WHERE p.is_active = TRUE AND p.deleted_at IS NULL
-GROUP BY p.id, p.user_id, p.name;
-
 -- Представление для активных мэтчей (только с активными профилями)
 CREATE OR REPLACE VIEW active_matches AS
 SELECT 
@@ -355,8 +478,11 @@ WHERE p1.is_active = TRUE AND p1.deleted_at IS NULL
 -- ============================================================================
 
 COMMENT ON TABLE profiles IS 'Профили пользователей';
-COMMENT ON TABLE swipes IS 'История свайпов (лайки и дизлайки)';
+COMMENT ON TABLE swipes IS 'История свайпов (лайки и дизлайки), секционирована по hash(user_id)';
+COMMENT ON TABLE swipe_exclusions IS 'Архив старых пропусков: id профилей по пользователю (compact_swipes.py)';
 COMMENT ON TABLE matches IS 'Мэтчи между пользователями (взаимные лайки)';
+COMMENT ON TABLE match_edges IS 'Рёбра мэтчей (по строке на каждую сторону), поддерживается бэкендом';
+COMMENT ON TABLE incoming_likes IS 'Входящие лайки без ответа (инбокс), поддерживается бэкендом';
 COMMENT ON TABLE connection_feedbacks IS 'Отметки полезности коннекта между пользователями';
 
 COMMENT ON COLUMN profiles.interests IS 'JSONB массив интересов: ["IT", "Дизайн"]';
@@ -368,9 +494,13 @@ COMMENT ON COLUMN swipes.action IS 'Действие: like (лайк) или pas
 COMMENT ON COLUMN matches.user1_id IS 'ID первого пользователя (всегда меньше user2_id)';
 COMMENT ON COLUMN matches.user2_id IS 'ID второго пользователя (всегда больше user1_id)';
 
-COMMENT ON FUNCTION search_profiles IS 'Поиск профилей с фильтрами по городу, университету, возрасту, интересам и целям';
+COMMENT ON TABLE connection_feedback_counts IS 'Полученные отметки полезности по типам, поддерживается бэкендом';
+COMMENT ON TABLE profile_stats IS 'Лайки полученные/отправленные и мэтчи пользователя, поддерживается бэкендом';
+COMMENT ON TABLE table_counters IS 'Счётчики строк по шардам (сумма по name), поддерживаются триггерами';
+COMMENT ON TABLE jobs IS 'Очередь фоновых задач (app/jobs.py), выполненные удаляются';
+COMMENT ON TABLE tags IS 'Словарь интересов и целей: значение -> id (поддерживается бэкендом)';
+COMMENT ON FUNCTION search_profiles IS 'Поиск профилей с фильтрами по городу, университету, возрасту, интересам и целям (keyset по created_at, id)';
 COMMENT ON FUNCTION get_incoming_likes IS 'Получение списка пользователей, которые лайкнули текущего пользователя';
-COMMENT ON FUNCTION create_match_on_mutual_like IS 'Автоматическое создание мэтча при взаимном лайке';
 
 -- ============================================================================
 -- КОНЕЦ СХЕМЫ
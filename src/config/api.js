@@ -20,9 +20,11 @@ export const API_ENDPOINTS = {
   PROFILE_BY_USER_ID: (userId) => `${API_BASE_URL}/api/profiles/user/${userId}`, // Профиль по user_id
   LIKE_PROFILE: (id) => `${API_BASE_URL}/api/profiles/${id}/like`, // Лайк профиля
   PASS_PROFILE: (id) => `${API_BASE_URL}/api/profiles/${id}/pass`, // Пропуск профиля
+  PROFILE_AUTOCOMPLETE: `${API_BASE_URL}/api/profiles/autocomplete`, // Подсказки университетов и городов
   INCOMING_LIKES: `${API_BASE_URL}/api/profiles/incoming-likes`, // Входящие лайки
   RESPOND_TO_LIKE: `${API_BASE_URL}/api/profiles/respond-to-like`, // Ответ на входящий лайк
   MATCHES: `${API_BASE_URL}/api/matches`, // Список мэтчей (взаимных лайков)
+  EVENTS: `${API_BASE_URL}/api/events`, // Realtime-события (SSE): новые мэтчи и входящие лайки
 }
 
 /**
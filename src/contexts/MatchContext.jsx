@@ -1,4 +1,7 @@
-import { createContext, useContext, useState } from 'react'
+import { createContext, useContext, useEffect, useState } from 'react'
+import { API_ENDPOINTS } from '../config/api'
+import { fetchWithAuth, getAuthToken } from '../utils/api'
+import { useWebApp } from './WebAppContext'
 
 /**
  * MatchContext - контекст для управления мэтчами (взаимными лайками)
@@ -7,6 +10,8 @@ import { createContext, useContext, useState } from 'react'
  * - matches - список мэтчей
  * - addMatch - добавить мэтч
  * - removeMatch - удалить мэтч
+ * - matchesVersion / incomingLikesVersion - счётчики realtime-событий (SSE):
+ *   увеличиваются при новом мэтче / входящем лайке, страницы перезагружают данные по ним
  */
 const MatchContext = createContext(null)
 
@@ -27,6 +32,68 @@ export const useMatches = () => {
  */
 export const MatchProvider = ({ children }) => {
   const [matches, setMatches] = useState([]) // Список мэтчей
+  const [matchesVersion, setMatchesVersion] = useState(0) // Растёт при событии "match"
+  const [incomingLikesVersion, setIncomingLikesVersion] = useState(0) // Растёт при событии "like"
+  const { jwt } = useWebApp()
+
+  /**
+   * Подписка на realtime-события вместо опроса /api/matches и /api/profiles/incoming-likes
+   * JWT в URL не передаётся (он попал бы в логи): перед подключением берём
+   * короткоживущий билет POST /api/events/ticket. Сам EventSource переподключился
+   * бы со старым, уже истёкшим билетом, поэтому при обрыве открываем поток
+   * заново с новым билетом
+   */
+  useEffect(() => {
+    const token = jwt || getAuthToken()
+    if (!token || typeof EventSource === 'undefined') {
+      return undefined
+    }
+
+    let source = null
+    let retryTimer = null
+    let stopped = false
+
+    const reconnectLater = () => {
+      if (!stopped) {
+        retryTimer = setTimeout(connect, 5000)
+      }
+    }
+
+    const connect = async () => {
+      try {
+        const response = await fetchWithAuth(`${API_ENDPOINTS.EVENTS}/ticket`, { method: 'POST' })
+        if (!response.ok) {
+          // 401 - токен истёк, новый придёт через смену jwt
+          if (response.status !== 401) reconnectLater()
+          return
+        }
+        const { ticket } = await response.json()
+        if (stopped) return
+
+        source = new EventSource(`${API_ENDPOINTS.EVENTS}?ticket=${encodeURIComponent(ticket)}`)
+        source.addEventListener('match', () => {
+          setMatchesVersion(v => v + 1)
+          setIncomingLikesVersion(v => v + 1) // Мэтч убирает лайк из входящих
+        })
+        source.addEventListener('like', () => setIncomingLikesVersion(v => v + 1))
+        source.onerror = () => {
+          source.close()
+          source = null
+          reconnectLater()
+        }
+      } catch {
+        reconnectLater()
+      }
+    }
+
+    connect()
+
+    return () => {
+      stopped = true
+      clearTimeout(retryTimer)
+      if (source) source.close()
+    }
+  }, [jwt])
 
   /**
    * Добавляет мэтч в список (если его ещё нет)
@@ -56,7 +123,14 @@ export const MatchProvider = ({ children }) => {
   }
 
   return (
-    <MatchContext.Provider value={{ matches, addMatch, removeMatch, setMatchedProfiles: setMatchedProfilesFromServer }}>
+    <MatchContext.Provider value={{
+      matches,
+      addMatch,
+      removeMatch,
+      setMatchedProfiles: setMatchedProfilesFromServer,
+      matchesVersion,
+      incomingLikesVersion,
+    }}>
       {children}
     </MatchContext.Provider>
   )
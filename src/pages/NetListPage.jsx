@@ -4,7 +4,7 @@ import { Button, Card } from '../components'
 import { useMatches } from '../contexts/MatchContext'
 import { useWebApp } from '../contexts/WebAppContext'
 import { API_ENDPOINTS, getPhotoUrl } from '../config/api'
-import { getAuthToken } from '../utils/api'
+import { getAuthToken, NEXT_CURSOR_HEADER, withCursor } from '../utils/api'
 import { processProfiles } from '../utils/profileUtils'
 
 // Мемоизированная карточка профиля для предотвращения лишних ре-рендеров при скролле
@@ -80,7 +80,7 @@ MatchCard.displayName = 'MatchCard'
 
 const NetListPage = () => {
   const navigate = useNavigate()
-  const { matches: contextMatches, setMatchedProfiles: setContextMatchedProfiles } = useMatches()
+  const { matches: contextMatches, setMatchedProfiles: setContextMatchedProfiles, matchesVersion } = useMatches()
   const { user } = useWebApp()
   const [matchedProfiles, setMatchedProfiles] = useState([])
   const [loading, setLoading] = useState(false)
@@ -89,6 +89,7 @@ const NetListPage = () => {
   const hasLoadedRef = useRef(false)
   const lastUserIdRef = useRef(null)
   const activeRequestsRef = useRef(0)
+  const lastMatchesVersionRef = useRef(matchesVersion)
   
   // Загружаем кэш при первой загрузке
   useEffect(() => {
@@ -133,6 +134,14 @@ const NetListPage = () => {
 
     // Проверяем, нужно ли загружать данные
     const userId = user.id
+
+    // Пришло realtime-событие о новом мэтче - сбрасываем кэш и загружаем заново
+    if (lastMatchesVersionRef.current !== matchesVersion) {
+      lastMatchesVersionRef.current = matchesVersion
+      localStorage.removeItem(`matches_${userId}`)
+      hasLoadedRef.current = false
+    }
+
     if (hasLoadedRef.current && lastUserIdRef.current === userId) {
       // Данные уже загружены для этого пользователя
       return
@@ -185,7 +194,7 @@ const NetListPage = () => {
         
         // Используем endpoint для получения мэтчей (взаимных лайков)
         // user_id передаётся через токен авторизации, не через query параметр
-        const url = API_ENDPOINTS.MATCHES
+        const url = `${API_ENDPOINTS.MATCHES}?limit=100`
         
         const token = getAuthToken()
         const headers = {
@@ -209,7 +218,33 @@ const NetListPage = () => {
         if (!isMounted) return
         
         if (response.ok) {
-          const data = await response.json()
+          let data = await response.json()
+          
+          // Список мэтчей постраничный: догружаем следующие страницы по курсору
+          // из X-Next-Cursor. Если догрузка оборвалась, показываем то, что есть,
+          // но не кэшируем неполный список
+          let isComplete = true
+          let nextCursor = response.headers.get(NEXT_CURSOR_HEADER)
+          while (Array.isArray(data) && nextCursor && isMounted) {
+            try {
+              const pageResponse = await fetch(withCursor(url, nextCursor), {
+                signal: controller.signal,
+                headers,
+              })
+              if (!pageResponse.ok) {
+                isComplete = false
+                break
+              }
+              data = data.concat(await pageResponse.json())
+              nextCursor = pageResponse.headers.get(NEXT_CURSOR_HEADER)
+            } catch (e) {
+              console.warn('[NetListPage] Failed to load next matches page:', e)
+              isComplete = false
+              break
+            }
+          }
+          
+          if (!isMounted) return
           
           if (!Array.isArray(data)) {
             setMatchedProfiles([])
@@ -242,7 +277,7 @@ const NetListPage = () => {
               setContextMatchedProfiles(formattedMatches)
             }
             // Сохраняем в кэш (сохраняем сырые данные для быстрой загрузки)
-            if (formattedMatches.length > 0) {
+            if (formattedMatches.length > 0 && isComplete) {
               localStorage.setItem(cacheKey, JSON.stringify({
                 matches: data, // Сохраняем сырые данные от сервера
                 expires: Date.now() + 10 * 60 * 1000 // 10 минут
@@ -372,7 +407,7 @@ const NetListPage = () => {
         controller = null
       }
     }
-  }, [user?.id, setContextMatchedProfiles])
+  }, [user?.id, setContextMatchedProfiles, matchesVersion])
 
   // Используем данные из контекста, если они есть и локальные данные пусты
   useEffect(() => {
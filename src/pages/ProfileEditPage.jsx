@@ -39,6 +39,39 @@ const ProfileEditPage = () => {
   })
 
   const [errors, setErrors] = useState({})
+  // Подсказки с сервера: самые частые написания городов/университетов среди профилей
+  const [serverSuggestions, setServerSuggestions] = useState({ city: [], university: [] })
+
+  useEffect(() => {
+    const controllers = []
+    const timer = setTimeout(() => {
+      ;['city', 'university'].forEach((field) => {
+        const prefix = (formData[field] || '').trim()
+        if (prefix.length < 2) return
+        const controller = new AbortController()
+        controllers.push(controller)
+        const params = new URLSearchParams({ field, prefix, limit: '8' })
+        fetch(`${API_ENDPOINTS.PROFILE_AUTOCOMPLETE}?${params}`, { signal: controller.signal })
+          .then((response) => (response.ok ? response.json() : null))
+          .then((data) => {
+            if (data?.suggestions) {
+              setServerSuggestions((prev) => ({ ...prev, [field]: data.suggestions }))
+            }
+          })
+          .catch(() => {})
+      })
+    }, 250)
+    return () => {
+      clearTimeout(timer)
+      controllers.forEach((controller) => controller.abort())
+    }
+  }, [formData.city, formData.university])
+
+  // Серверные подсказки первыми, затем статический список без дубликатов
+  const mergeOptions = (suggestions, staticOptions) => {
+    const seen = new Set(suggestions.map((option) => option.toLowerCase()))
+    return [...suggestions, ...staticOptions.filter((option) => !seen.has(option.toLowerCase()))]
+  }
 
   useEffect(() => {
     // Проверяем наличие токена при загрузке
@@ -892,7 +925,7 @@ const ProfileEditPage = () => {
               Город <span className="text-red-500">*</span>
             </label>
             <Autocomplete
-              options={russianCities}
+              options={mergeOptions(serverSuggestions.city, russianCities)}
               value={formData.city}
               onChange={(value) => handleInputChange('city', value)}
               placeholder="Введите название города..."
@@ -907,7 +940,7 @@ const ProfileEditPage = () => {
               Университет <span className="text-red-500">*</span>
             </label>
             <Autocomplete
-              options={universities}
+              options={mergeOptions(serverSuggestions.university, universities)}
               value={formData.university}
               onChange={(value) => handleInputChange('university', value)}
               placeholder="Введите название университета..."
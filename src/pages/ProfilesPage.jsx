@@ -5,7 +5,7 @@ import { russianCities, universities, interests } from '../data/formData'
 import { useMatches } from '../contexts/MatchContext'
 import { useWebApp } from '../contexts/WebAppContext'
 import { API_ENDPOINTS, getPhotoUrl } from '../config/api'
-import { fetchWithAuth, getAuthToken } from '../utils/api'
+import { fetchWithAuth, getAuthToken, NEXT_CURSOR_HEADER, withCursor } from '../utils/api'
 import { processProfiles, processProfile } from '../utils/profileUtils'
 import { useDebounce } from '../utils/debounce'
 
@@ -21,7 +21,7 @@ import { useDebounce } from '../utils/debounce'
  */
 const ProfilesPage = () => {
   // Получаем функции из контекстов для работы с мэтчами и данными пользователя
-  const { addMatch, matches } = useMatches()
+  const { addMatch, matches, incomingLikesVersion } = useMatches()
   const { user, isLoading: isWebAppLoading } = useWebApp()
   const userInfo = user
   
@@ -86,6 +86,7 @@ const ProfilesPage = () => {
   const cardRef = useRef(null) // Ссылка на DOM элемент карточки
   const touchStartX = useRef(0) // X координата начала касания
   const touchStartY = useRef(0) // Y координата начала касания
+  const incomingRequestRef = useRef(0) // Номер текущей загрузки входящих (устаревшие догрузки страниц отбрасываются)
   const touchEndX = useRef(0) // X координата конца касания
   const touchEndY = useRef(0) // Y координата конца касания
   const isProcessingSwipe = useRef(false) // Флаг: обрабатывается ли сейчас свайп (чтобы не дублировать)
@@ -174,6 +175,7 @@ const ProfilesPage = () => {
       return
     }
     
+    const requestId = ++incomingRequestRef.current
     setLoadingIncoming(true)
     setIncomingError(null)
     setIncomingLikes([])
@@ -194,7 +196,7 @@ const ProfilesPage = () => {
         }
       }, 4000)
       
-      const url = API_ENDPOINTS.INCOMING_LIKES
+      const url = `${API_ENDPOINTS.INCOMING_LIKES}?limit=100`
       console.log('📤 Запрос входящих лайков:', url)
       
       const token = getAuthToken()
@@ -241,6 +243,11 @@ const ProfilesPage = () => {
         if (!hasSeenIncomingTip && processedProfiles.length > 0) {
           setShowIncomingTip(true)
         }
+        
+        // Остальные страницы (курсор в X-Next-Cursor) догружаем в фоне,
+        // первая страница уже показана
+        setLoadingIncoming(false)
+        await fetchRemainingIncomingLikes(url, response.headers.get(NEXT_CURSOR_HEADER), requestId)
       } else if (response.status === 401) {
         console.error('❌ Ошибка авторизации (401)')
         const errorText = await response.text()
@@ -280,6 +287,31 @@ const ProfilesPage = () => {
     }
   }
 
+  /**
+   * Догружает следующие страницы входящих лайков по курсору, пока он есть
+   * Прерывается, если началась новая загрузка (смена вкладки, новое событие);
+   * ошибка догрузки не сбрасывает уже показанные профили
+   */
+  const fetchRemainingIncomingLikes = async (url, cursor, requestId) => {
+    let nextCursor = cursor
+    while (nextCursor && requestId === incomingRequestRef.current) {
+      try {
+        const response = await fetchWithAuth(withCursor(url, nextCursor))
+        if (!response.ok) {
+          console.warn('⚠️ Не удалось догрузить входящие лайки:', response.status)
+          return
+        }
+        const profiles = processProfiles(await response.json())
+        if (requestId !== incomingRequestRef.current) return
+        setIncomingLikes(prev => [...prev, ...profiles])
+        nextCursor = response.headers.get(NEXT_CURSOR_HEADER)
+      } catch (error) {
+        console.warn('⚠️ Ошибка догрузки входящих лайков:', error.message)
+        return
+      }
+    }
+  }
+
   // При переключении на вкладку "Входящие коннекты" загружаем входящие лайки
   useEffect(() => {
     if (activeTab === 'incoming' && isReady && userInfo?.id) {
@@ -287,7 +319,7 @@ const ProfilesPage = () => {
       setIncomingLikes([])
       fetchIncomingLikes()
     }
-  }, [activeTab, isReady, userInfo])
+  }, [activeTab, isReady, userInfo, incomingLikesVersion])
 
   /**
    * Основной эффект для загрузки профилей с сервера
@@ -108,6 +108,13 @@ export const apiRequest = async (endpoint, options = {}, retryCount = 0) => {
       
       const errorMessage = errorData.detail || errorData.message || `HTTP error! status: ${response.status}`
       
+      // 429/503 от контроля нагрузки: повтор не раньше Retry-After
+      if ((response.status === 429 || response.status === 503) && retryCount < maxRetries) {
+        const retryAfter = Number(response.headers.get('Retry-After')) || 1
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000 * (retryCount + 1)))
+        return apiRequest(endpoint, options, retryCount + 1)
+      }
+
       // Retry для 5xx ошибок
       if (response.status >= 500 && retryCount < maxRetries) {
         await new Promise(resolve => setTimeout(resolve, retryDelay * (retryCount + 1)))
@@ -157,6 +164,20 @@ export const api = {
   delete: (endpoint, options = {}) => apiRequest(endpoint, { ...options, method: 'DELETE' }),
 }
 
+/**
+ * Заголовок с курсором следующей страницы keyset-пагинации
+ * (входящие лайки, мэтчи, поиск); тело ответа при этом остаётся массивом
+ */
+export const NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+/**
+ * Добавляет курсор следующей страницы к URL списка
+ */
+export const withCursor = (url, cursor) => {
+  if (!cursor) return url
+  return `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+}
+
 /**
  * Упрощённая функция для выполнения авторизованных fetch запросов
  * Используется когда нужен полный контроль над запросом (например, для обработки таймаутов)